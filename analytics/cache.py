@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'analytics:generation'
+
+
+def get_generation():
+    """Opaque token that changes whenever order data changes."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_analytics():
+    """Mark every cached analytics result stale once the current write commits."""
+    transaction.on_commit(_bump_generation)
+
+
+class ResultCache:
+    """
+    Shared-cache store for analytics results with stampede protection.
+
+    - A result is fresh for ANALYTICS_CACHE_TTL seconds and until order data
+      changes (see invalidate_analytics).
+    - Stale results younger than ANALYTICS_CACHE_STALE_TTL are returned at
+      once while one background thread recomputes them.
+    - Misses are single-flight: concurrent callers in a process share one
+      computation, and other workers wait briefly for it via a cache lock.
+    """
+    lock_timeout = 30
+    wait_interval = 0.05
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _key(self, name):
+        return f'analytics:result:{name}'
+
+    def _local_lock(self, name):
+        with self._locks_lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _store(self, name, compute, generation):
+        value = compute()
+        cache.set(self._key(name), {
+            'value': value,
+            'generation': generation,
+            'computed_at': time.time(),
+        }, timeout=getattr(settings, 'ANALYTICS_CACHE_STALE_TTL', 300))
+        return value
+
+    def _refresh_in_background(self, name, compute):
+        lock = self._local_lock(name)
+        if not lock.acquire(blocking=False):
+            return  # Already refreshing in this process
+        if not cache.add(f'{self._key(name)}:lock', 1, timeout=self.lock_timeout):
+            lock.release()
+            return  # Another worker is refreshing it
+
+        def refresh():
+            try:
+                self._store(name, compute, get_generation())
+            except Exception:
+                logger.exception("Failed to refresh analytics result %s", name)
+            finally:
+                cache.delete(f'{self._key(name)}:lock')
+                lock.release()
+                connections.close_all()
+
+        threading.Thread(target=refresh, name=f'analytics-refresh-{name}', daemon=True).start()
+
+    def get(self, name, compute):
+        """Return the cached result `name`, computing it with `compute()` if needed."""
+        ttl = getattr(settings, 'ANALYTICS_CACHE_TTL', 60)
+        generation = get_generation()
+        entry = cache.get(self._key(name))
+        if entry is not None:
+            if entry['generation'] == generation and time.time() - entry['computed_at'] < ttl:
+                return entry['value']
+            self._refresh_in_background(name, compute)
+            return entry['value']
+
+        with self._local_lock(name):
+            entry = cache.get(self._key(name))
+            if entry is not None:
+                return entry['value']
+            # Let one worker compute while the others wait for its result
+            deadline = time.time() + self.lock_timeout
+            while not cache.add(f'{self._key(name)}:lock', 1, timeout=self.lock_timeout):
+                time.sleep(self.wait_interval)
+                entry = cache.get(self._key(name))
+                if entry is not None:
+                    return entry['value']
+                if time.time() > deadline:
+                    return self._store(name, compute, generation)
+            try:
+                return self._store(name, compute, generation)
+            finally:
+                cache.delete(f'{self._key(name)}:lock')
+
+
+analytics_cache = ResultCache()
@@ -0,0 +1,123 @@
+import math
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+
+from order.models import Order, OrderStatusTransition
+from .models import PrepTimeBucket
+from .rollups import rollup_bucket
+
+# Prep time buckets grow by 10%, so a percentile read from the histogram is
+# within ~5% of the exact value. Bucket 0 holds everything under 1.1 seconds.
+BUCKET_GROWTH = 1.1
+MAX_BUCKET = 255
+
+WINDOWS = {'1h': 1, '6h': 6, '24h': 24, '7d': 24 * 7, '30d': 24 * 30}
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_for(seconds):
+    """Histogram bucket of a prep time in seconds."""
+    if seconds < BUCKET_GROWTH:
+        return 0
+    return min(int(math.log(seconds, BUCKET_GROWTH)), MAX_BUCKET)
+
+
+def bucket_seconds(bucket):
+    """Representative prep time of a bucket: its geometric midpoint."""
+    if bucket == 0:
+        return 0.0
+    return BUCKET_GROWTH ** (bucket + 0.5)
+
+
+def record_prep_time(completed_at, seconds):
+    """
+    Count one completed order in the histogram of its completion hour. Run
+    after the order commits so the shared bucket row is only locked for the
+    UPDATE itself.
+    """
+    date, hour = rollup_bucket(completed_at)
+    bucket = bucket_for(max(seconds, 0))
+    rows = PrepTimeBucket.objects.filter(date=date, hour=hour, bucket=bucket)
+    if rows.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            PrepTimeBucket.objects.create(date=date, hour=hour, bucket=bucket, count=1)
+    except IntegrityError:
+        # Another transaction created the bucket first
+        rows.update(count=F('count') + 1)
+
+
+def percentiles(histogram, wanted=PERCENTILES):
+    """{percentile: seconds} from a {bucket: count} histogram."""
+    total = sum(histogram.values())
+    if not total:
+        return {p: None for p in wanted}
+    result = {}
+    seen = 0
+    targets = iter(sorted(wanted))
+    target = next(targets)
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        while target is not None and seen >= total * target / 100:
+            result[target] = round(bucket_seconds(bucket), 1)
+            target = next(targets, None)
+    return result
+
+
+def first_completions(start=None, end=None):
+    """Transitions completing an order for the first time (in [start, end) if given)."""
+    earlier = OrderStatusTransition.objects.filter(
+        order_number=OuterRef('order_number'), to_status='completed', id__lt=OuterRef('id')
+    )
+    transitions = OrderStatusTransition.objects.filter(to_status='completed')
+    if start is not None:
+        transitions = transitions.filter(created_at__gte=start)
+    if end is not None:
+        transitions = transitions.filter(created_at__lt=end)
+    return transitions.exclude(Exists(earlier))
+
+
+def kitchen_stats(hours, now=None):
+    """
+    Throughput per hour, current queue depth and prep time percentiles over
+    the `hours` hours up to now.
+
+    Whole hours are read from the hourly histogram. The window rarely starts
+    on the hour, so the completions in its leading partial hour are read
+    from the status transitions instead.
+    """
+    now = now or timezone.now()
+    start = now - timedelta(hours=hours)
+    first_hour = timezone.localtime(start).replace(minute=0, second=0, microsecond=0)
+    if first_hour < start:
+        first_hour += timedelta(hours=1)
+
+    date, hour = rollup_bucket(first_hour)
+    rows = PrepTimeBucket.objects.filter(Q(date__gt=date) | Q(date=date, hour__gte=hour))
+    throughput = [
+        {'date': row['date'], 'hour': row['hour'], 'completed': row['completed']}
+        for row in rows.values('date', 'hour').annotate(completed=Sum('count')).order_by('date', 'hour')
+    ]
+    histogram = Counter(dict(rows.values('bucket').annotate(total=Sum('count')).values_list('bucket', 'total')))
+
+    edge = [
+        (completed_at - (placed_at or completed_at)).total_seconds()
+        for completed_at, placed_at in first_completions(start, first_hour).values_list('created_at', 'placed_at')
+    ]
+    if edge:
+        edge_date, edge_hour = rollup_bucket(start)
+        throughput.insert(0, {'date': edge_date, 'hour': edge_hour, 'completed': len(edge)})
+        histogram.update(bucket_for(max(seconds, 0)) for seconds in edge)
+    prep_time = percentiles(histogram)
+
+    return {
+        'queue_depth': Order.objects.filter(status='in_progress').count(),
+        'completed': sum(histogram.values()),
+        'throughput': throughput,
+        'prep_time_seconds': {f'p{p}': value for p, value in prep_time.items()},
+    }
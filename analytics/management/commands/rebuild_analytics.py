@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from analytics.rebuild import compute_shard, order_date_range, plan_shards, refresh_shards, swap_in
+
+
+class Command(BaseCommand):
+    """
+    Shards are saved to --state-dir as they finish, together with a
+    fingerprint of the orders they read. Before swapping in, shards whose
+    orders changed since (resumed from an earlier run or written to during
+    this one) are recomputed, once outside the swap transaction and once
+    more inside it for writes that raced the first pass.
+
+    Increments still held by web workers' write-behind buffers
+    (MENU_ORDER_COUNT_WRITE_BEHIND) are flushed on top of the rebuilt order
+    counts, so with write-behind enabled, run the rebuild when no orders are
+    coming in or accept up to one flush interval of double counting.
+    """
+    help = (
+        "Rebuild menu item order counts, daily item stats, hourly sales rollups, "
+        "the prep time histogram and the rating summary from order history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard-days', type=int, default=7,
+                            help="Days of orders per shard.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes; 1 processes shards in this process.")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Orders fetched per database round trip.")
+        parser.add_argument('--state-dir', default=os.path.join(tempfile.gettempdir(), 'rebuild_analytics'),
+                            help="Where finished shards are saved so an interrupted run can resume.")
+        parser.add_argument('--fresh', action='store_true',
+                            help="Ignore shards saved by an earlier, interrupted run.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        state_dir = options['state_dir']
+        os.makedirs(state_dir, exist_ok=True)
+        if options['fresh']:
+            self.clear_state(state_dir)
+
+        date_range = order_date_range()
+        shards = plan_shards(*date_range, options['shard_days']) if date_range else []
+
+        results = []
+        pending = []
+        for start, end in shards:
+            path = self.shard_path(state_dir, start, end)
+            if os.path.exists(path):
+                with open(path) as f:
+                    results.append(json.load(f))
+            else:
+                pending.append((start.isoformat(), end.isoformat()))
+        if results:
+            self.stdout.write(f"Resuming: {len(results)} of {len(shards)} shards already done.")
+
+        for result in self.run_shards(pending, options['workers'], options['chunk_size']):
+            path = self.shard_path(state_dir, result['start'], result['end'])
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(result, f)
+            os.replace(f'{path}.tmp', path)
+            results.append(result)
+            self.stdout.write(
+                f"[{len(results)}/{len(shards)}] {result['start']}..{result['end']}: "
+                f"{result['orders']} orders ({time.monotonic() - started:.1f}s)"
+            )
+
+        results = swap_in(refresh_shards(results, options['chunk_size']), options['chunk_size'])
+        self.clear_state(state_dir)
+
+        orders = sum(result['orders'] for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt analytics from {orders} orders in {len(results)} shards ({time.monotonic() - started:.1f}s)."
+        ))
+
+    def run_shards(self, shards, workers, chunk_size):
+        """Yield shard results as they finish, in worker processes if possible."""
+        if workers <= 1 or len(shards) <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            for start, end in shards:
+                yield compute_shard(start, end, chunk_size)
+            return
+
+        # Forked workers must not share this process's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context,
+                                 initializer=connections.close_all) as pool:
+            futures = [pool.submit(compute_shard, start, end, chunk_size) for start, end in shards]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def shard_path(self, state_dir, start, end):
+        return os.path.join(state_dir, f'shard-{start}-{end}.json')
+
+    def clear_state(self, state_dir):
+        for name in os.listdir(state_dir):
+            if name.startswith('shard-'):
+                os.remove(os.path.join(state_dir, name))
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:43
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_rollups(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    SalesRollup = apps.get_model('analytics', 'SalesRollup')
+    buckets = defaultdict(lambda: {
+        'order_count': 0, 'revenue': Decimal('0'), 'completed_count': 0, 'rating_sum': 0, 'rating_count': 0,
+    })
+    orders = Order.objects.values_list('created_at', 'status', 'total_price', 'star_rating')
+    for created_at, status, total_price, star_rating in orders.iterator():
+        local = timezone.localtime(created_at)
+        bucket = buckets[(local.date(), local.hour)]
+        bucket['order_count'] += 1
+        bucket['revenue'] += total_price
+        bucket['completed_count'] += status == 'completed'
+        if star_rating is not None:
+            bucket['rating_sum'] += star_rating
+            bucket['rating_count'] += 1
+    SalesRollup.objects.bulk_create([
+        SalesRollup(date=date, hour=hour, **totals) for (date, hour), totals in buckets.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('order', '0007_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour'), name='sales_rollup_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
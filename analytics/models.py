@@ -1,3 +1,43 @@
 from django.db import models
 
-# Create your models here.
+class SalesRollup(models.Model):
+    """
+    Order totals per hour of order placement, maintained as orders are
+    created, change status, get rated or are deleted. Dashboards sum these
+    rows instead of aggregating the Order table.
+    """
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'hour'], name='sales_rollup_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00"
+
+class PrepTimeBucket(models.Model):
+    """
+    Histogram of order prep times (placement to completion), per hour of
+    completion. `bucket` indexes log-spaced prep time ranges (see
+    analytics.kitchen), so percentiles over any window are read from a few
+    hundred rows instead of sorting every order.
+    """
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'hour', 'bucket'], name='prep_time_bucket_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00 #{self.bucket}"
@@ -0,0 +1,217 @@
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from menuitem.models import MenuItem, MenuItemDailyStats
+from order.lines import build_order_lines
+from order.models import Order, RatingSummary
+from order.ratings import SUMMARY_ID
+from .cache import invalidate_analytics
+from .kitchen import bucket_for, first_completions
+from .models import PrepTimeBucket, SalesRollup
+from .rollups import ROLLUP_FIELDS, order_contribution, rollup_bucket
+
+SHARD_ORDER_FIELDS = ('id', 'created_at', 'status', 'total_price', 'star_rating', 'items', 'change_seq')
+
+
+def plan_shards(first_day, last_day, days):
+    """Split [first_day, last_day] into [start, end) ranges of `days` days."""
+    shards = []
+    start = first_day
+    while start <= last_day:
+        end = start + timedelta(days=days)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+def order_date_range():
+    """
+    Local dates of the first order and of today (or of the last order, if
+    later), or None without orders. Shards always reach today, so orders
+    placed while the rebuild runs fall into a shard.
+    """
+    first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    last = Order.objects.order_by('-created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return None
+    return timezone.localdate(first), max(timezone.localdate(last), timezone.localdate())
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _shard_orders(start, end):
+    return Order.objects.filter(
+        created_at__gte=_day_start(date.fromisoformat(start)),
+        created_at__lt=_day_start(date.fromisoformat(end)),
+    )
+
+
+def shard_fingerprint(start, end):
+    """
+    [order count, highest change_seq] of the orders created in [start, end).
+    Any save, insert or delete in the range changes it, since every write
+    takes a change_seq above all earlier ones.
+    """
+    totals = _shard_orders(start, end).aggregate(orders=Count('id'), change_seq=Max('change_seq'))
+    return [totals['orders'], totals['change_seq']]
+
+
+def compute_shard(start, end, chunk_size=2000):
+    """
+    Recompute everything derived from the orders created in [start, end)
+    (local dates, ISO strings). Returns a JSON-serializable dict so results
+    can cross process boundaries and be saved for resuming.
+    """
+    rollups = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    ordered = Counter()
+    cancelled = Counter()
+    count = 0
+    change_seq = None
+
+    orders = (
+        _shard_orders(start, end)
+        .only(*SHARD_ORDER_FIELDS)
+        .order_by('created_at', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    for order in orders:
+        count += 1
+        if order.change_seq is not None and (change_seq is None or order.change_seq > change_seq):
+            change_seq = order.change_seq
+        bucket = rollups[rollup_bucket(order.created_at)]
+        for field, amount in order_contribution(order.status, order.total_price, order.star_rating).items():
+            bucket[field] += amount
+
+        # Same attribution as the live counters: orders and cancellations on
+        # the day the order was placed
+        ordered_on = timezone.localdate(order.created_at).isoformat()
+        for line in build_order_lines(order):
+            ordered[(line.menu_item_id, ordered_on)] += line.quantity
+            if order.status == 'cancelled':
+                cancelled[(line.menu_item_id, ordered_on)] += line.quantity
+
+    return {
+        'start': start,
+        'end': end,
+        'orders': count,
+        # Fingerprint of what was read, to tell later whether it is stale
+        'fingerprint': [count, change_seq],
+        'rollups': [
+            [day.isoformat(), hour, dict(totals, revenue=str(totals['revenue']))]
+            for (day, hour), totals in rollups.items()
+        ],
+        'ordered': [[item_id, day, quantity] for (item_id, day), quantity in ordered.items()],
+        'cancelled': [[item_id, day, quantity] for (item_id, day), quantity in cancelled.items()],
+    }
+
+
+def merge_shards(results):
+    """Sum shard results into {'rollups', 'ordered', 'cancelled'} totals."""
+    rollups = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    ordered = Counter()
+    cancelled = Counter()
+    for result in results:
+        for day, hour, totals in result['rollups']:
+            bucket = rollups[(date.fromisoformat(day), hour)]
+            for field in ROLLUP_FIELDS:
+                bucket[field] += Decimal(totals[field]) if field == 'revenue' else totals[field]
+        for item_id, day, quantity in result['ordered']:
+            ordered[(item_id, date.fromisoformat(day))] += quantity
+        for item_id, day, quantity in result['cancelled']:
+            cancelled[(item_id, date.fromisoformat(day))] += quantity
+    return {'rollups': rollups, 'ordered': ordered, 'cancelled': cancelled}
+
+
+def compute_prep_times(chunk_size=2000):
+    """{(date, hour, bucket): count} of first completions, from the status transitions."""
+    histogram = Counter()
+    transitions = first_completions().values_list('created_at', 'placed_at').iterator(chunk_size=chunk_size)
+    for completed_at, placed_at in transitions:
+        seconds = (completed_at - (placed_at or completed_at)).total_seconds()
+        histogram[rollup_bucket(completed_at) + (bucket_for(max(seconds, 0)),)] += 1
+    return histogram
+
+
+def refresh_shards(results, chunk_size=2000):
+    """
+    Shard results with stale ones recomputed: shards resumed from an earlier
+    run or changed by live writes since they were computed. Orders placed
+    after the last shard (e.g. after midnight) get a shard of their own.
+    """
+    fresh = []
+    for result in results:
+        if result.get('fingerprint') != shard_fingerprint(result['start'], result['end']):
+            result = compute_shard(result['start'], result['end'], chunk_size)
+        fresh.append(result)
+
+    last_end = max((result['end'] for result in fresh), default=None)
+    if last_end is not None:
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        if last_end < tomorrow and _shard_orders(last_end, tomorrow).exists():
+            fresh.append(compute_shard(last_end, tomorrow, chunk_size))
+    return fresh
+
+
+def swap_in(results, chunk_size=2000):
+    """
+    Replace the stored analytics with the rebuilt shard results in one
+    transaction, so readers see either the old or the new numbers, never a
+    mix. Stale shards are recomputed inside the transaction (see
+    refresh_shards) so writes made during the run are not lost, and the prep
+    time histogram is rebuilt from the status transitions.
+
+    Returns the shard results that were swapped in.
+    """
+    with transaction.atomic():
+        menu_items = list(MenuItem.objects.select_for_update().only('id', 'order_count', 'cancelled_order_count'))
+        known = {item.id for item in menu_items}
+        results = refresh_shards(results, chunk_size)
+        totals = merge_shards(results)
+
+        SalesRollup.objects.all().delete()
+        SalesRollup.objects.bulk_create([
+            SalesRollup(date=day, hour=hour, **fields) for (day, hour), fields in totals['rollups'].items()
+        ], batch_size=1000)
+
+        daily = defaultdict(lambda: {'order_count': 0, 'cancelled_count': 0})
+        for (item_id, day), quantity in totals['ordered'].items():
+            daily[(item_id, day)]['order_count'] += quantity
+        for (item_id, day), quantity in totals['cancelled'].items():
+            daily[(item_id, day)]['cancelled_count'] += quantity
+        MenuItemDailyStats.objects.all().delete()
+        MenuItemDailyStats.objects.bulk_create([
+            MenuItemDailyStats(menu_item_id=item_id, date=day, **counts)
+            for (item_id, day), counts in daily.items() if item_id in known
+        ], batch_size=1000)
+
+        order_counts = Counter()
+        cancelled_counts = Counter()
+        for (item_id, _), quantity in totals['ordered'].items():
+            order_counts[item_id] += quantity
+        for (item_id, _), quantity in totals['cancelled'].items():
+            cancelled_counts[item_id] += quantity
+        for item in menu_items:
+            item.order_count = order_counts[item.id]
+            item.cancelled_order_count = cancelled_counts[item.id]
+        MenuItem.objects.bulk_update(menu_items, ['order_count', 'cancelled_order_count'], batch_size=500)
+
+        rating_sum = sum(fields['rating_sum'] for fields in totals['rollups'].values())
+        rating_count = sum(fields['rating_count'] for fields in totals['rollups'].values())
+        RatingSummary.objects.update_or_create(
+            pk=SUMMARY_ID, defaults={'rating_sum': rating_sum, 'rating_count': rating_count}
+        )
+
+        PrepTimeBucket.objects.all().delete()
+        PrepTimeBucket.objects.bulk_create([
+            PrepTimeBucket(date=day, hour=hour, bucket=bucket, count=count)
+            for (day, hour, bucket), count in compute_prep_times(chunk_size).items()
+        ], batch_size=1000)
+        invalidate_analytics()
+    return results
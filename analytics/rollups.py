@@ -0,0 +1,103 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from order.ratings import apply_rating_delta
+from .models import SalesRollup
+
+ROLLUP_FIELDS = ('order_count', 'revenue', 'completed_count', 'rating_sum', 'rating_count')
+
+
+def rollup_bucket(moment):
+    """(date, hour) rollup bucket of a timestamp, in the current time zone."""
+    local = timezone.localtime(moment)
+    return local.date(), local.hour
+
+
+def order_contribution(status, total_price, star_rating):
+    """What a single order in the given state adds to its rollup bucket."""
+    return {
+        'order_count': 1,
+        'revenue': Decimal(total_price or 0),
+        'completed_count': 1 if status == 'completed' else 0,
+        'rating_sum': star_rating or 0,
+        'rating_count': 0 if star_rating is None else 1,
+    }
+
+
+def apply_rollup_delta(date, hour, delta):
+    """Add `delta` ({field: amount}) to one rollup bucket, creating it if needed."""
+    delta = {field: amount for field, amount in delta.items() if amount}
+    if not delta:
+        return
+    updates = {field: F(field) + amount for field, amount in delta.items()}
+    if SalesRollup.objects.filter(date=date, hour=hour).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(date=date, hour=hour, **delta)
+    except IntegrityError:
+        # Another transaction created the bucket first
+        SalesRollup.objects.filter(date=date, hour=hour).update(**updates)
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Add {(date, hour): delta} to their rollup buckets, and the rating part to
+    the all-time RatingSummary.
+    """
+    for (date, hour), delta in deltas.items():
+        apply_rollup_delta(date, hour, delta)
+    apply_rating_delta(
+        sum(delta['rating_sum'] for delta in deltas.values()),
+        sum(delta['rating_count'] for delta in deltas.values()),
+    )
+
+
+def apply_after_commit(deltas):
+    """
+    Apply {(date, hour): delta} once the current transaction commits, each
+    bucket update in its own short transaction. Order writes thereby never
+    hold the lock on the current hour's row, which every order touches.
+    Deltas lost to a crash right after the commit are restored by the
+    rebuild_analytics command.
+    """
+    deltas = {bucket: delta for bucket, delta in deltas.items() if any(delta.values())}
+    if deltas:
+        transaction.on_commit(lambda: apply_rollup_deltas(deltas))
+
+
+def order_delta(order, created=False, deleted=False):
+    """{field: amount} difference between an order's loaded and current state."""
+    before = order.loaded_values
+    if created or before is None:
+        old = dict.fromkeys(ROLLUP_FIELDS, 0)
+    else:
+        old = order_contribution(
+            before.get('status', order.status),
+            before.get('total_price', order.total_price),
+            before.get('star_rating', order.star_rating),
+        )
+    if deleted:
+        new = dict.fromkeys(ROLLUP_FIELDS, 0)
+    else:
+        new = order_contribution(order.status, order.total_price, order.star_rating)
+    return {field: new[field] - old[field] for field in ROLLUP_FIELDS}
+
+
+def record_order_change(order, created=False, deleted=False):
+    """Apply the difference between an order's loaded and current state after commit."""
+    apply_after_commit({rollup_bucket(order.created_at): order_delta(order, created=created, deleted=deleted)})
+
+
+def record_orders_created(orders):
+    """Add a batch of new orders (e.g. from bulk_create) bucket by bucket after commit."""
+    buckets = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    for order in orders:
+        bucket = buckets[rollup_bucket(order.created_at)]
+        for field, amount in order_contribution(order.status, order.total_price, order.star_rating).items():
+            bucket[field] += amount
+    apply_after_commit(buckets)
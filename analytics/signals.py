@@ -0,0 +1,91 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from menuitem.counters import apply_cancelled_counts, apply_order_counts
+from order.lines import item_quantities
+from order.models import Order, OrderStatusTransition
+from order.signals import orders_bulk_created
+from .rollups import record_order_change, record_orders_created
+from .trending import trending_items
+from .cache import invalidate_analytics
+from .kitchen import record_prep_time
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_order_change(instance, created=created)
+    invalidate_analytics()
+
+    if created:
+        # Feed the "trending now" sketch once the order is committed
+        counts = item_quantities(instance.items)
+        transaction.on_commit(lambda: trending_items.record(counts))
+
+
+    record_item_count_changes(instance, created=created)
+
+
+@receiver(post_save, sender=OrderStatusTransition)
+def status_transition_logged(sender, instance, created, raw=False, **kwargs):
+    # Histogram the prep time the first time an order is completed;
+    # completing it again after reopening does not count twice
+    if raw or not created or not instance.is_first_completion():
+        return
+    completed_at = instance.created_at
+    seconds = (completed_at - (instance.placed_at or completed_at)).total_seconds()
+    transaction.on_commit(lambda: record_prep_time(completed_at, seconds))
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    record_order_change(instance, deleted=True)
+    record_item_count_changes(instance, deleted=True)
+    invalidate_analytics()
+
+
+@receiver(orders_bulk_created)
+def orders_bulk_created_handler(sender, orders, **kwargs):
+    record_orders_created(orders)
+    invalidate_analytics()
+
+
+def record_item_count_changes(order, created=False, deleted=False):
+    """
+    Keep the per-item order and cancellation counts in step with an edited
+    or deleted order, on the day the order was placed like its creation
+    (counted by the create views).
+
+    - Editing the items, or deleting the order, replaces the items counted
+      as ordered.
+    - Cancelled orders have their items counted as cancelled: entering the
+      cancelled state adds them, leaving it (or a delete) takes back the
+      items that were counted.
+    """
+    before = {} if created else order.loaded_values or {}
+    current = {} if deleted else item_quantities(order.items)
+    ordered = Counter()
+    if 'items' in before:
+        ordered.update(current)
+        ordered.subtract(item_quantities(before['items']))
+    cancelled = Counter()
+    if order.status == 'cancelled':
+        cancelled.update(current)
+    if before.get('status') == 'cancelled':
+        cancelled.subtract(item_quantities(before.get('items', order.items)))
+
+    ordered = {item_id: quantity for item_id, quantity in ordered.items() if quantity}
+    cancelled = {item_id: quantity for item_id, quantity in cancelled.items() if quantity}
+    if ordered or cancelled:
+        date = timezone.localdate(order.created_at)
+
+        def apply_counts():
+            apply_order_counts(ordered, date)
+            apply_cancelled_counts(cancelled, date)
+
+        transaction.on_commit(apply_counts)
@@ -1,3 +1,526 @@
+import io
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.querybudget import QueryBudget, QueryBudgetMixin
+from menuitem.models import Category, MenuItem, MenuItemDailyStats
+from order.models import Order, OrderStatusTransition
+from order.ratings import compute_rating_totals, get_rating_summary
+from user_authentication.models import User
+from .cache import ResultCache, _bump_generation, get_generation
+from .kitchen import kitchen_stats
+from .rebuild import compute_shard, order_date_range, plan_shards, refresh_shards
+from .trending import SpaceSaving, TrendingItems
+from .models import PrepTimeBucket, SalesRollup
+
+
+class AnalyticsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = 'analytics.urls'
+    prefix = '/analytics'
+    budgets = [
+        QueryBudget('analytics', 3),
+        QueryBudget('weekly-sales', 1),
+        QueryBudget('menu-popularity', 2, query='period=month'),
+        QueryBudget('trending-items', 1),
+        QueryBudget('dashboard', 4),
+        QueryBudget('kitchen-stats', 4, query='window=7d'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        for i in range(10):
+            MenuItem.objects.create(name=f'Item {i}', price=Decimal('4.50'), category=category, description='')
+        cls.user = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+        client = APIClient()
+        client.force_authenticate(cls.user)
+        for items in ([1, 2], [3], [4, 5, 6], [7, 8], [1, 1, 9]):
+            client.post('/order/create/', {'items': items}, format='json')
+        client.patch('/order/update-status/ORD-1/', {'status': 'completed'}, format='json')
+        client.patch('/order/update-status/ORD-2/', {'status': 'cancelled'}, format='json')
+        client.post('/order/feedback/', {'order_number': 'ORD-1', 'star_rating': 4}, format='json')
+
+
+class SpaceSavingMergeTests(TestCase):
+    def sketch(self, capacity, counts):
+        sketch = SpaceSaving(capacity)
+        for key, count in counts.items():
+            sketch.offer(key, count)
+        return sketch
+
+    def test_missing_key_gets_full_summary_floor(self):
+        # 'c' may have been evicted from the full summary, worth up to its floor of 2
+        merged = self.sketch(2, {'a': 5, 'b': 2}).merge(self.sketch(2, {'a': 1, 'c': 4}))
+        self.assertEqual(merged.top(2), [('a', 6, 0), ('c', 6, 2)])
+
+    def test_partial_summary_adds_no_floor(self):
+        merged = self.sketch(3, {'a': 5, 'b': 2}).merge(self.sketch(3, {'c': 4}))
+        self.assertEqual(merged.top(3), [('a', 5, 0), ('c', 4, 0), ('b', 2, 0)])
+
+    def test_counts_stay_upper_bounds(self):
+        first = self.sketch(2, {'a': 3, 'b': 2, 'c': 1})
+        second = self.sketch(2, {'c': 4, 'd': 1, 'a': 1})
+        merged = SpaceSaving(2).merge(first).merge(second)
+        true_counts = {'a': 4, 'b': 2, 'c': 5, 'd': 1}
+        for key, count, error in merged.top(2):
+            self.assertGreaterEqual(count, true_counts[key])
+            self.assertLessEqual(count - error, true_counts[key])
+
+
+@mock.patch.object(TrendingItems, '_run', lambda self: None)
+class TrendingItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def worker(self, name):
+        trending = TrendingItems()
+        trending.worker_id = name
+        return trending
+
+    def test_top_merges_published_workers(self):
+        first, second = self.worker('a:1'), self.worker('b:1')
+        first.record({1: 3, 2: 1})
+        second.record({2: 4})
+        self.assertEqual(first.top(2), [(1, 3, 0), (2, 1, 0)])
+        second.publish()
+        self.assertEqual(first.top(2), [(2, 5, 0), (1, 3, 0)])
+        self.assertEqual(second.top(2), [(2, 4, 0)])
+
+    def test_published_panes_expire_with_the_window(self):
+        first, second = self.worker('a:1'), self.worker('b:1')
+        now = 1_000_000
+        second.sketch.offer_many({1: 2}, now=now)
+        second.publish(now=now)
+        self.assertEqual(first.top(1, now=now + 60), [(1, 2, 0)])
+        self.assertEqual(first.top(1, now=now + second.sketch.window_seconds), [])
+
+    def test_workers_claim_separate_slots(self):
+        workers = [self.worker(f'w:{i}') for i in range(3)]
+        for i, trending in enumerate(workers):
+            trending.record({i: 1})
+            trending.publish()
+        self.assertEqual(sorted(trending._slot for trending in workers), [0, 1, 2])
+        self.assertEqual(len(workers[0].top(5)), 3)
+
+    def test_taken_slot_is_reclaimed(self):
+        first, second = self.worker('a:1'), self.worker('b:1')
+        first.record({1: 1})
+        first.publish()
+        cache.delete(first._slot_key(0))
+        second.record({2: 1})
+        second.publish()
+        first.publish()
+        self.assertEqual((first._slot, second._slot), (1, 0))
+        self.assertEqual(len(first.top(5)), 2)
+
+    def test_flush_publishes_only_after_recording(self):
+        trending = self.worker('a:1')
+        trending.flush()
+        self.assertIsNone(cache.get(trending._slot_key(0)))
+        trending.record({1: 1})
+        trending.flush()
+        self.assertEqual(cache.get(trending._slot_key(0))['worker'], 'a:1')
+
+
+class SalesRollupTests(TestCase):
+    def create_order(self, **fields):
+        fields.setdefault('total_price', Decimal('10.00'))
+        return Order.objects.create(order_number=f'ORD-{Order.objects.count() + 1}', items={}, **fields)
+
+    def totals(self):
+        return SalesRollup.objects.aggregate(
+            orders=Sum('order_count'), revenue=Sum('revenue'), completed=Sum('completed_count'),
+            rating_sum=Sum('rating_sum'), rating_count=Sum('rating_count'),
+        )
+
+    def test_applied_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                self.create_order()
+        # The order transaction never touches the shared hourly row
+        self.assertFalse([query for query in queries.captured_queries if SalesRollup._meta.db_table in query['sql']])
+        self.assertFalse(SalesRollup.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.totals()['orders'], 1)
+
+    def test_order_lifecycle(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.create_order()
+            self.create_order(total_price=Decimal('5.50'))
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'completed'
+            order.star_rating = 4
+            order.save()
+        self.assertEqual(self.totals(), {
+            'orders': 2, 'revenue': Decimal('15.50'), 'completed': 1, 'rating_sum': 4, 'rating_count': 1,
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.totals(), {
+            'orders': 1, 'revenue': Decimal('5.50'), 'completed': 0, 'rating_sum': 0, 'rating_count': 0,
+        })
+
+    def test_rolled_back_write_is_not_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.create_order()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertFalse(SalesRollup.objects.exists())
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.orders = [
+                Order.objects.create(order_number=f'ORD-{i}', total_price=Decimal('5.00'), items={})
+                for i in range(3)
+            ]
+
+    def rate(self, order_number, star_rating):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/order/feedback/', {'order_number': order_number, 'star_rating': star_rating}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def assertSummary(self, rating_sum, rating_count):
+        summary = get_rating_summary()
+        self.assertEqual((summary.rating_sum, summary.rating_count), (rating_sum, rating_count))
+        self.assertEqual((summary.rating_sum, summary.rating_count), compute_rating_totals())
+
+    def test_feedback_and_rerating(self):
+        self.rate('ORD-0', 4)
+        self.rate('ORD-1', 2)
+        self.rate('ORD-0', 5)
+        self.assertSummary(7, 2)
+        self.assertEqual(self.client.get('/order/average-rating/').data, {'average_rating': 3.5})
+
+    def test_orm_and_admin_writes(self):
+        order = self.orders[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            order.star_rating = 3
+            order.save()
+        self.assertSummary(3, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.star_rating = None
+            order.save()
+        self.assertSummary(0, 0)
+
+    def test_delete(self):
+        self.rate('ORD-1', 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/order/delete/ORD-1/')
+        self.assertEqual(response.status_code, 204)
+        self.assertSummary(0, 0)
+
+
+class CancellationCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.soup = MenuItem.objects.create(name='Soup', price=Decimal('4.50'), category=category, description='')
+        cls.bread = MenuItem.objects.create(name='Bread', price=Decimal('2.00'), category=category, description='')
+
+    def setUp(self):
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/order/create/', {'items': [self.soup.id, self.soup.id]}, format='json')
+        self.order_number = response.data['order_number']
+        # Placed yesterday
+        self.placed_on = timezone.localdate() - timedelta(days=1)
+        Order.objects.update(created_at=timezone.now() - timedelta(days=1))
+
+    def patch(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/order/patch/{self.order_number}/', data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def cancelled(self):
+        """{(item, date): cancelled_count} of the non-zero daily buckets, and the item totals."""
+        daily = {
+            (row.menu_item_id, row.date): row.cancelled_count
+            for row in MenuItemDailyStats.objects.filter(cancelled_count__gt=0)
+        }
+        totals = dict(MenuItem.objects.filter(cancelled_order_count__gt=0).values_list('id', 'cancelled_order_count'))
+        return daily, totals
+
+    def test_counted_on_the_day_the_order_was_placed(self):
+        self.patch({'status': 'cancelled'})
+        self.assertEqual(self.cancelled(), ({(self.soup.id, self.placed_on): 2}, {self.soup.id: 2}))
+
+    def test_uncancelling_takes_the_count_back(self):
+        self.patch({'status': 'cancelled'})
+        self.patch({'status': 'in_progress'})
+        self.assertEqual(self.cancelled(), ({}, {}))
+
+    def test_cancel_with_new_items_counts_the_new_items(self):
+        self.patch({'status': 'cancelled', 'items': {
+            'item_ids': [self.bread.id],
+            'item_details': [{'id': self.bread.id, 'name': 'Bread', 'price': '2.00'}],
+        }})
+        self.assertEqual(self.cancelled(), ({(self.bread.id, self.placed_on): 1}, {self.bread.id: 1}))
+
+    def test_deleting_a_cancelled_order(self):
+        self.patch({'status': 'cancelled'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/order/delete/{self.order_number}/')
+        self.assertEqual(self.cancelled(), ({}, {}))
+
+
+class KitchenStatsTests(TestCase):
+    now = timezone.make_aware(datetime(2025, 5, 15, 12, 30))
+
+    def complete(self, order_number, minutes_ago, prep_minutes):
+        completed_at = self.now - timedelta(minutes=minutes_ago)
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderStatusTransition.objects.create(
+                order_number=order_number, from_status='in_progress', to_status='completed',
+                placed_at=completed_at - timedelta(minutes=prep_minutes), created_at=completed_at,
+            )
+
+    def test_first_completion_only(self):
+        self.complete('ORD-1', 20, 5)
+        OrderStatusTransition.objects.create(order_number='ORD-1', from_status='completed', to_status='in_progress')
+        self.complete('ORD-1', 10, 15)
+        self.assertEqual(PrepTimeBucket.objects.aggregate(total=Sum('count'))['total'], 1)
+        self.assertEqual(kitchen_stats(1, now=self.now)['completed'], 1)
+
+    def test_rolling_window(self):
+        self.complete('ORD-1', 75, 10)  # before the window
+        self.complete('ORD-2', 45, 20)  # leading partial hour, 11:30-12:00
+        self.complete('ORD-3', 20, 5)  # current hour
+        stats = kitchen_stats(1, now=self.now)
+
+        self.assertEqual(stats['completed'], 2)
+        self.assertEqual([(row['hour'], row['completed']) for row in stats['throughput']], [(11, 1), (12, 1)])
+        self.assertAlmostEqual(stats['prep_time_seconds']['p50'], 300, delta=300 * 0.05)
+        self.assertAlmostEqual(stats['prep_time_seconds']['p99'], 1200, delta=1200 * 0.05)
+
+
+class RebuildAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.items = [
+            MenuItem.objects.create(name=f'Item {i}', price=Decimal('4.50') + i, category=category, description='')
+            for i in range(4)
+        ]
+        cls.kitchen = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.kitchen)
+        self.state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.state_dir)
+
+    def run_live(self, method, url, data=None, days_ago=0):
+        moment = timezone.now() - timedelta(days=days_ago)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        return response.data
+
+    def snapshot(self):
+        return {
+            'rollups': sorted(
+                (row.date, row.hour, row.order_count, row.revenue, row.completed_count, row.rating_sum, row.rating_count)
+                for row in SalesRollup.objects.exclude(order_count=0)
+            ),
+            'daily': sorted(
+                MenuItemDailyStats.objects.exclude(order_count=0, cancelled_count=0)
+                .values_list('menu_item_id', 'date', 'order_count', 'cancelled_count')
+            ),
+            'items': sorted(MenuItem.objects.values_list('id', 'order_count', 'cancelled_order_count')),
+            'ratings': (get_rating_summary().rating_sum, get_rating_summary().rating_count),
+            'prep_times': sorted(PrepTimeBucket.objects.exclude(count=0).values_list('date', 'hour', 'bucket', 'count')),
+        }
+
+    def rebuild(self, **options):
+        call_command('rebuild_analytics', workers=1, shard_days=2, state_dir=self.state_dir, stdout=io.StringIO(), **options)
+
+    maxDiff = None
+
+    def test_rebuild_equals_incremental(self):
+        ids = [item.id for item in self.items]
+        for days_ago in (9, 4, 1, 0):
+            self.run_live('post', '/order/create/', {'items': [ids[0], ids[1], ids[1]]}, days_ago=days_ago)
+            self.run_live('post', '/order/create/', {'items': [ids[2]]}, days_ago=days_ago)
+        self.run_live('post', '/order/bulk-create/', {'orders': [{'items': [ids[3]]}, {'items': [ids[0], ids[3]]}]}, days_ago=3)
+
+        self.run_live('patch', '/order/update-status/ORD-1/', {'status': 'completed'})
+        self.run_live('patch', '/order/update-status/ORD-1/', {'status': 'in_progress'})
+        self.run_live('patch', '/order/update-status/ORD-1/', {'status': 'completed'})
+        self.run_live('patch', '/order/update-status/ORD-2/', {'status': 'cancelled'})
+        self.run_live('patch', '/order/update-status/ORD-3/', {'status': 'cancelled'})
+        self.run_live('patch', '/order/update-status/ORD-3/', {'status': 'in_progress'})
+        self.run_live('patch', '/order/patch/ORD-4/', {'status': 'cancelled', 'items': {
+            'item_ids': [ids[2], ids[2]],
+            'item_details': [{'id': ids[2], 'name': 'Item 2', 'price': '6.50'}],
+        }})
+        self.run_live('post', '/order/feedback/', {'order_number': 'ORD-5', 'star_rating': 4})
+        self.run_live('post', '/order/feedback/', {'order_number': 'ORD-6', 'star_rating': 2})
+        self.run_live('post', '/order/feedback/', {'order_number': 'ORD-5', 'star_rating': 5})
+        self.run_live('delete', '/order/delete/ORD-6/')
+        self.run_live('delete', '/order/delete/ORD-2/')
+
+        incremental = self.snapshot()
+        self.assertTrue(all(incremental.values()))
+        self.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_stale_resumed_shard_is_recomputed(self):
+        self.run_live('post', '/order/create/', {'items': [self.items[0].id]})
+        start, end = plan_shards(*order_date_range(), 2)[-1]
+        saved = compute_shard(start.isoformat(), end.isoformat())
+        self.run_live('post', '/order/create/', {'items': [self.items[0].id]})
+
+        [fresh] = refresh_shards([saved])
+        self.assertEqual(fresh['orders'], 2)
+        self.assertEqual(refresh_shards([fresh]), [fresh])
+
+    def test_orders_after_the_last_shard(self):
+        self.run_live('post', '/order/create/', {'items': [self.items[0].id]}, days_ago=5)
+        saved = [compute_shard(start.isoformat(), end.isoformat()) for start, end in plan_shards(*order_date_range(), 1)]
+        # Placed after the shards were planned, on a later day
+        self.run_live('post', '/order/create/', {'items': [self.items[1].id]})
+        saved = [result for result in saved if result['start'] < timezone.localdate().isoformat()]
+
+        self.assertEqual(sum(result['orders'] for result in refresh_shards(saved)), 2)
+
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.results = ResultCache()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def compute(self, value):
+        def compute():
+            self.calls += 1
+            self.release.wait(5)
+            return value
+        return compute
+
+    def join_refresh(self, name):
+        for thread in threading.enumerate():
+            if thread.name == f'analytics-refresh-{name}':
+                thread.join(5)
+
+    def test_concurrent_misses_share_one_computation(self):
+        values = []
+        threads = [threading.Thread(target=lambda: values.append(self.results.get('sales', self.compute(42))))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Let the others pile up behind the first computation
+        while not self.calls:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((values, self.calls), ([42] * 5, 1))
+
+    def test_stale_result_is_served_during_one_refresh(self):
+        self.release.set()
+        self.results.get('sales', self.compute(1))
+        self.release.clear()
+        _bump_generation()
+
+        # Served at once while a single background refresh runs
+        self.assertEqual(self.results.get('sales', self.compute(2)), 1)
+        self.assertEqual(self.results.get('sales', self.compute(2)), 1)
+        self.assertEqual(self.calls, 2)
+
+        self.release.set()
+        self.join_refresh('sales')
+        self.assertEqual(self.results.get('sales', self.compute(3)), 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_order_write_invalidates_results(self):
+        self.release.set()
+        self.results.get('sales', self.compute(1))
+        generation = get_generation()
+
+        # Rolled back writes keep the result
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(order_number='ORD-1', items={}, total_price=Decimal('10.00'))
+            Order.objects.create(order_number='ORD-1', items={}, total_price=Decimal('10.00'))
+        self.assertEqual(get_generation(), generation)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(order_number='ORD-2', items={}, total_price=Decimal('10.00'))
+        self.assertNotEqual(get_generation(), generation)
+        self.results.get('sales', self.compute(2))
+        self.join_refresh('sales')
+        self.assertEqual(self.results.get('sales', self.compute(3)), 2)
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.items = [
+            MenuItem.objects.create(name=f'Item {i}', price=Decimal('4.50'), category=category, description='').id
+            for i in range(4)
+        ]
+        cls.user = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for items in ([self.items[0], self.items[1]], [self.items[0]], [self.items[2], self.items[0]], [self.items[3]]):
+                self.client.post('/order/create/', {'items': items}, format='json')
+            self.client.patch('/order/update-status/ORD-1/', {'status': 'completed'}, format='json')
+            self.client.patch('/order/update-status/ORD-2/', {'status': 'cancelled'}, format='json')
+            self.client.post('/order/feedback/', {'order_number': 'ORD-1', 'star_rating': 4}, format='json')
+
+    def test_matches_the_individual_endpoints(self):
+        dashboard = self.client.get('/analytics/dashboard/').json()
+        analytics = self.client.get('/analytics/').json()
+        weekly = self.client.get('/analytics/weekly-sales/').json()
+        rating = self.client.get('/order/average-rating/').json()
+
+        self.assertEqual((dashboard['total_orders'], dashboard['active_orders'], dashboard['menu_items']),
+                         (analytics['total_orders'], analytics['active_orders'], analytics['menu_items']))
+        self.assertEqual((dashboard['total_orders'], dashboard['active_orders']), (4, 2))
+        self.assertEqual((dashboard['weekly_sales'], dashboard['week_start'], dashboard['week_end']),
+                         (weekly['weekly_sales'], weekly['week_start'], weekly['week_end']))
+        self.assertEqual((dashboard['average_rating'], dashboard['rating_count']), (rating['average_rating'], 1))
+        self.assertEqual(dashboard['cancelled_orders'], 1)
+        self.assertEqual(dashboard['cancelled_items'],
+                         MenuItem.objects.aggregate(total=Sum('cancelled_order_count'))['total'])
+        self.assertEqual(dashboard['top_items'][0], {'id': self.items[0], 'name': 'Item 0', 'order_count': 3})
+
+    def test_sections_limit_the_response(self):
+        response = self.client.get('/analytics/dashboard/', {'sections': 'active,rating'})
+        self.assertEqual(set(response.json()), {'active_orders', 'average_rating', 'rating_count'})
 
-# Create your tests here.
+        for sections in ('bogus', 'active,bogus', ','):
+            with self.subTest(sections=sections):
+                response = self.client.get('/analytics/dashboard/', {'sections': sections})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
@@ -0,0 +1,217 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters summary: approximate counts for the most
+    frequent keys using at most `capacity` counters. A key's count may be
+    overestimated by at most its recorded error.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def offer(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+        else:
+            # Replace the smallest counter, inheriting its count as error
+            smallest = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(smallest)
+            self.errors.pop(smallest)
+            self.counts[key] = floor + count
+            self.errors[key] = floor
+
+    def floor(self):
+        """
+        Upper bound on the count of a key this summary does not hold: its
+        smallest counter once full, else zero (the key was never offered).
+        """
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """
+        Fold another summary into this one, keeping the largest counters. A
+        key missing from either side may have been evicted there, so it is
+        credited that side's floor as both count and error, which keeps the
+        merged counts upper bounds with a correct error.
+        """
+        self_floor, other_floor = self.floor(), other.floor()
+        for key in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(key, self_floor) + other.counts.get(key, other_floor)
+            error = self.errors.get(key, self_floor) + other.errors.get(key, other_floor)
+            self.counts[key] = count
+            self.errors[key] = error
+        if len(self.counts) > self.capacity:
+            keep = sorted(self.counts, key=self.counts.get, reverse=True)[:self.capacity]
+            self.counts = {key: self.counts[key] for key in keep}
+            self.errors = {key: self.errors[key] for key in keep}
+        return self
+
+    def top(self, k):
+        """[(key, count, error)] for the k largest counters."""
+        keys = sorted(self.counts, key=lambda key: (-self.counts[key], key))[:k]
+        return [(key, self.counts[key], self.errors[key]) for key in keys]
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts, 'errors': self.errors}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['capacity'])
+        sketch.counts = dict(data['counts'])
+        sketch.errors = dict(data['errors'])
+        return sketch
+
+
+class SlidingWindowSketch:
+    """
+    Space-Saving summaries over a sliding window, kept as one summary per
+    `pane_seconds` pane. Memory is bounded by capacity x panes regardless of
+    how many distinct keys are offered.
+    """
+
+    def __init__(self, window_seconds=900, pane_seconds=60, capacity=64):
+        self.window_seconds = window_seconds
+        self.pane_seconds = pane_seconds
+        self.capacity = capacity
+        self._panes = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        oldest = self.oldest_pane(now)
+        for pane in [pane for pane in self._panes if pane < oldest]:
+            del self._panes[pane]
+
+    def offer_many(self, counts, now=None):
+        now = time.time() if now is None else now
+        pane = int(now // self.pane_seconds)
+        with self._lock:
+            self._expire(now)
+            sketch = self._panes.setdefault(pane, SpaceSaving(self.capacity))
+            for key, count in counts.items():
+                sketch.offer(key, count)
+
+    def oldest_pane(self, now):
+        return int(now // self.pane_seconds) - self.window_seconds // self.pane_seconds + 1
+
+    def panes(self, now=None):
+        """{pane: SpaceSaving dict} of the panes inside the window, for publishing."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return {pane: sketch.to_dict() for pane, sketch in self._panes.items()}
+
+    def snapshot(self, now=None):
+        """A single SpaceSaving summary of everything inside the window."""
+        now = time.time() if now is None else now
+        merged = SpaceSaving(self.capacity)
+        with self._lock:
+            self._expire(now)
+            for sketch in self._panes.values():
+                merged.merge(sketch)
+        return merged
+
+
+class TrendingItems:
+    """
+    Per-process "trending now" tracker. A daemon thread publishes this
+    worker's window panes to the shared cache every TRENDING_PUBLISH_INTERVAL
+    seconds (and at exit), so its last orders are shared even when traffic
+    stops. Readers merge every worker's panes that are still inside the
+    window, so the result covers all gunicorn workers and counts age out on
+    time even for workers that have died.
+
+    Each worker publishes into one of TRENDING_MAX_WORKERS slots, claimed
+    with an atomic cache.add, so readers fetch all slots in one round trip
+    and no shared worker registry has to be read and rewritten. Slots of
+    dead workers expire with their panes and are reused.
+    """
+
+    def __init__(self):
+        self.sketch = SlidingWindowSketch(
+            window_seconds=getattr(settings, 'TRENDING_WINDOW_SECONDS', 900),
+            pane_seconds=getattr(settings, 'TRENDING_PANE_SECONDS', 60),
+            capacity=getattr(settings, 'TRENDING_CAPACITY', 64),
+        )
+        self.max_workers = getattr(settings, 'TRENDING_MAX_WORKERS', 64)
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._slot = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _slot_key(self, slot):
+        return f'trending:slot:{slot}'
+
+    def record(self, counts):
+        self.sketch.offer_many(counts)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trending-publisher', daemon=True)
+                self._thread.start()
+
+    def publish(self, now=None):
+        """Store this worker's panes in its slot, claiming a free slot if needed."""
+        entry = {'worker': self.worker_id, 'panes': self.sketch.panes(now)}
+        timeout = self.sketch.window_seconds
+        with self._lock:
+            if self._slot is not None:
+                current = cache.get(self._slot_key(self._slot))
+                if current is None or current['worker'] == self.worker_id:
+                    cache.set(self._slot_key(self._slot), entry, timeout=timeout)
+                    return True
+                # The slot expired while this worker was idle and was taken
+                self._slot = None
+            for slot in range(self.max_workers):
+                if cache.add(self._slot_key(slot), entry, timeout=timeout):
+                    self._slot = slot
+                    return True
+        logger.warning("No free trending slot for worker %s; raise TRENDING_MAX_WORKERS", self.worker_id)
+        return False
+
+    def flush(self):
+        """Publish at exit, if this worker recorded anything."""
+        if self._thread is not None:
+            self.publish()
+
+    def _run(self):
+        interval = getattr(settings, 'TRENDING_PUBLISH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Failed to publish trending items")
+
+    def top(self, k, now=None):
+        """Merge the panes of every worker (this one's live) inside the window and rank."""
+        now = time.time() if now is None else now
+        oldest = self.sketch.oldest_pane(now)
+        merged = self.sketch.snapshot(now)
+        published = cache.get_many([self._slot_key(slot) for slot in range(self.max_workers)])
+        for entry in published.values():
+            if entry['worker'] == self.worker_id:
+                continue
+            for pane, data in entry['panes'].items():
+                if pane >= oldest:
+                    merged.merge(SpaceSaving.from_dict(data))
+        return merged.top(k)
+
+
+trending_items = TrendingItems()
+atexit.register(trending_items.flush)
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import AnalyticsView, WeeklySalesView, MenuItemPopularityView
+from .views import AnalyticsView, WeeklySalesView, MenuItemPopularityView, TrendingItemsView, DashboardView, KitchenStatsView
 
 urlpatterns = [
     path('', AnalyticsView.as_view(), name='analytics'),
     path('weekly-sales/', WeeklySalesView.as_view(), name='weekly-sales'),
     path('menu-popularity/', MenuItemPopularityView.as_view(), name='menu-popularity'),
+    path('trending/', TrendingItemsView.as_view(), name='trending-items'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('kitchen/', KitchenStatsView.as_view(), name='kitchen-stats'),
 ] 
\ No newline at end of file
@@ -1,13 +1,22 @@
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework import status
 from django.utils import timezone
 from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
 from order.models import Order
+from order.ratings import get_rating_summary
 from menuitem.models import MenuItem
-from django.db.models import Count, F, ExpressionWrapper, FloatField, Sum
-from django.db.models.functions import TruncDate
+from menuitem.stats import top_items, window_start, window_totals
+from menuitem.cache import menu_cache
+from .models import SalesRollup
+from .trending import trending_items
+from .cache import analytics_cache
+from .kitchen import WINDOWS, kitchen_stats
+from django.db.models import Count, F, ExpressionWrapper, FloatField, Q, Sum
 
 # Create your views here.
 
@@ -15,15 +24,17 @@ class AnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        return Response(analytics_cache.get(f'analytics:{timezone.localdate():%Y-%m}', self.compute))
+
+    def compute(self):
         # Get the first day of current month
         today = timezone.now()
         first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
         # Get total orders from start of month until now
-        total_orders = Order.objects.filter(
-            created_at__gte=first_day_of_month,
-            created_at__lte=today
-        ).count()
+        total_orders = SalesRollup.objects.filter(
+            date__gte=first_day_of_month.date()
+        ).aggregate(total=Sum('order_count'))['total'] or 0
 
         # Get active (in_progress) orders
         active_orders = Order.objects.filter(status='in_progress').count()
@@ -31,29 +42,30 @@ class AnalyticsView(APIView):
         # Get total menu items
         menu_items = MenuItem.objects.count()
 
-        return Response({
+        return {
             'total_orders': total_orders,
             'active_orders': active_orders,
             'menu_items': menu_items
-        })
+        }
 
 class WeeklySalesView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        return Response(analytics_cache.get(f'weekly-sales:{timezone.localdate()}', self.compute))
+
+    def compute(self):
         # Get the start of the current week (Monday)
         today = timezone.now()
         start_of_week = today - timedelta(days=today.weekday())
         start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
 
-        # Get orders for each day of the week
-        daily_orders = Order.objects.filter(
-            created_at__gte=start_of_week,
-            created_at__lte=today
-        ).annotate(
-            date=TruncDate('created_at')
+        # Get orders for each day of the week from the hourly rollups
+        daily_orders = SalesRollup.objects.filter(
+            date__gte=start_of_week.date(),
+            date__lte=today.date()
         ).values('date').annotate(
-            count=Count('id')
+            count=Sum('order_count')
         ).order_by('date')
 
         # Create a dictionary with all days of the week initialized to 0
@@ -65,33 +77,43 @@ class WeeklySalesView(APIView):
             day_name = order_data['date'].strftime('%A')
             sales_data[day_name] = order_data['count']
 
-        return Response({
+        return {
             'weekly_sales': sales_data,
             'week_start': start_of_week.date(),
             'week_end': today.date()
-        })
+        }
 
 class MenuItemPopularityView(APIView):
+    """
+    Top 4 items by quantity ordered in a window. Query parameter 'period' can
+    be 'today', 'week' (last 7 days) or 'month' (this calendar month, default).
+    """
     permission_classes = [IsAuthenticated]
+    periods = {'today': 'today', 'week': 'week', 'month': 'this_month'}
 
     def get(self, request):
-        # Get the first day of current month
-        today = timezone.now()
-        first_day_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        period = request.query_params.get('period', 'month')
+        if period not in self.periods:
+            return Response({"error": "Invalid period. Must be 'today', 'week' or 'month'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(analytics_cache.get(
+            f'menu-popularity:{period}:{timezone.localdate()}', lambda: self.compute(period)
+        ))
+
+    def compute(self, period):
+        start_date = window_start(self.periods[period])
 
-        # Get total items ordered this month (sum of all order_count)
-        total_items_ordered = MenuItem.objects.aggregate(
-            total=Sum('order_count')
-        )['total'] or 0
+        # Get total items ordered in the window from the daily item buckets
+        total_items_ordered = window_totals(start_date)['order_count']
 
         if total_items_ordered == 0:
-            return Response({
-                'message': 'No items ordered this month',
+            return {
+                'message': f'No items ordered {"this month" if period == "month" else "in this period"}',
                 'popular_items': []
-            })
+            }
 
-        # Get menu items with their order counts
-        popular_items = MenuItem.objects.values('name', 'order_count').order_by('-order_count')[:4]
+        # Get the most ordered menu items in the window
+        popular_items = top_items(start_date, 4)
 
         # Calculate percentages and format the response
         formatted_items = [
@@ -103,7 +125,147 @@ class MenuItemPopularityView(APIView):
             for item in popular_items
         ]
 
-        return Response({
+        return {
             'total_items_ordered': total_items_ordered,
             'popular_items': formatted_items
+        }
+
+class TrendingItemsView(APIView):
+    """
+    Items ordered most over the last TRENDING_WINDOW_SECONDS across all
+    workers, from in-memory heavy-hitter sketches. Counts are approximate:
+    each may be overestimated by up to its reported error.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', 5)), 20)
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        menu = menu_cache.snapshot()
+        items = [
+            {
+                'id': item_id,
+                'name': menu[item_id].name,
+                'count': count,
+                'error': error,
+            }
+            for item_id, count, error in trending_items.top(limit * 2)
+            if item_id in menu
+        ][:limit]
+
+        return Response({
+            'window_minutes': trending_items.sketch.window_seconds // 60,
+            'trending_items': items
         })
+
+class DashboardView(APIView):
+    """
+    All admin dashboard KPIs in one response, computed with conditional
+    aggregation: one query over orders, one over menu items, one for the top
+    items and the rating summary row. Query parameter 'sections' (comma-separated) limits the
+    response to some of: orders, active, menu, weekly_sales, top_items,
+    rating, cancelled.
+    """
+    permission_classes = [IsAuthenticated]
+    sections = ['orders', 'active', 'menu', 'weekly_sales', 'top_items', 'rating', 'cancelled']
+    week_days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+    def get(self, request):
+        requested = request.query_params.get('sections')
+        sections = self.sections
+        if requested:
+            names = set(requested.split(','))
+            sections = [section for section in self.sections if section in names]
+            if names - set(self.sections):
+                return Response({"error": f"sections must be a subset of: {', '.join(self.sections)}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return Response(analytics_cache.get(
+            f'dashboard:{",".join(sections)}:{timezone.localdate()}', lambda: self.compute(sections)
+        ))
+
+    def compute(self, sections):
+        now = timezone.now()
+        today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        first_day_of_month = today.replace(day=1)
+        start_of_week = today - timedelta(days=today.weekday())
+        data = {}
+
+        # One pass over the orders each KPI needs, with a filtered aggregate per KPI
+        aggregates = {}
+        conditions = []
+        if 'orders' in sections:
+            aggregates['total_orders'] = Count('id', filter=Q(created_at__gte=first_day_of_month))
+            conditions.append(Q(created_at__gte=first_day_of_month))
+        if 'active' in sections:
+            aggregates['active_orders'] = Count('id', filter=Q(status='in_progress'))
+            conditions.append(Q(status='in_progress'))
+        if 'weekly_sales' in sections:
+            for offset, day in enumerate(self.week_days):
+                day_start = start_of_week + timedelta(days=offset)
+                aggregates[day] = Count('id', filter=Q(created_at__gte=day_start, created_at__lt=day_start + timedelta(days=1)))
+            conditions.append(Q(created_at__gte=start_of_week))
+        if 'cancelled' in sections:
+            aggregates['cancelled_orders'] = Count('id', filter=Q(status='cancelled'))
+            conditions.append(Q(status='cancelled'))
+
+        if aggregates:
+            # Restrict the scan to rows matching at least one KPI, so each
+            # indexed predicate can be used instead of reading all history
+            orders = Order.objects.filter(reduce(or_, conditions)).aggregate(**aggregates)
+            if 'orders' in sections:
+                data['total_orders'] = orders['total_orders']
+            if 'active' in sections:
+                data['active_orders'] = orders['active_orders']
+            if 'weekly_sales' in sections:
+                data['weekly_sales'] = {day: orders[day] for day in self.week_days}
+                data['week_start'] = start_of_week.date()
+                data['week_end'] = today.date()
+            if 'cancelled' in sections:
+                data['cancelled_orders'] = orders['cancelled_orders']
+
+        if 'rating' in sections:
+            # Running totals; an OR over the partial rated-order index would
+            # force the order query above into a full scan
+            summary = get_rating_summary()
+            data['average_rating'] = summary.average
+            data['rating_count'] = summary.rating_count
+
+        if 'menu' in sections or 'cancelled' in sections:
+            menu = MenuItem.objects.aggregate(
+                menu_items=Count('id'),
+                cancelled_items=Sum('cancelled_order_count'),
+            )
+            if 'menu' in sections:
+                data['menu_items'] = menu['menu_items']
+            if 'cancelled' in sections:
+                data['cancelled_items'] = menu['cancelled_items'] or 0
+
+        if 'top_items' in sections:
+            data['top_items'] = list(
+                MenuItem.objects.filter(order_count__gt=0)
+                .order_by('-order_count', 'id')
+                .values('id', 'name', 'order_count')[:5]
+            )
+
+        return data
+
+class KitchenStatsView(APIView):
+    """
+    Kitchen performance over a rolling window (query parameter 'window': 1h,
+    6h, 24h, 7d or 30d; default 24h): orders completed per hour, current
+    queue depth and p50/p90/p99 prep time, read from the prep time histogram
+    and the order status transitions (see analytics.kitchen).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        window = request.query_params.get('window', '24h')
+        if window not in WINDOWS:
+            return Response({"error": f"window must be one of: {', '.join(WINDOWS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        data = analytics_cache.get(f'kitchen:{window}', lambda: kitchen_stats(WINDOWS[window]))
+        return Response(dict(data, window=window))
+
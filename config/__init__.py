@@ -0,0 +1,4 @@
+# Load the Celery app with Django so shared tasks bind to it
+from user_authentication.mail.celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -2,6 +2,9 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (e.g. gunicorn with uvicorn workers) for the
+long-lived order feed endpoints (order/feed/ and order/feed/stream/), which
+are async views and would otherwise tie up a sync worker per client.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
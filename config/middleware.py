@@ -0,0 +1,112 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_shape(sql):
+    """SQL with literals and IN-list lengths folded, so N+1 queries compare equal."""
+    return _NUMBER.sub('N', _IN_LIST.sub('IN (...)', sql))
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper() hook counting queries, their total time and
+    how often each query shape ran.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold=None):
+        """[(shape, times)] of shapes run at least `threshold` times, most frequent first."""
+        threshold = threshold or settings.QUERY_REPEAT_THRESHOLD
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the queries and SQL time of each request and logs query shapes
+    repeated QUERY_REPEAT_THRESHOLD or more times (likely N+1 patterns). In
+    DEBUG the numbers are also returned as X-Query-* response headers.
+
+    The recorder is installed in process_view() on the connection of the
+    thread that runs the view, as under ASGI that is not necessarily the
+    thread running this middleware. Queries made by middleware before the
+    view are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            recorder = self.uninstall(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            recorder = self.uninstall(request)
+        return self.report(request, response, recorder)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = QueryRecorder()
+        # connections[...] is the connection of the current thread
+        request._query_recording = (connections[DEFAULT_DB_ALIAS], recorder)
+        request._query_recording[0].execute_wrappers.append(recorder)
+
+    def uninstall(self, request):
+        """Remove the recorder process_view() installed, returning it (None if the view never ran)."""
+        recording = getattr(request, '_query_recording', None)
+        if recording is None:
+            return None
+        db, recorder = recording
+        db.execute_wrappers.remove(recorder)
+        return recorder
+
+    def report(self, request, response, recorder):
+        if recorder is None:
+            return response
+        repeated = recorder.repeated()
+        for shape, times in repeated:
+            logger.warning("%s %s ran the same query %d times: %s", request.method, request.path, times, shape)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time'] = f'{recorder.duration * 1000:.1f}ms'
+            if repeated:
+                response['X-Query-Repeated'] = ', '.join(str(times) for _, times in repeated)
+        return response
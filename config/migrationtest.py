@@ -0,0 +1,37 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MigrationTestCase(TransactionTestCase):
+    """
+    Runs data migrations against a populated database: migrates back to
+    `migrate_from` (where `(app, None)` unapplies an app), calls setUpBeforeMigration(apps) with the historical
+    models to create the old data, then migrates to `migrate_to` and leaves
+    the historical models of that state in `self.apps`. The database is
+    migrated forward again afterwards.
+    """
+    migrate_from = []
+    migrate_to = []
+
+    def setUp(self):
+        super().setUp()
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.setUpBeforeMigration(self._state(executor, self.migrate_from).apps)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        self.apps = self._state(executor, self.migrate_to).apps
+
+    def _state(self, executor, targets):
+        # (app, None) unapplies an app, so it adds nothing to the state
+        return executor.loader.project_state([target for target in targets if target[1] is not None])
+
+    def setUpBeforeMigration(self, apps):
+        pass
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
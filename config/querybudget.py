@@ -0,0 +1,76 @@
+from collections import namedtuple
+from importlib import import_module
+
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .middleware import QueryRecorder
+
+QueryBudget = namedtuple(
+    'QueryBudget', ['name', 'max_queries', 'method', 'args', 'data', 'query'],
+    defaults=('get', (), None, ''),
+)
+
+
+def url_names(patterns):
+    """Names of every URL pattern in `patterns`, including included ones."""
+    names = set()
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            names |= url_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin failing when a request runs more queries than the budget
+    declared for its URL name.
+
+    Subclasses set `urlconf` (module path), `prefix` (where it is mounted),
+    `budgets` (QueryBudget list, run in order against the same data) and
+    `exempt` URL names. Every named URL of the urlconf needs a budget or an
+    exemption, so new endpoints cannot skip the check. Caches are cleared
+    before each request, so budgets hold for cold requests, and on-commit
+    callbacks run inside the count, since they run within the request too.
+    """
+    urlconf = None
+    prefix = ''
+    budgets = []
+    exempt = ()
+    user = None
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        if self.user is not None:
+            self.client.force_authenticate(self.user)
+
+    def test_every_url_has_a_budget(self):
+        missing = url_names(import_module(self.urlconf).urlpatterns) - {budget.name for budget in self.budgets} - set(self.exempt)
+        self.assertFalse(missing, f"No query budget for: {', '.join(sorted(missing))}")
+
+    def test_query_budgets(self):
+        for budget in self.budgets:
+            url = self.prefix + reverse(budget.name, urlconf=self.urlconf, args=budget.args)
+            if budget.query:
+                url += f'?{budget.query}'
+            with self.subTest(budget.method.upper(), url=url):
+                cache.clear()
+                recorder = QueryRecorder()
+                kwargs = {} if budget.method == 'get' else {'format': 'json'}
+                with connection.execute_wrapper(recorder), self.captureOnCommitCallbacks(execute=True):
+                    response = getattr(self.client, budget.method)(url, budget.data, **kwargs)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400, f"{budget.method.upper()} {url}: {response.status_code}")
+
+                repeated = ''.join(f"\n  {times}x {shape}" for shape, times in recorder.repeated(2))
+                self.assertLessEqual(
+                    recorder.count, budget.max_queries,
+                    f"{budget.method.upper()} {url} ran {recorder.count} queries "
+                    f"(budget {budget.max_queries}).{' Repeated:' if repeated else ''}{repeated}"
+                )
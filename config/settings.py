@@ -13,6 +13,7 @@ from pathlib import Path
 from os import environ,path
 from datetime import timedelta
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from the .env file
@@ -36,6 +37,9 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["*"]
 
+# True under `manage.py test`
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Application definition
 
@@ -53,6 +57,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'rest_framework_simplejwt',
     'drf_yasg',
+    'core',
     'user_authentication',
     'menuitem',
     'order',
@@ -74,6 +79,7 @@ REST_FRAMEWORK = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -201,6 +207,10 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Origin media URLs are made absolute on (e.g. "https://api.example.com").
+# Unset, they use the host of each request, and the pre-rendered menu list
+# is kept per host.
+MEDIA_BASE_URL = environ.get('MEDIA_BASE_URL', '')
 
 
 # Default primary key field type
@@ -229,3 +239,71 @@ EMAIL_HOST_USER = environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = environ.get('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+
+# Order number allocation. Each worker reserves ORDER_NUMBER_BLOCK_SIZE numbers
+# at a time; values above 1 remove the per-order counter UPDATE at the cost of
+# gaps and interleaving between workers. ORDER_NUMBER_RESET may be 'never' or
+# 'daily' (daily numbers look like ORD-20250515-1).
+ORDER_NUMBER_BLOCK_SIZE = int(environ.get('ORDER_NUMBER_BLOCK_SIZE', 1))
+ORDER_NUMBER_RESET = environ.get('ORDER_NUMBER_RESET', 'never')
+
+# MenuItem.order_count updates. With write-behind enabled, increments are
+# buffered per process and flushed every MENU_ORDER_COUNT_FLUSH_INTERVAL seconds
+# instead of being written inside each order transaction.
+MENU_ORDER_COUNT_WRITE_BEHIND = environ.get('MENU_ORDER_COUNT_WRITE_BEHIND', 'False') == 'True'
+MENU_ORDER_COUNT_FLUSH_INTERVAL = float(environ.get('MENU_ORDER_COUNT_FLUSH_INTERVAL', 5))
+
+# Cache used for the menu version and other cross-request state. The default
+# local-memory cache is per process, so menu caches then check the menu
+# version in the database on every use; run multiple workers against a shared
+# backend (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://localhost:6379) to check it in the cache instead.
+CACHES = {
+    "default": {
+        "BACKEND": environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": environ.get("CACHE_LOCATION", "foodorder"),
+    }
+}
+
+# Order feed changes younger than this many seconds are held back, so a
+# change whose transaction commits late is never skipped by a client cursor.
+# Keep it above the longest order write transaction.
+ORDER_FEED_SETTLE_SECONDS = float(environ.get('ORDER_FEED_SETTLE_SECONDS', 1))
+
+# Seconds GetOrderView payloads stay cached; order writes invalidate them early.
+ORDER_STATUS_CACHE_TTL = int(environ.get('ORDER_STATUS_CACHE_TTL', 5))
+
+# "Trending now" sketches: window length, pane size, counters kept per pane,
+# how often each worker publishes its panes to the shared cache and how many
+# workers can publish at once.
+TRENDING_WINDOW_SECONDS = int(environ.get('TRENDING_WINDOW_SECONDS', 900))
+TRENDING_PANE_SECONDS = int(environ.get('TRENDING_PANE_SECONDS', 60))
+TRENDING_CAPACITY = int(environ.get('TRENDING_CAPACITY', 64))
+TRENDING_PUBLISH_INTERVAL = int(environ.get('TRENDING_PUBLISH_INTERVAL', 5))
+TRENDING_MAX_WORKERS = int(environ.get('TRENDING_MAX_WORKERS', 64))
+
+# Analytics result cache: results are fresh for ANALYTICS_CACHE_TTL seconds
+# (or until orders change) and served stale while refreshing for up to
+# ANALYTICS_CACHE_STALE_TTL seconds.
+ANALYTICS_CACHE_TTL = int(environ.get('ANALYTICS_CACHE_TTL', 60))
+ANALYTICS_CACHE_STALE_TTL = int(environ.get('ANALYTICS_CACHE_STALE_TTL', 300))
+
+# Seconds the pre-rendered public menu list is reused before being rebuilt to
+# pick up new order counts; menu writes rebuild it immediately.
+MENU_PAYLOAD_TTL = int(environ.get('MENU_PAYLOAD_TTL', 30))
+
+# Per-request query counting (config.middleware), off unless enabled. Query
+# shapes run at least QUERY_REPEAT_THRESHOLD times in one request are logged
+# as likely N+1s.
+QUERY_INSTRUMENTATION = environ.get('QUERY_INSTRUMENTATION', 'False') == 'True'
+QUERY_REPEAT_THRESHOLD = int(environ.get('QUERY_REPEAT_THRESHOLD', 5))
+
+# Celery (app in user_authentication/mail/celery.py). Tasks go to the broker;
+# tests run them eagerly in the calling process, and so can local development
+# without a broker by setting CELERY_TASK_ALWAYS_EAGER=True.
+CELERY_BROKER_URL = environ.get('CELERY_BROKER_URL', '')
+CELERY_TASK_ALWAYS_EAGER = environ.get('CELERY_TASK_ALWAYS_EAGER', str(TESTING)) == 'True'
+CELERY_TASK_EAGER_PROPAGATES = environ.get('CELERY_TASK_EAGER_PROPAGATES', str(TESTING)) == 'True'
+
+# Widths (px) of the resized WebP and JPEG copies made of menu item images.
+MENU_IMAGE_WIDTHS = [int(width) for width in environ.get('MENU_IMAGE_WIDTHS', '320,640,1280').split(',')]
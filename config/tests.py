@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from menuitem.models import Category, MenuItem
+
+
+@override_settings(QUERY_INSTRUMENTATION=True, DEBUG=True)
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.item = MenuItem.objects.create(name='Soup', price=Decimal('3.00'), category=category, description='')
+
+    def setUp(self):
+        self.url = reverse('menuitem-detail', args=[self.item.id])
+
+    def test_counts_view_queries(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('X-Query-Time', response)
+        self.assertNotIn('X-Query-Repeated', response)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    async def test_counts_view_queries_under_asgi(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Query-Count'], '1')
+
+    @override_settings(QUERY_REPEAT_THRESHOLD=1)
+    def test_reports_repeated_queries(self):
+        with self.assertLogs('config.middleware', 'WARNING'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Query-Repeated'], '1')
+
+    @override_settings(DEBUG=False)
+    def test_no_headers_outside_debug(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Query-Count', response)
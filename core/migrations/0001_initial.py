@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+def copy_sequences(apps, schema_editor):
+    # Carry over the counters kept by the order app so far
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    Sequence = apps.get_model('core', 'Sequence')
+    Sequence.objects.bulk_create(
+        Sequence(key=key, last_value=last_value)
+        for key, last_value in OrderSequence.objects.values_list('key', 'last_value')
+    )
+
+
+def copy_sequences_back(apps, schema_editor):
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    Sequence = apps.get_model('core', 'Sequence')
+    OrderSequence.objects.bulk_create(
+        OrderSequence(key=key, last_value=last_value)
+        for key, last_value in Sequence.objects.values_list('key', 'last_value')
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        # Both counters must be seeded before they are copied
+        ('menuitem', '0005_menu_change_version'),
+        ('order', '0013_status_transition_placed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(copy_sequences, copy_sequences_back),
+    ]
@@ -0,0 +1,60 @@
+from django.db import IntegrityError, connection, models, transaction
+
+
+class Sequence(models.Model):
+    """
+    Named counter holding the last value handed out for its key, shared by
+    the apps: one row per order number scope (e.g. 'orders',
+    'orders:20250515' or 'orders:KIOSK1') plus the menu change version
+    ('menu-changes').
+    """
+    key = models.CharField(max_length=64, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def _increment(cls, key, size):
+        """Add `size` to the counter and return its new value, or None if it has no row."""
+        if connection.vendor == 'postgresql' or (
+            connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+        ):
+            # UPDATE ... RETURNING bumps and reads the counter in one statement
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET last_value = last_value + %s WHERE key = %s RETURNING last_value',
+                    [size, key],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+        if not cls.objects.filter(key=key).update(last_value=models.F('last_value') + size):
+            return None
+        return cls.objects.filter(key=key).values_list('last_value', flat=True).get()
+
+    @classmethod
+    def reserve(cls, key, size=1):
+        """
+        Reserve `size` consecutive values of the sequence `key` and return the
+        first one. The counter row is bumped with a single UPDATE, so
+        concurrent callers are serialized by the row lock instead of racing
+        on a max-scan. Inside an outer transaction the lock is held until it
+        commits; no savepoint is needed, as nothing here is rolled back alone.
+        """
+        with transaction.atomic(savepoint=False):
+            last_value = cls._increment(key, size)
+            if last_value is None:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(key=key, last_value=size)
+                    return 1
+                except IntegrityError:
+                    # Another worker created the row first
+                    last_value = cls._increment(key, size)
+        return last_value - size + 1
+
+    @classmethod
+    def current(cls, key):
+        """The last value handed out for `key`, 0 if none was."""
+        return cls.objects.filter(key=key).values_list('last_value', flat=True).first() or 0
+
+    def __str__(self):
+        return f"{self.key}={self.last_value}"
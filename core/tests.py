@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+from config.migrationtest import MigrationTestCase
+
+
+class SequenceMigrationTests(MigrationTestCase):
+    migrate_from = [('menuitem', '0004_menuitem_image_variants'), ('order', '0013_status_transition_placed_at'),
+                    ('core', None)]
+    migrate_to = [('core', '0001_initial'), ('order', '0014_delete_ordersequence')]
+
+    def setUpBeforeMigration(self, apps):
+        Category = apps.get_model('menuitem', 'Category')
+        MenuItem = apps.get_model('menuitem', 'MenuItem')
+        OrderSequence = apps.get_model('order', 'OrderSequence')
+        category = Category.objects.create(name='Mains')
+        for name in ('Soup', 'Bread'):
+            MenuItem.objects.create(name=name, price=Decimal('2.00'), category=category, description='')
+        OrderSequence.objects.update_or_create(key='orders', defaults={'last_value': 41})
+
+    def test_counters_survive_the_move_to_core(self):
+        Sequence = self.apps.get_model('core', 'Sequence')
+        self.assertEqual(dict(Sequence.objects.values_list('key', 'last_value')), {
+            'orders': 41,
+            # One version per existing category and item
+            'menu-changes': 3,
+        })
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.models import Sequence
+from .models import MENU_CHANGE_KEY, MenuItem
+
+MENU_VERSION_KEY = 'menu:version'
+
+MenuEntry = namedtuple('MenuEntry', ['name', 'price', 'is_available', 'category_id'])
+
+
+def cache_is_shared():
+    """Whether the default cache is seen by every worker (not per process)."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def get_menu_version():
+    """
+    Return the current menu version, an opaque token that changes with every
+    committed menu write, in every worker.
+
+    With a shared cache (e.g. Redis) it is read from there: if the key is
+    evicted it is re-seeded with a fresh timestamp, which every worker sees
+    as a change. A per-process cache (the default LocMemCache) would only
+    see this worker's writes, so the committed menu change version counter
+    is read from the database instead, at the cost of one indexed query.
+    """
+    if not cache_is_shared():
+        return Sequence.current(MENU_CHANGE_KEY)
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    """
+    Invalidate every worker's menu data after a menu write, through the
+    shared cache. Without one, the change version counter the write
+    reserved already does this.
+    """
+    try:
+        return cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(MENU_VERSION_KEY, version, timeout=None)
+        return version
+
+
+class MenuCache:
+    """
+    Process-local map of menu item id -> MenuEntry, reloaded in one query
+    whenever the menu version changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self):
+        """Return the current {id: MenuEntry} mapping, reloading it if stale."""
+        version = get_menu_version()
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                return self._entries
+            self.misses += 1
+            self._entries = {
+                item_id: MenuEntry(name, price, is_available, category_id)
+                for item_id, name, price, is_available, category_id in MenuItem.objects.values_list(
+                    'id', 'name', 'price', 'is_available', 'category_id'
+                )
+            }
+            self._version = version
+            return self._entries
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+menu_cache = MenuCache()
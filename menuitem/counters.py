@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import MenuItem, MenuItemDailyStats
+
+logger = logging.getLogger(__name__)
+
+
+def _increment(counts, key='id'):
+    """CASE expression evaluating to counts[row.<key>] for each row."""
+    return Case(
+        *[When(**{key: item_id}, then=Value(quantity)) for item_id, quantity in counts.items()],
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+def _add(field, counts, key='id'):
+    """`field` plus counts[row.<key>], never below zero (counts may be negative)."""
+    return Greatest(F(field) + _increment(counts, key=key), Value(0))
+
+
+def _apply_daily_counts(counts, date, field):
+    """
+    Add counts to `field` of the items' buckets for `date`: one INSERT for
+    missing buckets and one UPDATE, however many items there are.
+    """
+    if not counts:
+        return
+    MenuItemDailyStats.objects.bulk_create(
+        [MenuItemDailyStats(menu_item_id=item_id, date=date) for item_id in counts],
+        ignore_conflicts=True,
+    )
+    MenuItemDailyStats.objects.filter(date=date, menu_item_id__in=counts).update(**{
+        field: _add(field, counts, key='menu_item_id')
+    })
+
+
+def _existing_only(counts, updated):
+    """Drop ids of deleted menu items, which an UPDATE of `updated` rows skipped."""
+    if updated == len(counts):
+        return counts
+    existing = set(MenuItem.objects.filter(id__in=counts).values_list('id', flat=True))
+    return {item_id: quantity for item_id, quantity in counts.items() if item_id in existing}
+
+
+def apply_order_counts(counts, date=None):
+    """
+    Add {menu_item_id: quantity} to MenuItem.order_count and to the items'
+    daily buckets for `date` (default today), however many items the mapping
+    contains.
+    """
+    counts = {item_id: quantity for item_id, quantity in counts.items() if quantity}
+    if not counts:
+        return 0
+    updated = MenuItem.objects.filter(id__in=counts).update(order_count=_add('order_count', counts))
+    _apply_daily_counts(_existing_only(counts, updated), date or timezone.localdate(), 'order_count')
+    return updated
+
+
+def apply_cancelled_counts(counts, date=None):
+    """
+    Add {menu_item_id: quantity} to MenuItem.cancelled_order_count and to the
+    items' daily buckets for `date` (default today). Negative quantities take
+    back cancellations, e.g. of an order that is no longer cancelled.
+    """
+    counts = {item_id: quantity for item_id, quantity in counts.items() if quantity and item_id is not None}
+    if not counts:
+        return 0
+    updated = MenuItem.objects.filter(id__in=counts).update(cancelled_order_count=_add('cancelled_order_count', counts))
+    _apply_daily_counts(_existing_only(counts, updated), date or timezone.localdate(), 'cancelled_count')
+    return updated
+
+
+class OrderCountBuffer:
+    """
+    Process-local write-behind buffer for order_count increments.
+
+    Increments are summed in memory per day and flushed by a daemon thread
+    every MENU_ORDER_COUNT_FLUSH_INTERVAL seconds, so checkouts never lock the
+    popular MenuItem rows. Anything still pending is flushed at exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(Counter)  # date -> {menu_item_id: quantity}
+        self._thread = None
+
+    def add(self, counts, date=None):
+        with self._lock:
+            self._pending[date or timezone.localdate()].update(counts)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='order-count-flusher', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+        flushed = 0
+        while pending:
+            date, counts = pending.popitem()
+            try:
+                with transaction.atomic():
+                    flushed += apply_order_counts(counts, date)
+            except Exception:
+                # Put the increments back so the next flush retries them
+                with self._lock:
+                    self._pending[date].update(counts)
+                    for date, counts in pending.items():
+                        self._pending[date].update(counts)
+                raise
+        return flushed
+
+    def _run(self):
+        interval = getattr(settings, 'MENU_ORDER_COUNT_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered order counts")
+            finally:
+                connections.close_all()
+
+
+order_count_buffer = OrderCountBuffer()
+atexit.register(order_count_buffer.flush)
+
+
+def record_order_counts(counts):
+    """
+    Count an order's items towards MenuItem.order_count and today's buckets.
+
+    Applied inside the caller's transaction by default; with
+    MENU_ORDER_COUNT_WRITE_BEHIND the counts are buffered once the
+    transaction commits and written by the background flusher instead.
+    """
+    counts = Counter(counts)
+    date = timezone.localdate()
+    if getattr(settings, 'MENU_ORDER_COUNT_WRITE_BEHIND', False):
+        transaction.on_commit(lambda: order_count_buffer.add(counts, date))
+    else:
+        apply_order_counts(counts, date)
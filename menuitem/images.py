@@ -0,0 +1,59 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_widths(original_width):
+    """Configured widths narrower than the original; the original width if none are."""
+    return [width for width in sorted(settings.MENU_IMAGE_WIDTHS) if width < original_width] or [original_width]
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def on_white(image):
+    """An RGBA image flattened onto a white background, for formats without alpha."""
+    background = Image.new('RGBA', image.size, 'white')
+    return Image.alpha_composite(background, image).convert('RGB')
+
+
+def build_variants(image):
+    """
+    Save resized WebP and JPEG copies of an image field's file next to it and
+    return them as {"source": name, "webp": {width: name}, "jpeg": {...}}.
+    Transparency is kept in the WebP copies; JPEG copies get a white background.
+    """
+    with image.open('rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original = original.convert('RGBA' if has_alpha(original) else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    variants = {'source': image.name}
+    for key, (image_format, options) in VARIANT_FORMATS.items():
+        variants[key] = {}
+        for width in variant_widths(original.width):
+            height = max(round(original.height * width / original.width), 1)
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            if image_format == 'JPEG' and resized.mode == 'RGBA':
+                resized = on_white(resized)
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            name = default_storage.save(f'menu_images/variants/{stem}-{width}.{key}', ContentFile(buffer.getvalue()))
+            variants[key][str(width)] = name
+    return variants
+
+
+def delete_variants(variants):
+    for key in VARIANT_FORMATS:
+        for name in (variants or {}).get(key, {}).values():
+            default_storage.delete(name)
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:45
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_daily_stats(apps, schema_editor):
+    # Rebuild per-day item counts from the orders' items JSON (order lines are
+    # only backfilled later), counting charged items on the order's local date
+    Order = apps.get_model('order', 'Order')
+    MenuItem = apps.get_model('menuitem', 'MenuItem')
+    MenuItemDailyStats = apps.get_model('menuitem', 'MenuItemDailyStats')
+    menu_item_ids = set(MenuItem.objects.values_list('id', flat=True))
+    totals = Counter()
+    for created_at, items in Order.objects.values_list('created_at', 'items').iterator():
+        items = items if isinstance(items, dict) else {}
+        charged = set()
+        for detail in items.get('item_details') or []:
+            try:
+                charged.add(int(detail['id']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        date = timezone.localdate(created_at)
+        for item_id in items.get('item_ids') or []:
+            try:
+                item_id = int(item_id)
+            except (TypeError, ValueError):
+                continue
+            if item_id in charged and item_id in menu_item_ids:
+                totals[(item_id, date)] += 1
+    MenuItemDailyStats.objects.bulk_create([
+        MenuItemDailyStats(menu_item_id=item_id, date=date, order_count=total)
+        for (item_id, date), total in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuitem', '0002_menuitem_description'),
+        ('order', '0005_orderline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='menuitem.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'menu_item'], name='menuitem_daily_stats_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'date'), name='menuitem_daily_stats_unique')],
+            },
+        ),
+        migrations.RunPython(populate_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:59
+
+from django.db import migrations, models
+
+
+def seed_change_version(apps, schema_editor):
+    # Existing categories and items get the first versions, in id order
+    Category = apps.get_model('menuitem', 'Category')
+    MenuItem = apps.get_model('menuitem', 'MenuItem')
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    last_value = 0
+    for model in (Category, MenuItem):
+        for object_id in model.objects.order_by('id').values_list('id', flat=True).iterator():
+            last_value += 1
+            model.objects.filter(id=object_id).update(change_version=last_value)
+    OrderSequence.objects.update_or_create(key='menu-changes', defaults={'last_value': last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menuitem', '0004_menuitem_image_variants'),
+        ('order', '0003_order_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('item', 'Menu item'), ('category', 'Category')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('change_version', models.PositiveBigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='change_version',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='change_version',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(seed_change_version, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,40 @@
-from django.db import models
+from django.db import models, transaction
 
-class Category(models.Model):
+from core.models import Sequence
+
+MENU_CHANGE_KEY = 'menu-changes'
+
+class MenuChangeTracked(models.Model):
+    """
+    Stamps every save with the next menu change version, allocated inside the
+    saving transaction so versions become visible in commit order. Clients
+    sync with /menu/changes/?since=<version>.
+    """
+    change_version = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            self.change_version = Sequence.reserve(MENU_CHANGE_KEY)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_version'}
+            super().save(*args, **kwargs)
+
+class Category(MenuChangeTracked):
     name = models.CharField(max_length=100)
 
     def __str__(self):
         return self.name
 
-class MenuItem(models.Model):
+class MenuItem(MenuChangeTracked):
     name = models.CharField(max_length=200)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     image = models.ImageField(upload_to='menu_images/', null=True, blank=True)
+    # Resized copies of `image`, filled in by menuitem.tasks.generate_image_variants:
+    # {"source": <image name>, "webp": {<width>: <name>}, "jpeg": {...}}
+    image_variants = models.JSONField(default=dict, blank=True)
     is_available = models.BooleanField(default=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='menu_items')
     description = models.CharField(max_length =500)
@@ -24,3 +49,40 @@ class MenuItem(models.Model):
 
     def __str__(self):
         return self.name
+
+class MenuItemDailyStats(models.Model):
+    """
+    Per-item order and cancellation counts for one day, so top-N rankings for
+    a window only read the buckets inside it.
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    order_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'date'], name='menuitem_daily_stats_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'menu_item'], name='menuitem_daily_stats_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} {self.date}"
+
+class MenuTombstone(models.Model):
+    """Record of a deleted menu item or category, so delta sync can report it."""
+    KIND_CHOICES = [
+        ('item', 'Menu item'),
+        ('category', 'Category'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    change_version = models.PositiveBigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted at version {self.change_version}"
+
@@ -0,0 +1,97 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_menu_version
+from .models import MenuItem
+from .serializers import MenuItemSerializer
+
+MenuPayload = namedtuple('MenuPayload', ['body', 'gzip_body', 'etag', 'gzip_etag'])
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or matched by "*")
+    with a q-value above zero, so "gzip;q=0" refuses it.
+    """
+    qualities = {}
+    for coding in (accept_encoding or '').split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    quality = qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0)))
+    return quality > 0
+
+
+class MenuPayloadCache:
+    """
+    Process-local, pre-rendered JSON of the public menu list, plus a gzip
+    copy. Image URLs are absolute: with MEDIA_BASE_URL set one payload serves
+    every host, otherwise one is kept per origin (up to max_origins).
+    Rebuilt when the menu version changes, and after MENU_PAYLOAD_TTL seconds
+    so the order counters in it do not go stale.
+
+    Only one thread rebuilds a payload at a time; others keep serving the
+    previous one meanwhile, or build their own when there is none yet.
+    """
+    max_origins = 16
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._building = set()
+        self._cached = {}  # origin: (version, built_at, MenuPayload)
+
+    def get(self, request):
+        origin = '' if settings.MEDIA_BASE_URL else request.build_absolute_uri('/')
+        version = get_menu_version()
+        cached = self._cached.get(origin)
+        if cached and cached[0] == version and time.monotonic() - cached[1] < settings.MENU_PAYLOAD_TTL:
+            return cached[2]
+
+        with self._lock:
+            builder = origin not in self._building
+            self._building.add(origin)
+        if not builder and cached:
+            return cached[2]
+        try:
+            payload = self.build(request)
+        finally:
+            if builder:
+                self._building.discard(origin)
+        with self._lock:
+            self._cached.pop(origin, None)
+            while len(self._cached) >= self.max_origins:
+                # Drop the least recently built
+                del self._cached[next(iter(self._cached))]
+            self._cached[origin] = (version, time.monotonic(), payload)
+        return payload
+
+    def build(self, request):
+        items = MenuItem.objects.select_related('category').order_by('id')
+        body = JSONRenderer().render(MenuItemSerializer(items, many=True, context={'request': request}).data)
+        # mtime=0 keeps the gzip bytes identical for identical menus
+        gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong ETags are per representation, so the gzip copy gets its own
+        return MenuPayload(body, gzip_body, quote_etag(digest), quote_etag(f'{digest}-gzip'))
+
+    def clear(self):
+        self._cached = {}
+
+
+menu_payloads = MenuPayloadCache()
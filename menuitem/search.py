@@ -0,0 +1,147 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from .cache import get_menu_version
+from .models import MenuItem
+
+TOKEN_RE = re.compile(r'\w+')
+
+SearchEntry = namedtuple('SearchEntry', ['id', 'name', 'price', 'is_available', 'category_id', 'category_name'])
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').casefold())
+
+
+def iter_bits(bits):
+    """Positions of the set bits of an int, lowest first."""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class SearchIndex:
+    """
+    Immutable search index over one menu snapshot. Items are numbered in name
+    order and every set of items is a Python int used as a bitset, so
+    filters are ANDs and facet counts are popcounts.
+
+    - terms: sorted tokens of names and descriptions; a prefix matches the
+      contiguous run of terms found with bisect
+    - categories / available: one bitset per facet value
+    - below_price[k]: items whose price ranks below k, so a price range is
+      the difference of two prefix bitsets
+    """
+
+    def __init__(self, entries, descriptions):
+        order = sorted(range(len(entries)), key=lambda i: (entries[i].name.casefold(), entries[i].id))
+        self.entries = [entries[i] for i in order]
+        self.all = (1 << len(self.entries)) - 1
+
+        postings = {}
+        self.categories = {}
+        self.category_names = {}
+        self.available = 0
+        for position, i in enumerate(order):
+            entry = entries[i]
+            bit = 1 << position
+            for token in set(tokenize(entry.name)) | set(tokenize(descriptions[i])):
+                postings[token] = postings.get(token, 0) | bit
+            self.categories[entry.category_id] = self.categories.get(entry.category_id, 0) | bit
+            self.category_names[entry.category_id] = entry.category_name
+            if entry.is_available:
+                self.available |= bit
+        self.terms = sorted(postings)
+        self.postings = [postings[term] for term in self.terms]
+
+        by_price = sorted(range(len(self.entries)), key=lambda position: self.entries[position].price)
+        self.prices = [self.entries[position].price for position in by_price]
+        self.below_price = [0]
+        for position in by_price:
+            self.below_price.append(self.below_price[-1] | (1 << position))
+
+    def prefix_bits(self, prefix):
+        bits = 0
+        for i in range(bisect_left(self.terms, prefix), len(self.terms)):
+            if not self.terms[i].startswith(prefix):
+                break
+            bits |= self.postings[i]
+        return bits
+
+    def price_bits(self, min_price=None, max_price=None):
+        low = bisect_left(self.prices, min_price) if min_price is not None else 0
+        high = bisect_right(self.prices, max_price) if max_price is not None else len(self.prices)
+        return self.below_price[high] & ~self.below_price[low] if high > low else 0
+
+    def search(self, query='', category=None, available=None, min_price=None, max_price=None, limit=20):
+        """
+        Items matching every word of `query` as a prefix and the filters, in
+        name order, plus facet counts. Each facet is counted with all other
+        filters applied, so clients can show what selecting a value yields.
+        """
+        matched = self.all
+        for token in tokenize(query):
+            matched &= self.prefix_bits(token)
+
+        category_filter = self.categories.get(category, 0) if category is not None else self.all
+        available_filter = (self.available if available else self.all & ~self.available) if available is not None else self.all
+        price_filter = self.price_bits(min_price, max_price)
+        bits = matched & category_filter & available_filter & price_filter
+
+        hits = []
+        for position in iter_bits(bits):
+            if len(hits) == limit:
+                break
+            hits.append(self.entries[position])
+
+        without_category = matched & available_filter & price_filter
+        without_available = matched & category_filter & price_filter
+        prices = [entry.price for entry in (self.entries[position] for position in iter_bits(bits))] if bits else []
+        return {
+            'count': bits.bit_count(),
+            'results': hits,
+            'facets': {
+                'category': [
+                    {'id': category_id, 'name': self.category_names[category_id], 'count': count}
+                    for category_id, count in (
+                        (category_id, (without_category & category_bits).bit_count())
+                        for category_id, category_bits in self.categories.items()
+                    ) if count
+                ],
+                'is_available': {
+                    'true': (without_available & self.available).bit_count(),
+                    'false': (without_available & ~self.available).bit_count(),
+                },
+                'price': {'min': min(prices), 'max': max(prices)} if prices else None,
+            },
+        }
+
+
+class MenuSearch:
+    """Process-local SearchIndex, rebuilt in one query when the menu version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = None
+
+    def index(self):
+        version = get_menu_version()
+        with self._lock:
+            if version != self._version:
+                rows = MenuItem.objects.values_list(
+                    'id', 'name', 'price', 'is_available', 'category_id', 'category__name', 'description'
+                )
+                entries, descriptions = [], []
+                for *fields, description in rows:
+                    entries.append(SearchEntry(*fields))
+                    descriptions.append(description)
+                self._index = SearchIndex(entries, descriptions)
+                self._version = version
+            return self._index
+
+
+menu_search = MenuSearch()
@@ -1,21 +1,70 @@
+from decimal import Decimal
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Category, MenuItem
 
+def media_url(url, request=None):
+    """Absolute URL of a media file: on MEDIA_BASE_URL if set, else on the request's host."""
+    if settings.MEDIA_BASE_URL:
+        return urljoin(settings.MEDIA_BASE_URL, url)
+    return request.build_absolute_uri(url) if request else url
+
+def image_variant_urls(image_variants, request=None):
+    """{"webp": {width: url}, "jpeg": {...}} from MenuItem.image_variants."""
+    variants = {}
+    for key in ('webp', 'jpeg'):
+        variants[key] = {}
+        for width, name in (image_variants or {}).get(key, {}).items():
+            variants[key][width] = media_url(default_storage.url(name), request)
+    return variants
+
+class MediaImageField(serializers.ImageField):
+    """ImageField whose URL goes through media_url(), like the image variants."""
+    def to_representation(self, value):
+        if not value:
+            return None
+        return media_url(value.url, self.context.get('request'))
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'change_version']
+        read_only_fields = ['change_version']
 
 class MenuItemSerializer(serializers.ModelSerializer):
     # For read operations, include category details.
     category = CategorySerializer(read_only=True)
     # For write operations, accept a category ID.
     category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category', write_only=True)
+    image = MediaImageField(max_length=100, allow_null=True, required=False)
+    # Resized image URLs, {"webp": {"320": url, ...}, "jpeg": {...}}; empty until generated
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = MenuItem
         fields = [
-            'id', 'name', 'price', 'image', 'is_available', 'description',
-            'category', 'category_id', 'order_count', 'cancelled_order_count'
+            'id', 'name', 'price', 'image', 'image_variants', 'is_available', 'description',
+            'category', 'category_id', 'order_count', 'cancelled_order_count', 'change_version'
         ]
-        read_only_fields = ['order_count', 'cancelled_order_count']
\ No newline at end of file
+        read_only_fields = ['order_count', 'cancelled_order_count', 'change_version']
+
+    def get_image_variants(self, obj):
+        return image_variant_urls(obj.image_variants, self.context.get('request'))
+
+class MenuItemBulkChangeSerializer(serializers.Serializer):
+    """One entry of a bulk menu change: the item id and the fields to set."""
+    BULK_FIELDS = ['is_available', 'price', 'category_id']
+
+    id = serializers.IntegerField()
+    is_available = serializers.BooleanField(required=False)
+    price = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal('0'), required=False)
+    category_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in self.BULK_FIELDS):
+            raise serializers.ValidationError(f"Set at least one of: {', '.join(self.BULK_FIELDS)}")
+        return attrs
+
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_menu_version
+from core.models import Sequence
+from .models import MENU_CHANGE_KEY, Category, MenuItem, MenuTombstone
+from .tasks import delete_image_variants, generate_image_variants
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def menu_changed(sender, **kwargs):
+    # Bump once the write is visible so workers reload committed data
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Category)
+def record_tombstone(sender, instance, **kwargs):
+    # Deletes get a change version too, so delta sync clients learn about them
+    MenuTombstone.objects.create(
+        kind='item' if sender is MenuItem else 'category',
+        object_id=instance.pk,
+        change_version=Sequence.reserve(MENU_CHANGE_KEY),
+    )
+
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_image_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = (instance.image_variants or {}).get('source')
+    if instance.image and instance.image.name != source:
+        # Resize in the background once the new image is committed
+        menu_item_id, image_name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: generate_image_variants.delay(menu_item_id, image_name), robust=True)
+    elif not instance.image and instance.image_variants:
+        MenuItem.objects.filter(pk=instance.pk).update(image_variants={})
+        remove_variants_on_commit(instance.image_variants)
+
+
+@receiver(post_delete, sender=MenuItem)
+def menu_item_deleted(sender, instance, **kwargs):
+    if instance.image_variants:
+        remove_variants_on_commit(instance.image_variants)
+
+
+def remove_variants_on_commit(variants):
+    # Files are only removed once nothing committed refers to them; a rolled
+    # back write keeps its copies
+    transaction.on_commit(lambda: delete_image_variants.delay(variants), robust=True)
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import MenuItemDailyStats
+
+
+def window_start(period, today=None):
+    """
+    First day of a named window ending today: 'today'/'day', 'week' (last 7
+    days), 'month' (last 30 days) or 'this_month' (since the 1st). Returns
+    None for an unknown period.
+    """
+    today = today or timezone.localdate()
+    if period in ('today', 'day'):
+        return today
+    if period == 'week':
+        return today - timedelta(days=6)
+    if period == 'month':
+        return today - timedelta(days=29)
+    if period == 'this_month':
+        return today.replace(day=1)
+    return None
+
+
+def top_items(start_date, limit):
+    """
+    Most ordered items since start_date as dicts of menu_item_id, name and
+    order_count, computed from the daily buckets in the window only.
+    """
+    return list(
+        MenuItemDailyStats.objects.filter(date__gte=start_date)
+        .values('menu_item_id')
+        .annotate(name=F('menu_item__name'), order_count=Sum('order_count'))
+        .filter(order_count__gt=0)
+        .order_by('-order_count', 'menu_item_id')[:limit]
+    )
+
+
+def window_totals(start_date):
+    """Total ordered and cancelled items since start_date."""
+    totals = MenuItemDailyStats.objects.filter(date__gte=start_date).aggregate(
+        order_count=Sum('order_count'), cancelled_count=Sum('cancelled_count')
+    )
+    return {field: value or 0 for field, value in totals.items()}
@@ -0,0 +1,43 @@
+import logging
+
+from celery import shared_task
+from django.db import transaction
+from PIL import UnidentifiedImageError
+
+from core.models import Sequence
+from .cache import bump_menu_version
+from .images import build_variants, delete_variants
+from .models import MENU_CHANGE_KEY, MenuItem
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def generate_image_variants(menu_item_id, image_name):
+    """Build the resized copies of a menu item's image, unless it changed since."""
+    item = MenuItem.objects.filter(pk=menu_item_id).only('id', 'image', 'image_variants').first()
+    if item is None or item.image.name != image_name:
+        return
+
+    try:
+        variants = build_variants(item.image)
+    except (OSError, UnidentifiedImageError):
+        logger.exception("Could not build image variants for menu item %s", menu_item_id)
+        return
+
+    # Queryset update: no save signals, so this does not enqueue itself again
+    with transaction.atomic():
+        updated = MenuItem.objects.filter(pk=menu_item_id, image=image_name).update(
+            image_variants=variants, change_version=Sequence.reserve(MENU_CHANGE_KEY)
+        )
+    if updated:
+        delete_variants(item.image_variants)
+        bump_menu_version()
+    else:
+        delete_variants(variants)
+
+
+@shared_task
+def delete_image_variants(variants):
+    """Remove resized copies that no committed menu item refers to any more."""
+    delete_variants(variants)
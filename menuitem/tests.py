@@ -1,3 +1,671 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from config.migrationtest import MigrationTestCase
+from config.querybudget import QueryBudget, QueryBudgetMixin
+from core.models import Sequence
+from user_authentication.models import User
+from .cache import MENU_VERSION_KEY, MenuCache, bump_menu_version, get_menu_version
+from .counters import OrderCountBuffer, record_order_counts
+from .models import MENU_CHANGE_KEY, Category, MenuItem, MenuItemDailyStats, MenuTombstone
+from .payload import accepts_gzip, menu_payloads
+from .views import TREE_ITEM_FIELDS, MenuItemViewSet
+
+
+class MenuQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = 'menuitem.urls'
+    prefix = '/menu'
+    budgets = [
+        QueryBudget('api-root', 0),
+        QueryBudget('menuitem-list', 2),
+        QueryBudget('menuitem-list', 3, 'post', data={'name': 'Soup', 'price': '3.00', 'category_id': 1, 'description': 'Hot'}),
+        QueryBudget('menuitem-detail', 1, args=[1]),
+        QueryBudget('menuitem-detail', 3, 'patch', args=[1], data={'price': '5.00'}),
+        QueryBudget('menuitem-detail', 6, 'delete', args=[2]),
+        QueryBudget('menuitem-bulk-update', 6, 'post', data={'items': [
+            {'id': item_id, 'is_available': False, 'price': '3.95', 'category_id': 2} for item_id in range(3, 12)
+        ]}),
+        QueryBudget('category-list', 1),
+        QueryBudget('category-list', 2, 'post', data={'name': 'Desserts'}),
+        QueryBudget('category-detail', 1, args=[1]),
+        QueryBudget('category-detail', 3, 'patch', args=[1], data={'name': 'Main courses'}),
+        QueryBudget('category-detail', 5, 'delete', args=[3]),
+        QueryBudget('analytics', 3, query='period=week'),
+        QueryBudget('menu-cache-stats', 0),
+        QueryBudget('menu-changes', 4, query='since=3'),
+        QueryBudget('menu-tree', 2),
+        QueryBudget('menu-tree', 2, query='fields=id,name,price&items_limit=2&items_offset=1'),
+        QueryBudget('menu-search', 2, query='q=ite&available=true&max_price=10'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=name) for name in ('Mains', 'Sides', 'Drinks')]
+        for i in range(12):
+            MenuItem.objects.create(name=f'Item {i}', price=Decimal('4.50'), category=categories[i % 2], description='')
+        cls.user = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN', is_admin=True)
+        client = APIClient()
+        for items in ([1, 2], [3], [4, 5, 6], [1, 8]):
+            client.post('/order/create/', {'items': items}, format='json')
+
+
+class MenuCacheTestsMixin:
+    """Invalidation of the process-local menu cache by committed menu writes."""
+    shared = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('3.00'), category=cls.category, description='')
+
+    def setUp(self):
+        patcher = mock.patch('menuitem.cache.cache_is_shared', return_value=self.shared)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        bump_menu_version()
+        self.menu = MenuCache()
+        self.menu.snapshot()
+
+    def test_committed_item_writes_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            burger = MenuItem.objects.get(id=self.burger.id)
+            burger.price = Decimal('4.25')
+            burger.save()
+        self.assertEqual(self.menu.snapshot()[self.burger.id].price, Decimal('4.25'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fries = MenuItem.objects.create(name='Fries', price=Decimal('2.00'), category=self.category, description='')
+        self.assertIn(fries.id, self.menu.snapshot())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fries.delete()
+        self.assertNotIn(fries.id, self.menu.snapshot())
+
+    def test_category_delete_invalidates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.get(id=self.category.id).delete()
+        self.assertEqual(self.menu.snapshot(), {})
+
+
+class SharedMenuCacheTests(MenuCacheTestsMixin, TestCase):
+    """The menu version lives in a shared cache such as Redis (the test LocMemCache stands in)."""
+    shared = True
+
+    def test_reused_until_the_version_changes(self):
+        with self.assertNumQueries(0):
+            entry = self.menu.snapshot()[self.burger.id]
+        self.assertEqual((entry.price, self.menu.hits, self.menu.misses), (Decimal('3.00'), 1, 1))
+
+    def test_evicted_version_reloads(self):
+        MenuItem.objects.filter(id=self.burger.id).update(price=Decimal('5.00'))
+        cache.delete(MENU_VERSION_KEY)
+        self.assertEqual(self.menu.snapshot()[self.burger.id].price, Decimal('5.00'))
+
+
+class PerProcessMenuCacheTests(MenuCacheTestsMixin, TestCase):
+    """
+    With a per-process cache the version is the menu change counter in the
+    database, so writes made by other workers are seen as well.
+    """
+    shared = False
+
+    def test_reused_until_the_version_changes(self):
+        with self.assertNumQueries(1):
+            entry = self.menu.snapshot()[self.burger.id]
+        self.assertEqual((entry.price, self.menu.hits, self.menu.misses), (Decimal('3.00'), 1, 1))
+
+    def test_writes_of_other_workers_invalidate(self):
+        # Another worker's write neither bumps this process's cache nor runs
+        # its on-commit hooks here
+        with self.captureOnCommitCallbacks(execute=False):
+            burger = MenuItem.objects.get(id=self.burger.id)
+            burger.is_available = False
+            burger.save()
+        self.assertFalse(self.menu.snapshot()[self.burger.id].is_available)
+
+
+@mock.patch.object(OrderCountBuffer, '_run', lambda self: None)
+class OrderCountBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.burger, cls.fries = [
+            MenuItem.objects.create(name=name, price=Decimal('3.00'), category=category, description='')
+            for name in ('Burger', 'Fries')
+        ]
+
+    def counts(self):
+        return dict(MenuItem.objects.values_list('id', 'order_count'))
+
+    def daily(self):
+        return sorted(MenuItemDailyStats.objects.values_list('menu_item_id', 'date', 'order_count'))
+
+    def test_flush_writes_coalesced_counts(self):
+        buffer = OrderCountBuffer()
+        today, yesterday = date(2026, 3, 2), date(2026, 3, 1)
+        buffer.add({self.burger.id: 1, self.fries.id: 2}, today)
+        buffer.add({self.burger.id: 3}, today)
+        buffer.add({self.burger.id: 1}, yesterday)
+        self.assertEqual(self.counts(), {self.burger.id: 0, self.fries.id: 0})
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(self.counts(), {self.burger.id: 5, self.fries.id: 2})
+        self.assertEqual(self.daily(), sorted([
+            (self.burger.id, today, 4), (self.fries.id, today, 2), (self.burger.id, yesterday, 1),
+        ]))
+        # Nothing is written twice
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(self.counts(), {self.burger.id: 5, self.fries.id: 2})
+
+    def test_deleted_items_are_skipped(self):
+        buffer = OrderCountBuffer()
+        buffer.add({self.burger.id: 1, 999: 4}, date(2026, 3, 2))
+        buffer.flush()
+        self.assertEqual(self.counts()[self.burger.id], 1)
+        self.assertEqual(self.daily(), [(self.burger.id, date(2026, 3, 2), 1)])
+
+    def test_failed_flush_keeps_the_counts(self):
+        buffer = OrderCountBuffer()
+        buffer.add({self.burger.id: 2}, date(2026, 3, 1))
+        buffer.add({self.fries.id: 1}, date(2026, 3, 2))
+        with mock.patch('menuitem.counters.apply_order_counts', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            buffer.flush()
+        buffer.add({self.burger.id: 1}, date(2026, 3, 1))
+        buffer.flush()
+        self.assertEqual(self.counts(), {self.burger.id: 3, self.fries.id: 1})
+
+    def test_write_behind_buffers_after_commit(self):
+        buffer = OrderCountBuffer()
+        with override_settings(MENU_ORDER_COUNT_WRITE_BEHIND=True), \
+                mock.patch('menuitem.counters.order_count_buffer', buffer):
+            with self.captureOnCommitCallbacks() as callbacks:
+                record_order_counts({self.burger.id: 2})
+            # Neither written nor buffered before the order commits
+            self.assertEqual(buffer.flush(), 0)
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.counts()[self.burger.id], 0)
+        buffer.flush()
+        self.assertEqual(self.counts()[self.burger.id], 2)
+
+
+class MenuBulkUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mains = Category.objects.create(name='Mains')
+        cls.sides = Category.objects.create(name='Sides')
+        cls.burger, cls.fries, cls.salad = [
+            MenuItem.objects.create(name=name, price=Decimal('3.00'), category=cls.mains, description='')
+            for name in ('Burger', 'Fries', 'Salad')
+        ]
+        cls.kitchen = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.kitchen)
+
+    def post(self, items):
+        return self.client.post('/menu/items/bulk-update/', {'items': items}, format='json')
+
+    def snapshot(self):
+        return list(MenuItem.objects.order_by('id').values_list(
+            'price', 'is_available', 'category_id', 'change_version', 'updated_at'
+        ))
+
+    def test_applies_changes_and_reports_diffs(self):
+        before = {item.id: item for item in MenuItem.objects.all()}
+        version = get_menu_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                {'id': self.burger.id, 'price': '4.25', 'is_available': False},
+                {'id': self.fries.id, 'category_id': self.sides.id},
+                # Already the current values
+                {'id': self.salad.id, 'price': '3.00', 'category_id': self.mains.id},
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['unchanged']), (2, 1))
+        self.assertEqual(response.data['changes'], [
+            {'id': self.burger.id, 'price': ['3.00', '4.25'], 'is_available': [True, False]},
+            {'id': self.fries.id, 'category_id': [self.mains.id, self.sides.id]},
+        ])
+
+        after = {item.id: item for item in MenuItem.objects.all()}
+        self.assertEqual((after[self.burger.id].price, after[self.burger.id].is_available), (Decimal('4.25'), False))
+        self.assertEqual(after[self.fries.id].category_id, self.sides.id)
+        for item_id in (self.burger.id, self.fries.id):
+            self.assertGreater(after[item_id].change_version, max(item.change_version for item in before.values()))
+            self.assertGreater(after[item_id].updated_at, before[item_id].updated_at)
+        self.assertNotEqual(after[self.burger.id].change_version, after[self.fries.id].change_version)
+        self.assertEqual(
+            (after[self.salad.id].change_version, after[self.salad.id].updated_at),
+            (before[self.salad.id].change_version, before[self.salad.id].updated_at),
+        )
+        self.assertNotEqual(get_menu_version(), version)
+
+    def test_invalid_batches_change_nothing(self):
+        before = self.snapshot()
+        valid = {'id': self.burger.id, 'price': '9.00'}
+        for items, status_code in [
+            ([], 400),
+            ([valid, {'id': self.fries.id, 'price': '-1.00'}], 400),
+            ([valid, {'id': self.fries.id}], 400),
+            ([valid, {'id': self.burger.id, 'is_available': False}], 400),
+            ([valid, {'id': self.fries.id, 'category_id': 999}], 400),
+            ([valid, {'id': 999, 'price': '1.00'}], 404),
+        ]:
+            with self.subTest(items=items):
+                self.assertEqual(self.post(items).status_code, status_code)
+                self.assertEqual(self.snapshot(), before)
+
+    def test_batch_size_is_limited(self):
+        with mock.patch.object(MenuItemViewSet, 'max_bulk_items', 2):
+            response = self.post([{'id': item.id, 'price': '1.00'} for item in (self.burger, self.fries, self.salad)])
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_kitchen_staff(self):
+        self.client.force_authenticate(User.objects.create_user(email='c@example.com', password='secret', user_type='ADMIN'))
+        self.assertEqual(self.post([{'id': self.burger.id, 'price': '1.00'}]).status_code, 403)
+
+
+class MenuChangesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mains = Category.objects.create(name='Mains')
+        cls.drinks = Category.objects.create(name='Drinks')
+        cls.items = [
+            MenuItem.objects.create(name=name, price=Decimal('3.00'), category=category, description='')
+            for name, category in [('Burger', cls.mains), ('Wrap', cls.mains), ('Cola', cls.drinks)]
+        ]
+
+    def changes(self, **params):
+        response = self.client.get('/menu/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_returns_changes_after_since(self):
+        since = Sequence.current(MENU_CHANGE_KEY)
+        burger = self.items[0]
+        burger.price = Decimal('4.00')
+        burger.save()
+        desserts = Category.objects.create(name='Desserts')
+
+        result = self.changes(since=since)
+        self.assertEqual([item['id'] for item in result['items']], [burger.id])
+        self.assertEqual(result['items'][0]['price'], '4.00')
+        self.assertEqual([category['id'] for category in result['categories']], [desserts.id])
+        self.assertEqual(result['deleted'], {'items': [], 'categories': []})
+        self.assertEqual((result['version'], result['has_more']), (Sequence.current(MENU_CHANGE_KEY), False))
+
+        self.assertEqual(self.changes(since=result['version'])['items'], [])
+
+    def test_deletes_leave_tombstones(self):
+        since = Sequence.current(MENU_CHANGE_KEY)
+        burger_id, drinks_id, cola_id = self.items[0].id, self.drinks.id, self.items[2].id
+        self.items[0].delete()
+        # Cascaded item deletes are recorded too
+        Category.objects.get(id=drinks_id).delete()
+
+        self.assertEqual(
+            sorted(MenuTombstone.objects.values_list('kind', 'object_id')),
+            [('category', drinks_id), ('item', burger_id), ('item', cola_id)],
+        )
+        result = self.changes(since=since)
+        self.assertEqual(sorted(result['deleted']['items']), [burger_id, cola_id])
+        self.assertEqual(result['deleted']['categories'], [drinks_id])
+        self.assertEqual(result['items'], [])
+
+    def test_pages_through_every_change(self):
+        Category.objects.get(id=self.mains.id).delete()
+        since, pages, seen = 0, 0, []
+        while True:
+            result = self.changes(since=since, limit=2)
+            page = ([('item', item['id']) for item in result['items']]
+                    + [('category', category['id']) for category in result['categories']]
+                    + [('deleted item', object_id) for object_id in result['deleted']['items']]
+                    + [('deleted category', object_id) for object_id in result['deleted']['categories']])
+            self.assertLessEqual(len(page), 2)
+            self.assertGreater(result['version'], since)
+            seen += page
+            since, pages = result['version'], pages + 1
+            if not result['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted([
+            ('item', self.items[2].id), ('category', self.drinks.id), ('deleted category', self.mains.id),
+            ('deleted item', self.items[0].id), ('deleted item', self.items[1].id),
+        ]))
+        self.assertEqual(pages, 3)
+        self.assertEqual(since, Sequence.current(MENU_CHANGE_KEY))
+
+    def test_rejects_bad_parameters(self):
+        version = Sequence.current(MENU_CHANGE_KEY)
+        response = self.client.get('/menu/changes/', {'since': version + 1})
+        self.assertEqual((response.status_code, response.json()['version']), (409, version))
+        for params in ({'since': 'x'}, {'limit': 0}, {'limit': 1001}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/menu/changes/', params).status_code, 400)
+
+
+class MenuPayloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        MenuItem.objects.create(name='Burger', price=Decimal('5.00'), category=category, description='Beef')
+
+    def setUp(self):
+        # Test transactions roll back without bumping the menu version
+        menu_payloads.clear()
+
+    def test_accepts_gzip(self):
+        for header, expected in [
+            ('gzip, deflate, br', True), ('br;q=1.0, gzip;q=0.5', True), ('*', True), ('x-gzip', True),
+            ('gzip;q=0', False), ('gzip; q=0.0, *', False), ('deflate', False), ('identity, *;q=0', False),
+            ('gzipx', False), ('', False), (None, False), ('gzip;q=abc', False),
+        ]:
+            with self.subTest(header):
+                self.assertEqual(accepts_gzip(header), expected)
+
+    def test_gzip_follows_q_values(self):
+        response = self.client.get('/menu/items/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.client.get('/menu/items/').content)
+
+        response = self.client.get('/menu/items/', HTTP_ACCEPT_ENCODING='gzip;q=0, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.json()[0]['name'], 'Burger')
+
+    def with_image(self):
+        item = MenuItem.objects.get()
+        MenuItem.objects.filter(id=item.id).update(
+            image='menu_images/burger.jpg', image_variants={'webp': {'320': 'menu_images/variants/burger-320.webp'}},
+        )
+        return item
+
+    def test_image_urls_match_the_other_endpoints(self):
+        item = self.with_image()
+        listed = self.client.get('/menu/items/', HTTP_HOST='a.example.com').json()[0]
+        retrieved = self.client.get(f'/menu/items/{item.id}/', HTTP_HOST='a.example.com').json()
+        self.assertEqual(listed['image'], 'http://a.example.com/media/menu_images/burger.jpg')
+        self.assertEqual((listed['image'], listed['image_variants']), (retrieved['image'], retrieved['image_variants']))
+
+        # Each host gets its own payload
+        other = self.client.get('/menu/items/', HTTP_HOST='b.example.com').json()[0]
+        self.assertEqual(other['image_variants']['webp']['320'],
+                         'http://b.example.com/media/menu_images/variants/burger-320.webp')
+
+    @override_settings(MEDIA_BASE_URL='https://cdn.example.com')
+    def test_one_payload_serves_every_host_with_media_base_url(self):
+        item = self.with_image()
+        first = self.client.get('/menu/items/', HTTP_HOST='a.example.com')
+        # Only the menu version check
+        with self.assertNumQueries(1):
+            second = self.client.get('/menu/items/', HTTP_HOST='b.example.com')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first.json()[0]['image'], 'https://cdn.example.com/media/menu_images/burger.jpg')
+        retrieved = self.client.get(f'/menu/items/{item.id}/', HTTP_HOST='b.example.com').json()
+        self.assertEqual(retrieved['image_variants'], first.json()[0]['image_variants'])
+
+    def test_payloads_per_host_are_bounded(self):
+        with mock.patch.object(menu_payloads, 'max_origins', 2):
+            for host in ('a.example.com', 'b.example.com', 'c.example.com'):
+                self.client.get('/menu/items/', HTTP_HOST=host)
+            self.assertEqual(list(menu_payloads._cached), ['http://b.example.com/', 'http://c.example.com/'])
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.client.get('/menu/items/')['ETag']
+        response = self.client.get('/menu/items/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class MenuSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mains = Category.objects.create(name='Mains')
+        cls.drinks = Category.objects.create(name='Drinks')
+        for name, price, category, available, description in [
+            ('Cheese Burger', '5.00', cls.mains, True, 'Beef patty'),
+            ('Chicken Burger', '4.50', cls.mains, True, 'Crispy'),
+            ('Veggie Wrap', '3.00', cls.mains, False, 'Cheese and beans'),
+            ('Cola', '1.50', cls.drinks, True, ''),
+            ('Cherry Soda', '2.00', cls.drinks, True, ''),
+        ]:
+            MenuItem.objects.create(
+                name=name, price=Decimal(price), category=category, is_available=available, description=description
+            )
+
+    def setUp(self):
+        # Test transactions roll back without bumping the menu version
+        bump_menu_version()
+
+    def search(self, **params):
+        response = self.client.get('/menu/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, result):
+        return [item['name'] for item in result['results']]
+
+    def test_words_match_names_and_descriptions_as_prefixes(self):
+        result = self.search(q='ch')
+        self.assertEqual(self.names(result), ['Cheese Burger', 'Cherry Soda', 'Chicken Burger', 'Veggie Wrap'])
+        self.assertEqual(self.names(self.search(q='CH bur')), ['Cheese Burger', 'Chicken Burger'])
+        self.assertEqual(self.search(q='pizza')['count'], 0)
+
+    def test_category_filter_and_facets(self):
+        result = self.search(category=self.drinks.id)
+        self.assertEqual(self.names(result), ['Cherry Soda', 'Cola'])
+        # The category facet ignores the category filter itself
+        self.assertEqual(result['facets']['category'], [
+            {'id': self.mains.id, 'name': 'Mains', 'count': 3},
+            {'id': self.drinks.id, 'name': 'Drinks', 'count': 2},
+        ])
+        self.assertEqual(result['facets']['is_available'], {'true': 2, 'false': 0})
+        self.assertEqual(result['facets']['price'], {'min': '1.50', 'max': '2.00'})
+
+    def test_availability_filter(self):
+        result = self.search(available='false')
+        self.assertEqual(self.names(result), ['Veggie Wrap'])
+        self.assertEqual(result['facets']['category'], [{'id': self.mains.id, 'name': 'Mains', 'count': 1}])
+        self.assertEqual(result['facets']['is_available'], {'true': 4, 'false': 1})
+
+    def test_price_range_is_inclusive(self):
+        result = self.search(min_price='2', max_price='4.50')
+        self.assertEqual(self.names(result), ['Cherry Soda', 'Chicken Burger', 'Veggie Wrap'])
+        self.assertEqual(result['facets']['price'], {'min': '2.00', 'max': '4.50'})
+        self.assertEqual(self.search(min_price='6')['facets']['price'], None)
+
+    def test_limit_keeps_total_count(self):
+        result = self.search(limit=2)
+        self.assertEqual((result['count'], len(result['results'])), (5, 2))
+
+    def test_invalid_numbers_are_rejected(self):
+        for params in ({'min_price': 'NaN'}, {'max_price': 'Infinity'}, {'min_price': '-inf'},
+                       {'max_price': 'abc'}, {'category': 'x'}, {'limit': '1.5'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/menu/search/', params).status_code, 400)
+
+
+class MenuTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.mains = Category.objects.create(name='Mains')
+        cls.drinks = Category.objects.create(name='Drinks')
+        cls.sides = Category.objects.create(name='Sides')
+        for name, category, available in [
+            ('Soup', cls.mains, True), ('Burger', cls.mains, True), ('Pie', cls.mains, True),
+            ('Stew', cls.mains, False), ('Cola', cls.drinks, True), ('Chips', cls.sides, False),
+        ]:
+            MenuItem.objects.create(name=name, price=Decimal('3.00'), category=category,
+                                    description='', is_available=available)
+
+    def tree(self, **params):
+        response = self.client.get('/menu/tree/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_only_available_items_and_their_categories(self):
+        tree = self.tree()
+        # Sides has no available item
+        self.assertEqual([(category['name'], category['item_count']) for category in tree], [('Mains', 3), ('Drinks', 1)])
+        self.assertEqual([item['name'] for item in tree[0]['items']], ['Burger', 'Pie', 'Soup'])
+        self.assertEqual(set(tree[0]['items'][0]), set(TREE_ITEM_FIELDS))
+
+    def test_fields_projection(self):
+        tree = self.tree(fields='name,price')
+        self.assertEqual(tree[1]['items'], [{'name': 'Cola', 'price': '3.00'}])
+        for fields in ('name,category', 'secret', ','):
+            with self.subTest(fields=fields):
+                self.assertEqual(self.client.get('/menu/tree/', {'fields': fields}).status_code, 400)
+
+    def test_items_are_sliced_per_category(self):
+        tree = self.tree(fields='name', items_limit=1, items_offset=1)
+        self.assertEqual(
+            [(category['name'], category['item_count'], category['items']) for category in tree],
+            [('Mains', 3, [{'name': 'Pie'}]), ('Drinks', 1, [])],
+        )
+        for params in ({'items_limit': 0}, {'items_limit': 101}, {'items_offset': -1}, {'items_limit': 'x'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get('/menu/tree/', params).status_code, 400)
+
+
+class ImageVariantTests(TestCase):
+    """Variants are built by the Celery task, which runs eagerly without a broker."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MENU_IMAGE_WIDTHS=[320, 640])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.category = Category.objects.create(name='Mains')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(
+            email='kitchen@example.com', password='secret', user_type='KITCHEN'
+        ))
+
+    def upload(self, name, size):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_follow_the_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/menu/items/', {
+                'name': 'Burger', 'price': '5.00', 'category_id': self.category.id,
+                'description': 'Beef', 'image': self.upload('burger.jpg', (1600, 1200)),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        item = MenuItem.objects.get()
+        self.assertEqual(item.image_variants['source'], item.image.name)
+        self.assertEqual(sorted(item.image_variants['webp']), ['320', '640'])
+        with Image.open(f"{self.media_root}/{item.image_variants['webp']['320']}") as variant:
+            self.assertEqual((variant.format, variant.size), ('WEBP', (320, 240)))
+
+        listed = self.client.get('/menu/items/').json()[0]['image_variants']
+        self.assertTrue(listed['jpeg']['640'].startswith('http://testserver/media/menu_images/variants/'))
+
+        # A smaller replacement only gets its own width, and old copies are removed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/menu/items/{item.id}/', {'image': self.upload('fries.jpg', (200, 100))}, format='multipart')
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants['jpeg'], {'200': 'menu_images/variants/fries-200.jpeg'})
+        self.assertEqual(sorted(os.listdir(f'{self.media_root}/menu_images/variants')), ['fries-200.jpeg', 'fries-200.webp'])
+
+    def test_transparency_is_kept_in_webp_only(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (400, 200), (255, 0, 0, 0)).save(buffer, 'PNG')
+        upload = SimpleUploadedFile('logo.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/menu/items/', {
+                'name': 'Logo', 'price': '1.00', 'category_id': self.category.id,
+                'description': 'Crest', 'image': upload,
+            }, format='multipart')
+        variants = MenuItem.objects.get().image_variants
+        with Image.open(f"{self.media_root}/{variants['webp']['320']}") as webp:
+            self.assertEqual((webp.mode, webp.getpixel((10, 10))[3]), ('RGBA', 0))
+        with Image.open(f"{self.media_root}/{variants['jpeg']['320']}") as jpeg:
+            # Transparent pixels become white, not black
+            self.assertEqual(jpeg.mode, 'RGB')
+            self.assertTrue(all(channel > 245 for channel in jpeg.getpixel((10, 10))))
+
+    def create_with_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/menu/items/', {
+                'name': 'Burger', 'price': '5.00', 'category_id': self.category.id,
+                'description': 'Beef', 'image': self.upload('burger.jpg', (800, 600)),
+            }, format='multipart')
+        return MenuItem.objects.get()
+
+    def variant_files(self):
+        return sorted(os.listdir(f'{self.media_root}/menu_images/variants'))
+
+    def test_deleting_the_item_removes_variants_after_commit(self):
+        item = self.create_with_variants()
+        self.assertEqual(len(self.variant_files()), 4)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.delete(f'/menu/items/{item.id}/')
+        # Still there until the delete commits
+        self.assertEqual(len(self.variant_files()), 4)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.variant_files(), [])
+
+    def test_clearing_the_image_removes_variants_after_commit(self):
+        item = self.create_with_variants()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(f'/menu/items/{item.id}/', {'image': ''}, format='multipart')
+        item.refresh_from_db()
+        self.assertEqual((item.image.name, item.image_variants), ('', {}))
+        self.assertEqual(len(self.variant_files()), 4)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.variant_files(), [])
+
+
+class DailyStatsMigrationTests(MigrationTestCase):
+    migrate_from = [('menuitem', '0002_menuitem_description'), ('order', '0005_orderline')]
+    migrate_to = [('menuitem', '0003_menuitemdailystats')]
+
+    def setUpBeforeMigration(self, apps):
+        Category = apps.get_model('menuitem', 'Category')
+        MenuItem = apps.get_model('menuitem', 'MenuItem')
+        Order = apps.get_model('order', 'Order')
+        category = Category.objects.create(name='Mains')
+        self.soup, self.bread = [
+            MenuItem.objects.create(name=name, price=Decimal('2.00'), category=category, description='').id
+            for name in ('Soup', 'Bread')
+        ]
+        details = [{'id': self.soup, 'price': '2.00'}, {'id': self.bread, 'price': '2.00'}, {'id': 999, 'price': '1.00'}]
+        for day, item_ids, item_details in [
+            (1, [self.soup, self.soup, self.bread], details),
+            (1, [self.soup, 999], details),
+            # Bread was not charged: no price snapshot
+            (2, [self.bread, self.soup], details[:1]),
+        ]:
+            order = Order.objects.create(order_number=f'ORD-{Order.objects.count() + 1}', total_price=0,
+                                         items={'item_ids': item_ids, 'item_details': item_details})
+            created_at = timezone.make_aware(datetime(2025, 5, day, 12))
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+
+    def test_buckets_come_from_order_items(self):
+        MenuItemDailyStats = self.apps.get_model('menuitem', 'MenuItemDailyStats')
+        self.assertEqual(
+            sorted(MenuItemDailyStats.objects.values_list('menu_item_id', 'date', 'order_count')),
+            sorted([(self.soup, date(2025, 5, 1), 3), (self.bread, date(2025, 5, 1), 1), (self.soup, date(2025, 5, 2), 1)]),
+        )
 
-# Create your tests here.
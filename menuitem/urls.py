@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MenuItemViewSet, CategoryViewSet, AnalyticsView
+from .views import MenuItemViewSet, CategoryViewSet, AnalyticsView, MenuCacheStatsView, MenuSearchView, MenuChangesView, MenuTreeView
 
 router = DefaultRouter()
 router.register(r'items', MenuItemViewSet, basename='menuitem')
@@ -9,4 +9,8 @@ router.register(r'categories', CategoryViewSet, basename='category')
 urlpatterns = [
     path('', include(router.urls)),
     path('analytics/', AnalyticsView.as_view(), name='analytics'),
+    path('cache-stats/', MenuCacheStatsView.as_view(), name='menu-cache-stats'),
+    path('search/', MenuSearchView.as_view(), name='menu-search'),
+    path('changes/', MenuChangesView.as_view(), name='menu-changes'),
+    path('tree/', MenuTreeView.as_view(), name='menu-tree'),
 ]
\ No newline at end of file
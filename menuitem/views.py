@@ -1,13 +1,39 @@
 from django.shortcuts import render
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum
-from .models import MenuItem, Category
-from .serializers import MenuItemSerializer, CategorySerializer
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, Sum
+from core.models import Sequence
+from .models import MENU_CHANGE_KEY, MenuItem, Category, MenuTombstone
+from .serializers import MenuItemSerializer, CategorySerializer, MenuItemBulkChangeSerializer, image_variant_urls, media_url
+from .cache import bump_menu_version, menu_cache
+from .payload import accepts_gzip, menu_payloads
+from .search import menu_search
+from .stats import top_items, window_start, window_totals
+from analytics.cache import analytics_cache
+
+# Item fields MenuTreeView can return
+TREE_ITEM_FIELDS = ['id', 'name', 'price', 'description', 'image', 'image_variants', 'change_version']
+
+def tree_item(item, fields, request):
+    data = {}
+    for field in fields:
+        value = getattr(item, field)
+        if field == 'price':
+            value = str(value)
+        elif field == 'image':
+            value = media_url(value.url, request) if value else None
+        elif field == 'image_variants':
+            value = image_variant_urls(value, request)
+        data[field] = value
+    return data
 
 # Helper methods to check user types
 def is_kitchen(user):
@@ -21,8 +47,10 @@ class MenuItemViewSet(viewsets.ModelViewSet):
     GET (list/retrieve): Publicly accessible.
     POST, PUT, PATCH, DELETE: Restricted to kitchen staff.
     """
-    queryset = MenuItem.objects.all()
+    # The serializer nests each item's category
+    queryset = MenuItem.objects.select_related('category')
     serializer_class = MenuItemSerializer
+    max_bulk_items = 500
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -31,6 +59,28 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def list(self, request, *args, **kwargs):
+        # Serve the pre-rendered menu to JSON clients; the browsable API
+        # still renders through the serializer
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        payload = menu_payloads.get(request)
+        gzipped = accepts_gzip(request.headers.get('Accept-Encoding'))
+        etag = payload.gzip_etag if gzipped else payload.etag
+        if_none_match = parse_etags(request.headers.get('If-None-Match') or '')
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        elif gzipped:
+            response = HttpResponse(payload.gzip_body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(payload.body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
     def create(self, request, *args, **kwargs):
         if not is_kitchen(request.user):
             return Response({"error": "Only kitchen staff can create menu items."},
@@ -49,6 +99,81 @@ class MenuItemViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request, *args, **kwargs):
+        """
+        Change availability, price and/or category of many items at once:
+        {"items": [{"id": 1, "is_available": false, "price": "4.00", "category_id": 2}, ...]}.
+        Every entry is validated before anything is written; the changes are
+        then applied with one bulk UPDATE and the menu version is bumped once.
+        Returns {"id": ..., field: [old, new]} for each item that changed.
+        """
+        if not is_kitchen(request.user):
+            return Response({"error": "Only kitchen staff can update menu items."},
+                            status=status.HTTP_403_FORBIDDEN)
+        entries = request.data.get('items')
+        if not isinstance(entries, list) or not entries:
+            return Response({"error": "No items provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > self.max_bulk_items:
+            return Response({"error": f"At most {self.max_bulk_items} items can be changed at once"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MenuItemBulkChangeSerializer(data=entries, many=True)
+        if not serializer.is_valid():
+            return Response({"error": "Invalid items", "items": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        changes = {entry.pop('id'): entry for entry in serializer.validated_data}
+        if len(changes) != len(entries):
+            return Response({"error": "Each item may only appear once"}, status=status.HTTP_400_BAD_REQUEST)
+
+        category_ids = {entry['category_id'] for entry in changes.values() if 'category_id' in entry}
+        missing_categories = category_ids - set(Category.objects.filter(id__in=category_ids).values_list('id', flat=True))
+        if missing_categories:
+            return Response({"error": f"Unknown categories: {sorted(missing_categories)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            items = {
+                item.id: item for item in MenuItem.objects.select_for_update()
+                .filter(id__in=changes).only('id', *MenuItemBulkChangeSerializer.BULK_FIELDS)
+            }
+            missing_items = set(changes) - set(items)
+            if missing_items:
+                return Response({"error": f"Unknown menu items: {sorted(missing_items)}"},
+                                status=status.HTTP_404_NOT_FOUND)
+
+            now = timezone.now()
+            diffs = []
+            changed = []
+            for item_id, fields in changes.items():
+                item = items[item_id]
+                diff = {}
+                for field, value in fields.items():
+                    old = getattr(item, field)
+                    if old != value:
+                        # Prices as strings, like the serializers render them
+                        diff[field] = [str(old), str(value)] if field == 'price' else [old, value]
+                        setattr(item, field, value)
+                if diff:
+                    # bulk_update skips auto_now
+                    item.updated_at = now
+                    changed.append(item)
+                    diffs.append({'id': item_id, **diff})
+
+            if changed:
+                first_version = Sequence.reserve(MENU_CHANGE_KEY, len(changed))
+                for offset, item in enumerate(changed):
+                    item.change_version = first_version + offset
+                fields = sorted({field for diff in diffs for field in diff if field != 'id'})
+                MenuItem.objects.bulk_update(changed, [*fields, 'updated_at', 'change_version'])
+                # bulk_update sends no save signals, so invalidate the menu here, once
+                transaction.on_commit(bump_menu_version)
+
+        return Response({
+            'updated': len(changed),
+            'unchanged': len(changes) - len(changed),
+            'changes': diffs,
+        }, status=status.HTTP_200_OK)
+
 class CategoryViewSet(viewsets.ModelViewSet):
     """
     GET (list/retrieve): Publicly accessible.
@@ -85,7 +210,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
 class AnalyticsView(APIView):
     """
     Admin-only view for analytics.
-    Query parameter 'period' can be 'day', 'week', or 'month' to filter the data.
+    Query parameter 'period' can be 'day', 'week', or 'month' (today, the last
+    7 or the last 30 days) to only count orders placed in that window.
     Returns the most purchased menu item and aggregated total cancelled orders.
     """
     permission_classes = [IsAuthenticated]
@@ -95,25 +221,204 @@ class AnalyticsView(APIView):
             return Response({"error": "Only admins can access analytics."},
                             status=status.HTTP_403_FORBIDDEN)
         period = request.query_params.get('period', None)
-        now = timezone.now()
-        start_date = None
-        if period == 'day':
-            start_date = now - timedelta(days=1)
-        elif period == 'week':
-            start_date = now - timedelta(weeks=1)
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-
-        items = MenuItem.objects.all()
-        if start_date:
-            items = items.filter(created_at__gte=start_date)
+        if period not in ('day', 'week', 'month'):
+            period = None
+        return Response(analytics_cache.get(
+            f'menuitem-analytics:{period}:{timezone.localdate()}', lambda: self.compute(period)
+        ))
 
-        most_purchased = items.order_by('-order_count').first()
-        most_purchased_data = MenuItemSerializer(most_purchased).data if most_purchased else {}
+    def compute(self, period):
+        start_date = window_start(period) if period else None
 
-        total_cancelled = items.aggregate(total=Sum('cancelled_order_count'))['total'] or 0
+        if start_date:
+            # Rank by the daily buckets inside the window
+            top = top_items(start_date, 1)
+            most_purchased = MenuItem.objects.select_related('category').filter(
+                id=top[0]['menu_item_id']
+            ).first() if top else None
+            total_cancelled = window_totals(start_date)['cancelled_count']
+        else:
+            most_purchased = MenuItem.objects.select_related('category').order_by('-order_count').first()
+            total_cancelled = MenuItem.objects.aggregate(total=Sum('cancelled_order_count'))['total'] or 0
 
-        return Response({
+        most_purchased_data = dict(MenuItemSerializer(most_purchased).data) if most_purchased else {}
+
+        return {
             "most_purchased_item": most_purchased_data,
             "total_cancelled_orders": total_cancelled,
+        }
+
+class MenuCacheStatsView(APIView):
+    """
+    Admin-only view exposing this worker's menu cache hit/miss counters.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if not is_admin(request.user):
+            return Response({"error": "Only admins can access cache statistics."},
+                            status=status.HTTP_403_FORBIDDEN)
+        return Response(menu_cache.stats())
+
+class MenuSearchView(APIView):
+    """
+    Type-ahead menu search over item names and descriptions, served from an
+    in-memory index rebuilt whenever the menu changes.
+
+    Query parameters:
+    - q: words to match as prefixes (all must match)
+    - category: category id; available: true/false
+    - min_price, max_price: inclusive price range
+    - limit: number of results (default 20, max 100)
+
+    Returns the total count, the first `limit` items in name order and facet
+    counts for category, availability and price.
+    """
+    permission_classes = [AllowAny]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+            category = int(params['category']) if params.get('category') else None
+            min_price = Decimal(params['min_price']) if params.get('min_price') else None
+            max_price = Decimal(params['max_price']) if params.get('max_price') else None
+        except (ValueError, ArithmeticError):
+            return Response({"error": "limit, category, min_price and max_price must be numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Decimal accepts NaN and Infinity, which cannot be compared with prices
+        if any(price is not None and not price.is_finite() for price in (min_price, max_price)):
+            return Response({"error": "min_price and max_price must be finite numbers"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        available = {'true': True, 'false': False}.get(params.get('available'))
+
+        result = menu_search.index().search(
+            params.get('q', ''), category=category, available=available,
+            min_price=min_price, max_price=max_price, limit=max(limit, 0),
+        )
+        result['results'] = [
+            {
+                'id': entry.id,
+                'name': entry.name,
+                'price': str(entry.price),
+                'is_available': entry.is_available,
+                'category': {'id': entry.category_id, 'name': entry.category_name},
+            } for entry in result['results']
+        ]
+        if result['facets']['price']:
+            result['facets']['price'] = {key: str(value) for key, value in result['facets']['price'].items()}
+        return Response(result)
+
+class MenuChangesView(APIView):
+    """
+    Delta sync for menu clients: items and categories created or changed
+    after change version `since`, plus ids deleted since then, in pages of
+    at most `limit` changes (default 200, max 1000). Send the returned
+    `version` as the next `since`; `has_more` says whether to ask again
+    right away. Start from 0, or from the highest change_version in a full
+    menu download (MenuItemViewSet.list).
+    """
+    permission_classes = [AllowAny]
+    default_limit = 200
+    max_limit = 1000
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({"error": "since and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < limit <= self.max_limit:
+            return Response({"error": f"limit must be between 1 and {self.max_limit}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Versions are allocated under the counter's row lock and become
+        # visible in commit order, so nothing at or below this one can still appear
+        version = Sequence.current(MENU_CHANGE_KEY)
+        if since > version:
+            return Response({"error": "since is ahead of the current menu version; reload the full menu",
+                             "version": version}, status=status.HTTP_409_CONFLICT)
+
+        # Every change has its own version, so the first limit + 1 of each kind
+        # hold the first `limit` changes overall and tell whether there are more
+        window = {'change_version__gt': since, 'change_version__lte': version}
+        items = list(MenuItem.objects.select_related('category').filter(**window).order_by('change_version')[:limit + 1])
+        categories = list(Category.objects.filter(**window).order_by('change_version')[:limit + 1])
+        tombstones = list(MenuTombstone.objects.filter(**window).order_by('change_version')
+                          .values_list('change_version', 'kind', 'object_id')[:limit + 1])
+        versions = sorted([item.change_version for item in items] + [category.change_version for category in categories]
+                          + [tombstone[0] for tombstone in tombstones])
+        has_more = len(versions) > limit
+        if has_more:
+            version = versions[limit - 1]
+            items = [item for item in items if item.change_version <= version]
+            categories = [category for category in categories if category.change_version <= version]
+            tombstones = [tombstone for tombstone in tombstones if tombstone[0] <= version]
+
+        deleted = {'items': [], 'categories': []}
+        for _, kind, object_id in tombstones:
+            deleted['items' if kind == 'item' else 'categories'].append(object_id)
+
+        return Response({
+            'version': version,
+            'has_more': has_more,
+            'items': MenuItemSerializer(items, many=True, context={'request': request}).data,
+            'categories': CategorySerializer(categories, many=True).data,
+            'deleted': deleted,
         })
+
+class MenuTreeView(APIView):
+    """
+    The menu grouped by category: every category with available items, each
+    with its available items in name order.
+
+    Query parameters:
+    - fields: comma-separated item fields to return (default: all of TREE_ITEM_FIELDS)
+    - items_limit, items_offset: page through the items of every category;
+      each category reports its total `item_count`
+
+    Always two queries, however many categories and items there are: one for
+    the categories with their item counts and one prefetch for the items,
+    sliced per category in SQL and loading only the requested columns.
+    """
+    permission_classes = [AllowAny]
+    max_items_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        fields = TREE_ITEM_FIELDS
+        if params.get('fields'):
+            names = set(params['fields'].split(','))
+            fields = [field for field in TREE_ITEM_FIELDS if field in names]
+            if names - set(TREE_ITEM_FIELDS):
+                return Response({"error": f"fields must be a subset of: {', '.join(TREE_ITEM_FIELDS)}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = int(params.get('items_offset', 0))
+            limit = int(params['items_limit']) if params.get('items_limit') else None
+            if offset < 0 or (limit is not None and not 0 < limit <= self.max_items_limit):
+                raise ValueError
+        except ValueError:
+            return Response({"error": f"items_offset must be >= 0 and items_limit between 1 and {self.max_items_limit}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        items = MenuItem.objects.filter(is_available=True).only('id', 'category_id', *fields).order_by('name', 'id')
+        items = items[offset:offset + limit] if limit is not None else items[offset:]
+        categories = (
+            Category.objects.annotate(item_count=Count('menu_items', filter=Q(menu_items__is_available=True)))
+            .filter(item_count__gt=0)
+            .order_by('id')
+            .prefetch_related(Prefetch('menu_items', queryset=items, to_attr='tree_items'))
+        )
+
+        return Response([
+            {
+                'id': category.id,
+                'name': category.name,
+                'item_count': category.item_count,
+                'items': [tree_item(item, fields, request) for item in category.tree_items],
+            } for category in categories
+        ])
+
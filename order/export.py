@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import zlib
+from collections import Counter
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_COLUMNS = [
+    'order_number', 'created_at', 'status', 'total_price', 'star_rating',
+    'item_id', 'item_name', 'unit_price', 'quantity',
+]
+EXPORT_ORDER_FIELDS = ['id', 'order_number', 'created_at', 'status', 'total_price', 'star_rating', 'items']
+
+# Flush output to the client roughly this often
+CHUNK_BYTES = 64 * 1024
+
+
+def order_rows(order):
+    """
+    Flatten an order into one row per distinct menu item, taken from the
+    items JSON as it was priced. Orders without items still get one row.
+    """
+    base = {
+        'order_number': order.order_number,
+        'created_at': order.created_at.isoformat(),
+        'status': order.status,
+        'total_price': order.total_price,
+        'star_rating': order.star_rating,
+    }
+    items = order.items or {}
+    quantities = Counter(items.get('item_ids', []))
+    details = items.get('item_details', [])
+    if not details:
+        yield dict(base, item_id=None, item_name=None, unit_price=None, quantity=None)
+        return
+    for detail in details:
+        yield dict(
+            base,
+            item_id=detail.get('id'),
+            item_name=detail.get('name'),
+            unit_price=detail.get('price'),
+            quantity=quantities.get(detail.get('id'), 1),
+        )
+
+
+def csv_lines(orders):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    # Yield the header on its own so an empty export is still a valid CSV
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for order in orders:
+        writer.writerows(order_rows(order))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_lines(orders):
+    for order in orders:
+        for row in order_rows(order):
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def encode_chunks(lines, compress=False):
+    """
+    Join text lines into byte chunks of about CHUNK_BYTES, gzip-compressing
+    them on the fly if asked. Only one chunk is held in memory at a time.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        pending.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b''.join(pending)
+            pending, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    chunk = b''.join(pending)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
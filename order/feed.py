@@ -0,0 +1,59 @@
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+logger = logging.getLogger(__name__)
+
+# Highest change_seq published so far. Long-polling feed clients compare their
+# cursor against it and only query the database when something is newer.
+FEED_HEAD_KEY = 'order:feed:head'
+# Held while raising the head, which makes the read-compare-write atomic on
+# any cache backend
+FEED_HEAD_LOCK_KEY = 'order:feed:head:lock'
+PUBLISH_ATTEMPTS = 50
+
+
+def _publish(change_seq):
+    """Raise the feed head to change_seq; it never moves backwards."""
+    if cache.add(FEED_HEAD_KEY, change_seq, timeout=None):
+        return
+    for _ in range(PUBLISH_ATTEMPTS):
+        head = cache.get(FEED_HEAD_KEY)
+        if head is not None and head >= change_seq:
+            return
+        if cache.add(FEED_HEAD_LOCK_KEY, True, timeout=5):
+            try:
+                head = cache.get(FEED_HEAD_KEY)
+                if head is None or change_seq > head:
+                    cache.set(FEED_HEAD_KEY, change_seq, timeout=None)
+            finally:
+                cache.delete(FEED_HEAD_LOCK_KEY)
+            return
+        time.sleep(0.002)
+    # Waiting clients still see the change when their wait times out
+    logger.warning("Could not publish order change %s to the feed head", change_seq)
+
+
+def publish_order_change(change_seq):
+    """Announce a new change_seq to feed clients once the write commits."""
+    transaction.on_commit(lambda: _publish(change_seq))
+
+
+async def get_feed_head():
+    """
+    The published feed head. When the cache has none (it was cleared or this
+    is a fresh local-memory cache), it is seeded from the change log, so
+    waiting clients go back to checking the cache instead of the database.
+    """
+    head = await cache.aget(FEED_HEAD_KEY)
+    if head is None:
+        from .models import OrderChange
+
+        head = (await OrderChange.objects.aaggregate(head=Max('id')))['head'] or 0
+        if not await cache.aadd(FEED_HEAD_KEY, head, timeout=None):
+            # A write published a newer head meanwhile
+            head = await cache.aget(FEED_HEAD_KEY, head)
+    return head
@@ -0,0 +1,73 @@
+from collections import Counter
+from decimal import Decimal
+
+from menuitem.models import MenuItem
+from .models import OrderLine
+
+
+def item_prices_and_counts(items):
+    """
+    ({menu_item_id: unit_price}, Counter of menu item ids) of an order's
+    `items` JSON, skipping malformed entries.
+    """
+    items = items if isinstance(items, dict) else {}
+    prices = {}
+    for detail in items.get('item_details') or []:
+        try:
+            prices[int(detail['id'])] = Decimal(str(detail['price']))
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            continue
+
+    counts = Counter()
+    for item_id in items.get('item_ids') or []:
+        try:
+            counts[int(item_id)] += 1
+        except (TypeError, ValueError):
+            continue
+    return prices, counts
+
+
+def item_quantities(items):
+    """{menu_item_id: quantity} of the charged items of an order's `items` JSON."""
+    prices, counts = item_prices_and_counts(items)
+    return {item_id: quantity for item_id, quantity in counts.items() if item_id in prices}
+
+
+def build_order_lines(order):
+    """
+    Build (unsaved) OrderLine rows from an order's `items` JSON.
+
+    Quantities come from `item_ids` and unit prices from the `item_details`
+    snapshot; ids without a snapshot were not charged and get no line.
+    """
+    prices, counts = item_prices_and_counts(order.items)
+    return [
+        OrderLine(
+            order=order,
+            menu_item_id=item_id,
+            quantity=quantity,
+            unit_price=prices[item_id],
+        )
+        for item_id, quantity in counts.items() if item_id in prices
+    ]
+
+
+def unlink_missing_items(lines):
+    """
+    Clear the menu item of lines whose item has since been deleted, so they
+    keep their price snapshot without violating the foreign key.
+    """
+    known_item_ids = set(MenuItem.objects.filter(
+        id__in={line.menu_item_id for line in lines}
+    ).values_list('id', flat=True))
+    for line in lines:
+        if line.menu_item_id not in known_item_ids:
+            line.menu_item_id = None
+    return lines
+
+
+def sync_order_lines(order):
+    """Rewrite an order's lines after its `items` JSON was edited."""
+    lines = unlink_missing_items(build_order_lines(order))
+    order.lines.all().delete()
+    OrderLine.objects.bulk_create(lines)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from order.lines import build_order_lines, unlink_missing_items
+from order.models import Order, OrderLine
+
+
+class Command(BaseCommand):
+    help = "Create OrderLine rows for orders placed before order lines existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Orders processed per transaction.")
+        parser.add_argument('--after-id', type=int, default=0,
+                            help="Only backfill orders with a larger id.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = options['after_id']
+        # Orders that already have lines are skipped, so an interrupted run
+        # can simply be started again
+        pending = Order.objects.filter(
+            ~Exists(OrderLine.objects.filter(order=OuterRef('pk')))
+        ).order_by('id').only('id', 'items')
+
+        processed = created = 0
+        while True:
+            orders = list(pending.filter(id__gt=last_id)[:chunk_size])
+            if not orders:
+                break
+
+            lines = unlink_missing_items([line for order in orders for line in build_order_lines(order)])
+
+            with transaction.atomic():
+                OrderLine.objects.bulk_create(lines)
+
+            last_id = orders[-1].id
+            processed += len(orders)
+            created += len(lines)
+            self.stdout.write(f"Backfilled {processed} orders, {created} lines (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {processed} orders, {created} lines."))
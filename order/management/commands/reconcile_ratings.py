@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from order.models import RatingSummary
+from order.ratings import SUMMARY_ID, compute_rating_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the running rating total from orders and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report drift, do not store the recomputed totals.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Lock the summary so rating deltas applied meanwhile wait for the fix
+            summary = (RatingSummary.objects.select_for_update().filter(pk=SUMMARY_ID).first()
+                       or RatingSummary(pk=SUMMARY_ID))
+            rating_sum, rating_count = compute_rating_totals()
+
+            drift_sum = summary.rating_sum - rating_sum
+            drift_count = summary.rating_count - rating_count
+            self.stdout.write(
+                f"Stored: sum={summary.rating_sum} count={summary.rating_count}; "
+                f"recomputed: sum={rating_sum} count={rating_count}"
+            )
+            if not drift_sum and not drift_count:
+                self.stdout.write(self.style.SUCCESS("No drift."))
+                return
+
+            self.stdout.write(self.style.WARNING(f"Drift: sum {drift_sum:+d}, count {drift_count:+d}"))
+            if options['dry_run']:
+                return
+            summary.rating_sum = rating_sum
+            summary.rating_count = rating_count
+            summary.save()
+            self.stdout.write(self.style.SUCCESS("Rating summary corrected."))
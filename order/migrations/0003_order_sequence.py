@@ -0,0 +1,58 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+def seed_sequence(apps, schema_editor):
+    # Copy the numeric part of existing "ORD-<n>" numbers into sequence_number
+    # and start the counter after the highest one
+    Order = apps.get_model('order', 'Order')
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    last_value = 0
+    for order in Order.objects.only('id', 'order_number').iterator():
+        try:
+            number = int(order.order_number.replace('ORD-', ''))
+        except (ValueError, AttributeError):
+            continue
+        Order.objects.filter(id=order.id).update(sequence_number=number)
+        last_value = max(last_value, number)
+    OrderSequence.objects.update_or_create(key='orders', defaults={'last_value': last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0002_order_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='feedback',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sequence_number',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='star_rating',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_number',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+        migrations.RunPython(seed_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+def seed_change_seq(apps, schema_editor):
+    # Existing orders enter the feed in id order
+    Order = apps.get_model('order', 'Order')
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    last_value = 0
+    for order_id in Order.objects.order_by('id').values_list('id', flat=True).iterator():
+        last_value += 1
+        Order.objects.filter(id=order_id).update(change_seq=last_value)
+    OrderSequence.objects.update_or_create(key='order-changes', defaults={'last_value': last_value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0005_orderline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='change_seq',
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(seed_change_seq, migrations.RunPython.noop),
+    ]
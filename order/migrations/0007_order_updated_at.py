@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+def copy_created_at(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    Order.objects.filter(updated_at__isnull=True).update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0006_order_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
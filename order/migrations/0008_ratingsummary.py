@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+def seed_summary(apps, schema_editor):
+    Order = apps.get_model('order', 'Order')
+    RatingSummary = apps.get_model('order', 'RatingSummary')
+    totals = Order.objects.filter(star_rating__isnull=False).aggregate(
+        rating_sum=models.Sum('star_rating'), rating_count=models.Count('id')
+    )
+    RatingSummary.objects.create(pk=1, rating_sum=totals['rating_sum'] or 0, rating_count=totals['rating_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_sum', models.BigIntegerField(default=0)),
+                ('rating_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:10
+
+import django.utils.timezone
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def log_current_changes(apps, schema_editor):
+    # One change row per existing order at its current change_seq, so new
+    # change ids continue above every change_seq already handed out
+    Order = apps.get_model('order', 'Order')
+    OrderChange = apps.get_model('order', 'OrderChange')
+    OrderSequence = apps.get_model('order', 'OrderSequence')
+    changes = (
+        OrderChange(id=change_seq, order_number=order_number)
+        for order_number, change_seq in Order.objects.filter(change_seq__isnull=False)
+        .values_list('order_number', 'change_seq').iterator()
+    )
+    OrderChange.objects.bulk_create(changes, batch_size=1000)
+
+    last_value = OrderSequence.objects.filter(key='order-changes').values_list('last_value', flat=True).first()
+    if last_value and not OrderChange.objects.filter(id=last_value).exists():
+        # The last value went to an order since deleted or changed again
+        OrderChange.objects.create(id=last_value, order_number='')
+    OrderSequence.objects.filter(key='order-changes').delete()
+
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [OrderChange]):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0010_order_status_transition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_number', models.CharField(max_length=32)),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('deleted', True)), fields=['id'], name='order_change_deleted_idx')],
+            },
+        ),
+        migrations.RunPython(log_current_changes, migrations.RunPython.noop),
+    ]
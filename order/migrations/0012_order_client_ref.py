@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0011_order_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='client_ref',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
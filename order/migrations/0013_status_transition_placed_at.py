@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+def backfill_placed_at(apps, schema_editor):
+    OrderStatusTransition = apps.get_model('order', 'OrderStatusTransition')
+    Order = apps.get_model('order', 'Order')
+    OrderStatusTransition.objects.filter(order__isnull=False).update(
+        placed_at=models.Subquery(Order.objects.filter(id=models.OuterRef('order_id')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0012_order_client_ref'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatustransition',
+            name='placed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='orderstatustransition',
+            index=models.Index(fields=['order_number', 'to_status'], name='order_transition_number_idx'),
+        ),
+        migrations.RunPython(backfill_placed_at, migrations.RunPython.noop),
+    ]
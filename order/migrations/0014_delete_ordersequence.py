@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('menuitem', '0005_menu_change_version'),
+        ('order', '0013_status_transition_placed_at'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OrderSequence',
+        ),
+    ]
@@ -1,17 +1,27 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 import pytz
+from .feed import publish_order_change
+from .status_cache import invalidate_order_status
 
 class Order(models.Model):
     STATUS_CHOICES = [
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
     ]
 
-    order_number = models.CharField(max_length=20, unique=True)
+    order_number = models.CharField(max_length=32, unique=True)
+    # Integer position within the order number's sequence, used for sorting
+    # since order_number itself sorts lexically ("ORD-9" > "ORD-10")
+    sequence_number = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+    # Client-generated id of a bulk-submitted order; resubmissions of the same
+    # client_ref are not created again
+    client_ref = models.CharField(max_length=64, null=True, blank=True, unique=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, null=True)
     items = models.JSONField()  # Store the list of item IDs and their details
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
     
@@ -19,19 +29,160 @@ class Order(models.Model):
     star_rating = models.PositiveSmallIntegerField(null=True, blank=True)
     feedback = models.TextField(null=True, blank=True)
 
+    # Position in the order change feed, renewed on every save: the id of the
+    # OrderChange row logged for the save
+    change_seq = models.PositiveBigIntegerField(null=True, blank=True, db_index=True)
+
+    # Fields whose values as loaded from the database are kept on the
+    # instance, so save/delete handlers can tell what changed. `items` is
+    # kept by reference: assign a new value instead of mutating it in place.
+    TRACKED_FIELDS = ('status', 'total_price', 'star_rating', 'items')
+
+    class Meta:
+        indexes = [
+            # Newest-first listing (keyset on created_at, id) and date-range counts
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            # Active order counts and status-filtered listing
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            # Average rating and rated-order filters only touch rated rows
+            models.Index(fields=['star_rating'], name='order_rated_idx', condition=models.Q(star_rating__isnull=False)),
+        ]
+
     @classmethod
-    def generate_order_number(cls):
-        # Get the last order by order_number (regardless of date)
-        last_order = cls.objects.order_by('-order_number').first()
-        if last_order:
-            try:
-                last_number = int(last_order.order_number.replace('ORD-', ''))
-            except (ValueError, AttributeError):
-                last_number = 0
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        return f"ORD-{new_number}"
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {
+            field: loaded[field] for field in cls.TRACKED_FIELDS if field in loaded
+        }
+        return instance
+
+    @property
+    def loaded_values(self):
+        """Tracked field values as last read from or written to the database."""
+        return getattr(self, '_loaded_values', None)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        previous_status = (self.loaded_values or {}).get('status')
+        with transaction.atomic(savepoint=False):
+            self.change_seq = OrderChange.objects.create(order_number=self.order_number).id
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq', 'updated_at'}
+            super().save(*args, **kwargs)
+            if created or (previous_status is not None and previous_status != self.status):
+                OrderStatusTransition.objects.create(
+                    order=self,
+                    order_number=self.order_number,
+                    from_status=None if created else previous_status,
+                    to_status=self.status,
+                    placed_at=self.created_at,
+                    created_at=self.updated_at or self.created_at,
+                )
+            publish_order_change(self.change_seq)
+            invalidate_order_status(self.order_number, self.change_seq)
+        self._loaded_values = {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            # Tombstone for feed clients, which would otherwise never hear of the delete
+            change = OrderChange.objects.create(order_number=self.order_number, deleted=True)
+            result = super().delete(*args, **kwargs)
+            publish_order_change(change.id)
+            invalidate_order_status(self.order_number, change.id)
+        return result
 
     def __str__(self):
         return self.order_number
+
+class OrderChange(models.Model):
+    """
+    Append-only log of order writes. Its auto-increment id is the order's
+    change_seq, so saves take feed positions from the database's own id
+    sequence instead of locking a shared counter row until they commit.
+    Rows with `deleted` are the tombstones of deleted orders.
+    """
+    order_number = models.CharField(max_length=32)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # The feed only reads tombstones
+            models.Index(fields=['id'], name='order_change_deleted_idx', condition=models.Q(deleted=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.order_number}{' (deleted)' if self.deleted else ''}"
+
+class OrderLine(models.Model):
+    """
+    One menu item of an order, with the quantity and the price it was sold at.
+    Mirrors Order.items so per-item reports can aggregate in SQL.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    menu_item = models.ForeignKey('menuitem.MenuItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='order_lines')
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.order_id}: {self.quantity} x {self.menu_item_id}"
+
+class OrderStatusTransition(models.Model):
+    """
+    Append-only log of order status changes, including the initial status
+    when an order is placed. Rows outlive their order so throughput history
+    is not lost when orders are deleted; `placed_at` keeps the order's
+    creation time so prep times can still be computed.
+
+    Kitchen stats read completions from here (analytics.kitchen), and only
+    an order's first completion counts towards throughput and prep times.
+    """
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='status_transitions')
+    order_number = models.CharField(max_length=32)
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, null=True, blank=True)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    placed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['to_status', 'created_at'], name='order_transition_status_idx'),
+            # Earlier completions of the same order
+            models.Index(fields=['order_number', 'to_status'], name='order_transition_number_idx'),
+        ]
+
+    @classmethod
+    def for_created(cls, orders):
+        """Initial transitions for orders inserted without Order.save()."""
+        return [
+            cls(order=order, order_number=order.order_number, to_status=order.status,
+                placed_at=order.created_at, created_at=order.created_at)
+            for order in orders
+        ]
+
+    def is_first_completion(self):
+        """Whether this completes its order for the first time."""
+        return self.to_status == 'completed' and not OrderStatusTransition.objects.filter(
+            order_number=self.order_number, to_status='completed', id__lt=self.id
+        ).exists()
+
+    def __str__(self):
+        return f"{self.order_number}: {self.from_status} -> {self.to_status}"
+
+class RatingSummary(models.Model):
+    """
+    Single-row running total of star ratings, so the average rating is a
+    primary key lookup instead of an aggregate over every rated order. It is
+    the all-time sum of the SalesRollup rating deltas and is updated with
+    them (see analytics.rollups).
+    """
+    rating_sum = models.BigIntegerField(default=0)
+    rating_count = models.BigIntegerField(default=0)
+
+    @property
+    def average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    def __str__(self):
+        return f"{self.average:.2f} ({self.rating_count} ratings)"
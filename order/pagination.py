@@ -0,0 +1,40 @@
+import base64
+import json
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def encode_cursor(order):
+    """Opaque cursor pointing just past `order` in (-created_at, -id) order."""
+    raw = json.dumps([order.created_at.isoformat(), order.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id) from a cursor, raising ValueError if malformed."""
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if created_at is None or not isinstance(order_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, order_id
+
+
+def parse_moment(value):
+    """
+    Parse an ISO datetime or date query parameter. Dates mean midnight in the
+    current time zone. Raises ValueError if the value is neither.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
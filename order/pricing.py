@@ -0,0 +1,23 @@
+from collections import Counter
+from decimal import Decimal
+
+
+def price_items(item_ids, menu):
+    """
+    Price a cart of menu item ids against a {id: MenuEntry} snapshot.
+
+    Returns (item_ids, counts, total_price, item_details), where item_ids are
+    normalized to ints and counts folds repeated ids into quantities. Ids not
+    on the menu are ignored, as before.
+    """
+    item_ids = [int(item_id) for item_id in item_ids]
+    counts = Counter(item_id for item_id in item_ids if item_id in menu)
+    total_price = sum((menu[item_id].price * quantity for item_id, quantity in counts.items()), Decimal('0'))
+    item_details = [
+        {
+            'id': item_id,
+            'name': menu[item_id].name,
+            'price': str(menu[item_id].price)
+        } for item_id in counts
+    ]
+    return item_ids, counts, total_price, item_details
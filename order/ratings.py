@@ -0,0 +1,36 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Order, RatingSummary
+
+SUMMARY_ID = 1
+
+
+def apply_rating_delta(delta_sum, delta_count):
+    """
+    Add to the running rating total. Called with the rating part of the
+    sales rollup deltas (see analytics.rollups), so every order save and
+    delete, from the API, the admin or the ORM, keeps it up to date.
+    """
+    if not delta_sum and not delta_count:
+        return
+    updates = {'rating_sum': F('rating_sum') + delta_sum, 'rating_count': F('rating_count') + delta_count}
+    if RatingSummary.objects.filter(pk=SUMMARY_ID).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            RatingSummary.objects.create(pk=SUMMARY_ID, rating_sum=delta_sum, rating_count=delta_count)
+    except IntegrityError:
+        RatingSummary.objects.filter(pk=SUMMARY_ID).update(**updates)
+
+
+def get_rating_summary():
+    return RatingSummary.objects.filter(pk=SUMMARY_ID).first() or RatingSummary(pk=SUMMARY_ID)
+
+
+def compute_rating_totals():
+    """(rating_sum, rating_count) recomputed from the Order table."""
+    totals = Order.objects.filter(star_rating__isnull=False).aggregate(
+        rating_sum=Sum('star_rating'), rating_count=Count('id')
+    )
+    return totals['rating_sum'] or 0, totals['rating_count']
@@ -0,0 +1,74 @@
+import re
+from threading import Lock
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Sequence
+
+ORDER_NUMBER_PREFIX = 'ORD'
+LOCATION_PATTERN = re.compile(r'^[A-Za-z0-9]{1,8}$')
+
+
+class OrderNumberAllocator:
+    """
+    Hands out order numbers from blocks reserved with `Sequence.reserve`.
+
+    Each process keeps the unused remainder of its current block per scope,
+    so with ORDER_NUMBER_BLOCK_SIZE > 1 most allocations need no query at all.
+    Numbers left in a block when the process exits, or when a daily sequence
+    rolls over, are simply skipped.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._blocks = {}  # scope key -> [next value, last value]
+        self._day = None  # day of the blocks kept with daily reset
+
+    def _scope(self, location=None, day=None):
+        parts = []
+        if location:
+            if not LOCATION_PATTERN.match(location):
+                raise ValueError("Location must be 1-8 letters or digits.")
+            parts.append(location.upper())
+        if day:
+            parts.append(day)
+        return parts
+
+    def allocate(self, location=None, count=1):
+        """
+        Return a list of `count` (sequence_number, order_number) pairs.
+        """
+        day = None
+        if getattr(settings, 'ORDER_NUMBER_RESET', 'never') == 'daily':
+            day = timezone.localdate().strftime('%Y%m%d')
+        parts = self._scope(location, day)
+        key = ':'.join(['orders'] + parts)
+        block_size = max(getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1), 1)
+
+        values = []
+        with self._lock:
+            if day != self._day:
+                # Earlier days' blocks can never be used again
+                self._blocks.clear()
+                self._day = day
+            block = self._blocks.get(key)
+            while len(values) < count:
+                if block is None or block[0] > block[1]:
+                    size = max(block_size, count - len(values))
+                    first = Sequence.reserve(key, size)
+                    block = [first, first + size - 1]
+                    self._blocks[key] = block
+                values.append(block[0])
+                block[0] += 1
+
+        prefix = '-'.join([ORDER_NUMBER_PREFIX] + parts)
+        return [(value, f"{prefix}-{value}") for value in values]
+
+
+order_numbers = OrderNumberAllocator()
+
+
+def allocate_order_number(location=None):
+    """Return a single (sequence_number, order_number) pair."""
+    return order_numbers.allocate(location=location)[0]
@@ -12,4 +12,21 @@ class OrderFeedbackSerializer(serializers.ModelSerializer):
     def validate_star_rating(self, value):
         if value < 1 or value > 5:
             raise serializers.ValidationError("Star rating must be between 1 and 5.")
-        return value
\ No newline at end of file
+        return value
+
+# Fields returned by the order read endpoints, in response order
+ORDER_FIELDS = ['order_number', 'total_price', 'created_at', 'items', 'status', 'star_rating', 'feedback']
+
+
+def serialize_order(order, fields=ORDER_FIELDS):
+    """
+    Plain-dict representation of an order, limited to `fields`. Cheaper than a
+    ModelSerializer for the list endpoints, which render many rows.
+    """
+    data = {}
+    for field in fields:
+        value = getattr(order, field)
+        if field == 'total_price':
+            value = str(value)
+        data[field] = value
+    return data
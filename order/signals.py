@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with `orders` (a list of saved Order instances) after bulk_create,
+# which bypasses the per-instance post_save signal.
+orders_bulk_created = Signal()
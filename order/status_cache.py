@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _key(order_number):
+    return f'order:status:{order_number}'
+
+
+def _latest_key(order_number):
+    return f'order:status:{order_number}:latest'
+
+
+def _ttl():
+    return getattr(settings, 'ORDER_STATUS_CACHE_TTL', 5)
+
+
+def get_order_status(order_number):
+    """
+    Cached {'change_seq', 'etag', 'last_modified', 'data'} entry for an order,
+    or None if there is none or it predates the order's last committed write.
+    """
+    found = cache.get_many([_key(order_number), _latest_key(order_number)])
+    entry = found.get(_key(order_number))
+    latest = found.get(_latest_key(order_number))
+    if entry is None or (latest is not None and entry['change_seq'] < latest):
+        return None
+    return entry
+
+
+def set_order_status(order_number, entry):
+    cache.set(_key(order_number), entry, timeout=_ttl())
+
+
+def invalidate_order_status(order_number, change_seq):
+    """
+    Once the current write commits, record change_seq as the order's latest,
+    which makes every cached entry of an older change_seq stale. Unlike
+    deleting the entry, this also covers a reader that loaded the row before
+    the commit and caches it afterwards. The marker outlives any entry it
+    has to reject.
+    """
+    transaction.on_commit(lambda: cache.set(_latest_key(order_number), change_seq, timeout=_ttl() + 60))
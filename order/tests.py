@@ -1,3 +1,632 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import re
+import threading
+from datetime import date, datetime, timedelta
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.querybudget import QueryBudget, QueryBudgetMixin
+from menuitem.models import Category, MenuItem
+from user_authentication.models import User
+from .export import EXPORT_COLUMNS
+from .feed import FEED_HEAD_KEY, _publish
+from .models import Order, OrderLine, OrderStatusTransition
+from .pagination import parse_moment
+from .ratings import get_rating_summary
+from .sequence import OrderNumberAllocator
+from .status_cache import get_order_status, set_order_status
+from .views import BulkCreateOrderView
+
+
+class OrderQueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on every query the order-heavy endpoints issue against the
+    Order table and fails if any of them falls back to a full table scan.
+    """
+    table = Order._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        orders = []
+        for i in range(2000):
+            orders.append(Order(
+                order_number=f"ORD-{i + 1}",
+                sequence_number=i + 1,
+                total_price=Decimal('9.50'),
+                items={'item_ids': [1], 'item_details': []},
+                status='completed' if i % 10 else 'in_progress',
+                star_rating=(i % 5) + 1 if i % 7 == 0 else None,
+            ))
+        Order.objects.bulk_create(orders)
+        # Spread the orders over the last few months
+        for order in Order.objects.only('id'):
+            Order.objects.filter(id=order.id).update(created_at=now - timedelta(hours=order.id))
+        cls.user = User.objects.create_user(email='admin@example.com', password='secret', user_type='ADMIN')
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'ANALYZE "{cls.table}"')
+
+    def setUp(self):
+        # Analytics results are cached; make every endpoint hit the database
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return '\n'.join(row[-1] for row in cursor.fetchall())
+            if connection.vendor == 'postgresql':
+                # Tiny test tables would otherwise always be scanned sequentially
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return '\n'.join(row[0] for row in cursor.fetchall())
+        self.skipTest(f"No plan check for {connection.vendor}")
+
+    def is_full_scan(self, plan):
+        if connection.vendor == 'sqlite':
+            return re.search(rf'\bSCAN "?{self.table}"?(?! USING)', plan, re.MULTILINE) is not None
+        return re.search(rf'Seq Scan on "?{self.table}"?', plan) is not None
+
+    def assertNoFullScan(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, url)
+
+        order_queries = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and self.table in query['sql']
+        ]
+        for sql in order_queries:
+            plan = self.explain(sql)
+            self.assertFalse(self.is_full_scan(plan), f"{url} scans {self.table}:\n{sql}\n{plan}")
+        return order_queries
+
+    def test_analytics(self):
+        self.assertNoFullScan(reverse('analytics'))
+
+    def test_weekly_sales(self):
+        self.assertNoFullScan(reverse('weekly-sales'))
+
+    def test_average_rating(self):
+        self.assertNoFullScan(reverse('average-rating'))
+
+    def test_list_orders(self):
+        url = reverse('list-orders')
+        self.assertNoFullScan(url)
+        self.assertNoFullScan(f'{url}?status=in_progress')
+        self.assertNoFullScan(f'{url}?rated=true')
+        self.assertNoFullScan(f'{url}?created_after={(timezone.now() - timedelta(days=3)).date()}')
+
+        cursor = self.client.get(url).data['next_cursor']
+        self.assertNoFullScan(f'{url}?cursor={cursor}')
+        self.assertNoFullScan(f'{url}?status=completed&cursor={cursor}')
+
+    def test_get_order(self):
+        self.assertNoFullScan(reverse('get-order', args=['ORD-42']))
+
+    def test_dashboard(self):
+        url = reverse('dashboard')
+        self.assertNoFullScan(url)
+        self.assertNoFullScan(f'{url}?sections=active,cancelled')
+
+    def test_export_orders(self):
+        # The export query only runs while the response is streamed
+        start = (timezone.now() - timedelta(days=7)).date()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{reverse('export-orders')}?start={start}")
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        # Header plus one row per order (each seeded order has one item)
+        expected = Order.objects.filter(created_at__gte=parse_moment(str(start))).count()
+        self.assertEqual(content.count(b'\n'), expected + 1)
+
+        sql = next(query['sql'] for query in queries.captured_queries if self.table in query['sql'])
+        plan = self.explain(sql)
+        self.assertFalse(self.is_full_scan(plan), f"export scans {self.table}:\n{sql}\n{plan}")
+
+    def test_kitchen_stats(self):
+        self.assertNoFullScan(reverse('kitchen-stats'))
+
+
+class OrderQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = 'order.urls'
+    prefix = '/order'
+    # Streams forever
+    exempt = ['order-feed-stream']
+    budgets = [
+        QueryBudget('create-order', 15, 'post', data={'items': [1, 2, 3, 4, 5, 5, 6]}),
+        QueryBudget('bulk-create-order', 12, 'post', data={'orders': [{'items': [1, 2, 3]}, {'items': [4, 5, 6, 7]}]}),
+        QueryBudget('get-order', 1, args=['ORD-1']),
+        QueryBudget('list-orders', 1),
+        QueryBudget('export-orders', 1, query='start=2000-01-01'),
+        QueryBudget('update-order-status', 12, 'patch', args=['ORD-1'], data={'status': 'completed'}),
+        QueryBudget('update-order-status', 9, 'patch', args=['ORD-2'], data={'status': 'cancelled'}),
+        QueryBudget('put-order', 11, 'put', args=['ORD-3'], data={
+            'status': 'in_progress',
+            'items': {'item_ids': [1, 1, 2], 'item_details': [{'id': 1, 'name': 'Item 0', 'price': '4.50'}]},
+        }),
+        QueryBudget('patch-order', 6, 'patch', args=['ORD-3'], data={'total_price': '9.00'}),
+        QueryBudget('order-feedback', 7, 'post', data={'order_number': 'ORD-1', 'star_rating': 5}),
+        QueryBudget('average-rating', 1),
+        QueryBudget('order-feed', 3),
+        QueryBudget('delete-order', 11, 'delete', args=['ORD-4']),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        for i in range(10):
+            MenuItem.objects.create(name=f'Item {i}', price=Decimal('4.50'), category=category, description='')
+        cls.user = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+        client = APIClient()
+        for items in ([1, 2], [3], [4, 5, 6], [7, 8]):
+            client.post('/order/create/', {'items': items}, format='json')
+
+
+
+class ExportOrdersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='accounts@example.com', password='secret', user_type='ADMIN')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_range_has_header(self):
+        response = self.client.get(f"{reverse('export-orders')}?start=2000-01-01&end=2000-01-02")
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines(), [','.join(EXPORT_COLUMNS)])
+
+    def create_orders(self):
+        details = [{'id': 1, 'name': 'Soup', 'price': '2.00'}, {'id': 2, 'name': 'Bread', 'price': '1.50'}]
+        for order_number, day, items in [
+            ('ORD-1', 1, {'item_ids': [1, 2, 1], 'item_details': details}),
+            ('ORD-2', 2, {}),
+            # Outside the range
+            ('ORD-3', 5, {'item_ids': [2], 'item_details': details[1:]}),
+        ]:
+            order = Order.objects.create(order_number=order_number, total_price=Decimal('5.50'), items=items)
+            Order.objects.filter(id=order.id).update(created_at=timezone.make_aware(datetime(2025, 5, day, 12)))
+
+    def export(self, **params):
+        params = {'start': '2025-05-01', 'end': '2025-05-03', **params}
+        response = self.client.get(reverse('export-orders'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_one_row_per_item_with_quantities(self):
+        self.create_orders()
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders-2025-05-01-2025-05-03.csv"')
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            [(row['order_number'], row['item_name'], row['unit_price'], row['quantity']) for row in rows],
+            [('ORD-1', 'Soup', '2.00', '2'), ('ORD-1', 'Bread', '1.50', '1'), ('ORD-2', '', '', '')],
+        )
+
+    def test_ndjson(self):
+        self.create_orders()
+        response, content = self.export(output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(list(rows[0]), EXPORT_COLUMNS)
+        self.assertEqual([(row['item_id'], row['quantity']) for row in rows], [(1, 2), (2, 1), (None, None)])
+        self.assertEqual((rows[0]['total_price'], rows[0]['created_at']), ('5.50', '2025-05-01T12:00:00+00:00'))
+
+    def test_gzip(self):
+        self.create_orders()
+        _, plain = self.export(output='ndjson')
+        # Small chunks so the compressed stream spans several of them
+        with mock.patch('order.export.CHUNK_BYTES', 100):
+            response, compressed = self.export(output='ndjson', compress='gzip')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'start': 'yesterday'}, {'start': '2025-05-01', 'end': '2025-13-01'},
+                       {'start': '2025-05-01', 'output': 'xlsx'}):
+            with self.subTest(**params):
+                response = self.client.get(reverse('export-orders'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class BackfillOrderLinesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.soup, cls.bread = [
+            MenuItem.objects.create(name=name, price=Decimal('2.00'), category=category, description='')
+            for name in ('Soup', 'Bread')
+        ]
+        details = [{'id': cls.soup.id, 'price': '4.50'}, {'id': cls.bread.id, 'price': '1.25'}, {'id': 999, 'price': '3.00'}]
+        # bulk_create skips Order.save, like orders placed before lines existed
+        Order.objects.bulk_create([
+            Order(order_number='ORD-1', total_price=Decimal('10.25'), items={
+                'item_ids': [cls.soup.id, cls.soup.id, cls.bread.id], 'item_details': details[:2]}),
+            # 999 was deleted from the menu since
+            Order(order_number='ORD-2', total_price=Decimal('3.00'), items={'item_ids': [999], 'item_details': details}),
+            # An id without a price snapshot was not charged
+            Order(order_number='ORD-3', total_price=Decimal('1.25'), items={
+                'item_ids': [cls.bread.id, cls.soup.id], 'item_details': details[1:2]}),
+            Order(order_number='ORD-4', total_price=Decimal('0.00'), items={}),
+        ])
+
+    def backfill(self, **options):
+        call_command('backfill_order_lines', stdout=io.StringIO(), **options)
+        return sorted(
+            ((line.order.order_number, line.menu_item_id, line.quantity, line.unit_price)
+             for line in OrderLine.objects.select_related('order')),
+            key=lambda line: (line[0], line[1] or 0),
+        )
+
+    def test_lines_mirror_items(self):
+        self.assertEqual(self.backfill(chunk_size=2), [
+            ('ORD-1', self.soup.id, 2, Decimal('4.50')),
+            ('ORD-1', self.bread.id, 1, Decimal('1.25')),
+            ('ORD-2', None, 1, Decimal('3.00')),
+            ('ORD-3', self.bread.id, 1, Decimal('1.25')),
+        ])
+
+    def test_rerun_and_after_id_skip_done_orders(self):
+        first_id = Order.objects.get(order_number='ORD-1').id
+        lines = self.backfill(after_id=first_id)
+        self.assertEqual({line[0] for line in lines}, {'ORD-2', 'ORD-3'})
+        self.assertEqual(len(self.backfill()), 4)
+        # Nothing is duplicated on another run
+        self.assertEqual(len(self.backfill(chunk_size=1)), 4)
+
+
+class ReconcileRatingsTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, star_rating in enumerate([5, 3, None]):
+                Order.objects.create(order_number=f'ORD-{i}', total_price=Decimal('5.00'), items={}, star_rating=star_rating)
+        # Drift: a queryset update skips the signals maintaining the summary
+        Order.objects.filter(order_number='ORD-2').update(star_rating=4)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_ratings', *args, stdout=out)
+        return out.getvalue()
+
+    def summary(self):
+        summary = get_rating_summary()
+        return summary.rating_sum, summary.rating_count
+
+    def test_dry_run_only_reports(self):
+        output = self.reconcile('--dry-run')
+        self.assertIn('Stored: sum=8 count=2; recomputed: sum=12 count=3', output)
+        self.assertIn('Drift: sum -4, count -1', output)
+        self.assertEqual(self.summary(), (8, 2))
+
+    def test_run_corrects_the_summary(self):
+        self.assertIn('Rating summary corrected.', self.reconcile())
+        self.assertEqual(self.summary(), (12, 3))
+        self.assertIn('No drift.', self.reconcile())
+
+
+class ListOrdersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        base = timezone.now() - timedelta(days=1)
+        # Three orders share a timestamp, so paging has to break ties on id
+        offsets = [0, 1, 1, 1, 2, 3, 5]
+        Order.objects.bulk_create([
+            Order(order_number=f'ORD-{i + 1}', total_price=Decimal('5.00'), items={},
+                  status='completed' if i % 2 else 'in_progress', star_rating=(i % 5) + 1 if i % 3 == 0 else None)
+            for i in range(len(offsets))
+        ])
+        for order, offset in zip(Order.objects.order_by('id'), offsets):
+            Order.objects.filter(id=order.id).update(created_at=base + timedelta(minutes=offset))
+
+    def pages(self, **params):
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(reverse('list-orders'), {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            pages.append([order['order_number'] for order in response.data['results']])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return pages
+
+    def newest_first(self, orders):
+        return [order.order_number for order in orders.order_by('-created_at', '-id')]
+
+    def test_pages_cover_every_order_once_newest_first(self):
+        pages = self.pages(limit=2)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), self.newest_first(Order.objects.all()))
+
+    def test_exact_last_page_has_no_cursor(self):
+        self.assertEqual([len(page) for page in self.pages(limit=7)], [7])
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        first = self.client.get(reverse('list-orders'), {'limit': 3}).data
+        Order.objects.create(order_number='ORD-NEW', total_price=Decimal('1.00'), items={})
+        rest = self.client.get(reverse('list-orders'), {'limit': 10, 'cursor': first['next_cursor']}).data
+        seen = [order['order_number'] for order in first['results'] + rest['results']]
+        self.assertNotIn('ORD-NEW', seen)
+        self.assertEqual(seen, self.newest_first(Order.objects.exclude(order_number='ORD-NEW')))
+
+    def test_filters_apply_across_pages(self):
+        self.assertEqual(sum(self.pages(limit=1, status='completed'), []),
+                         self.newest_first(Order.objects.filter(status='completed')))
+        self.assertEqual(sum(self.pages(limit=2, rated='true', min_rating=2), []),
+                         self.newest_first(Order.objects.filter(star_rating__gte=2)))
+
+    def test_fields_limit_the_payload(self):
+        order = self.client.get(reverse('list-orders'), {'limit': 1, 'fields': 'order_number,status'}).data['results'][0]
+        self.assertEqual(set(order), {'order_number', 'status'})
+
+    def test_rejects_bad_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 0}, {'limit': 'x'}, {'fields': 'nope'},
+                       {'created_after': 'yesterday'}):
+            with self.subTest(**params):
+                self.assertEqual(self.client.get(reverse('list-orders'), params).status_code, 400)
+
+
+@override_settings(ORDER_FEED_SETTLE_SECONDS=0)
+class OrderFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        MenuItem.objects.create(name='Soup', price=Decimal('4.50'), category=category, description='')
+        cls.kitchen = User.objects.create_user(email='kitchen@example.com', password='secret', user_type='KITCHEN')
+        cls.admin = User.objects.create_user(email='admin@example.com', password='secret', user_type='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.kitchen)
+
+    def create_order(self):
+        return APIClient().post('/order/create/', {'items': [1]}, format='json').data['order_number']
+
+    def feed(self, **params):
+        response = self.client.get(reverse('order-feed'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_requires_kitchen_user(self):
+        self.assertEqual(APIClient().get(reverse('order-feed')).status_code, 401)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(reverse('order-feed')).status_code, 403)
+
+    def test_rejects_non_positive_limit(self):
+        self.assertEqual(self.client.get(reverse('order-feed'), {'limit': -1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('order-feed'), {'limit': 0}).status_code, 400)
+
+    def test_changes_in_order(self):
+        first, second = self.create_order(), self.create_order()
+        page = self.feed(limit=1)
+        self.assertEqual([order['order_number'] for order in page['orders']], [first])
+        page = self.feed(cursor=page['cursor'])
+        self.assertEqual([order['order_number'] for order in page['orders']], [second])
+        self.assertEqual(self.feed(cursor=page['cursor'])['orders'], [])
+
+    def test_deletes_are_published(self):
+        order_number = self.create_order()
+        cursor = self.feed()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().delete(reverse('delete-order', args=[order_number]))
+
+        self.assertGreater(cache.get(FEED_HEAD_KEY), cursor)
+        page = self.feed(cursor=cursor)
+        self.assertEqual(page['orders'], [{'order_number': order_number, 'change_seq': page['cursor'], 'deleted': True}])
+        self.assertEqual(self.feed(cursor=page['cursor'])['orders'], [])
+
+    @override_settings(ORDER_FEED_SETTLE_SECONDS=60)
+    def test_recent_changes_are_held_back(self):
+        self.create_order()
+        page = self.feed()
+        self.assertEqual(page, {'cursor': 0, 'orders': []})
+
+    def test_head_never_moves_backwards(self):
+        _publish(5)
+        _publish(3)
+        self.assertEqual(cache.get(FEED_HEAD_KEY), 5)
+        _publish(8)
+        self.assertEqual(cache.get(FEED_HEAD_KEY), 8)
+
+    def test_head_is_seeded_from_change_log(self):
+        self.create_order()
+        cache.clear()
+        self.feed()
+        self.assertEqual(cache.get(FEED_HEAD_KEY), Order.objects.get().change_seq)
+
+
+class OrderNumberAllocatorTests(TransactionTestCase):
+    def test_concurrent_allocations_are_unique(self):
+        allocator = OrderNumberAllocator()
+        numbers = []
+
+        def allocate():
+            try:
+                for _ in range(20):
+                    numbers.extend(allocator.allocate(count=2))
+            finally:
+                connection.close()
+
+        with override_settings(ORDER_NUMBER_BLOCK_SIZE=7):
+            threads = [threading.Thread(target=allocate) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(numbers), 160)
+        self.assertEqual(len(set(numbers)), 160)
+
+    @override_settings(ORDER_NUMBER_BLOCK_SIZE=10)
+    def test_workers_take_separate_blocks(self):
+        first, second = OrderNumberAllocator(), OrderNumberAllocator()
+        self.assertEqual(first.allocate(count=2), [(1, 'ORD-1'), (2, 'ORD-2')])
+        self.assertEqual(second.allocate(), [(11, 'ORD-11')])
+        self.assertEqual(first.allocate(), [(3, 'ORD-3')])
+        self.assertEqual(first.allocate(location='kiosk1'), [(1, 'ORD-KIOSK1-1')])
+
+    @override_settings(ORDER_NUMBER_RESET='daily', ORDER_NUMBER_BLOCK_SIZE=10)
+    def test_daily_reset(self):
+        allocator = OrderNumberAllocator()
+        with mock.patch('order.sequence.timezone.localdate', return_value=date(2025, 5, 15)):
+            self.assertEqual(allocator.allocate(count=2), [(1, 'ORD-20250515-1'), (2, 'ORD-20250515-2')])
+            allocator.allocate(location='KIOSK1')
+        with mock.patch('order.sequence.timezone.localdate', return_value=date(2025, 5, 16)):
+            self.assertEqual(allocator.allocate(), [(1, 'ORD-20250516-1')])
+        # Only the current day's block is kept
+        self.assertEqual(list(allocator._blocks), ['orders:20250516'])
+
+    def test_rejects_bad_location(self):
+        with self.assertRaises(ValueError):
+            OrderNumberAllocator().allocate(location='not a location')
+
+
+class GetOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        MenuItem.objects.create(name='Soup', price=Decimal('4.50'), category=category, description='')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order_number = self.client.post('/order/create/', {'items': [1]}, format='json').data['order_number']
+        self.url = reverse('get-order', args=[self.order_number])
+
+    def set_status(self, new_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.get(order_number=self.order_number)
+            order.status = new_status
+            order.save()
+        return order
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{Order.objects.get().change_seq}"')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        self.set_status('completed')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_entry_loaded_before_a_write_is_not_served(self):
+        # A poll reads the row, then a status change commits before the poll
+        # caches what it read
+        stale = Order.objects.get()
+        self.set_status('completed')
+        set_order_status(self.order_number, {
+            'change_seq': stale.change_seq,
+            'etag': f'"{stale.change_seq}"',
+            'last_modified': stale.created_at,
+            'data': {'status': stale.status},
+        })
+        self.assertIsNone(get_order_status(self.order_number))
+        self.assertEqual(self.client.get(self.url).data['status'], 'completed')
+
+    def test_deleted_order(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get().delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class BulkCreateOrderTests(TestCase):
+    url = '/order/bulk-create/'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Mains')
+        cls.soup = MenuItem.objects.create(name='Soup', price=Decimal('4.50'), category=category, description='')
+        cls.bread = MenuItem.objects.create(name='Bread', price=Decimal('2.00'), category=category, description='')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, orders):
+        return self.client.post(self.url, {'orders': orders}, format='json')
+
+    def test_creates_orders_in_submission_order(self):
+        response = self.post([{'items': [self.soup.id, self.soup.id], 'client_ref': 'a'}, {'items': [self.bread.id]}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        first, second = response.data['results']
+        self.assertEqual((first['index'], first['client_ref'], first['total_price']), (0, 'a', '9.00'))
+        self.assertEqual((second['index'], second['total_price']), (1, '2.00'))
+        self.assertEqual(OrderLine.objects.get(order__order_number=first['order_number']).quantity, 2)
+        self.assertEqual(OrderStatusTransition.objects.count(), 2)
+
+    def test_invalid_entries_get_messages(self):
+        response = self.post([{'items': ['x']}, {'items': []}, 'soup', {'items': [self.soup.id], 'client_ref': 5}, {'items': [self.soup.id]}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 4))
+        self.assertEqual([result.get('error') for result in response.data['results']], [
+            'items must be a list of menu item ids',
+            'No items provided',
+            'Each order must be an object',
+            'client_ref must be a string of 1-64 characters',
+            None,
+        ])
+
+    def test_all_invalid(self):
+        response = self.post([{'items': ['x']}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_resubmitted_batch_is_not_duplicated(self):
+        orders = [{'items': [self.soup.id], 'client_ref': 'kiosk-1'}, {'items': [self.bread.id], 'client_ref': 'kiosk-2'}]
+        first = self.post(orders).data
+        self.post(orders[:1])
+        retry = self.post(orders + [{'items': [self.bread.id], 'client_ref': 'kiosk-3'}]).data
+
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual((retry['created'], retry['duplicates']), (1, 2))
+        for before, after in zip(first['results'], retry['results']):
+            self.assertEqual(after['order_number'], before['order_number'])
+            self.assertTrue(after['duplicate'])
+
+    def test_repeated_client_ref_within_batch(self):
+        response = self.post([{'items': [self.soup.id], 'client_ref': 'r'}, {'items': [self.soup.id], 'client_ref': 'r'}])
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, 1))
+        first, second = response.data['results']
+        self.assertEqual(second['order_number'], first['order_number'])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_concurrent_duplicate_is_a_conflict(self):
+        # Another request created the order after this one checked for it
+        with mock.patch.object(BulkCreateOrderView, 'existing_orders', return_value={}):
+            Order.objects.create(order_number='ORD-X', client_ref='r', total_price=1, items={})
+            response = self.post([{'items': [self.soup.id], 'client_ref': 'r'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
@@ -1,17 +1,22 @@
 from django.urls import path
 from .views import (
-    CreateOrderView, UpdateOrderStatusView, GetOrderView, ListOrdersView,
-    DeleteOrderView, PutOrderView, PatchOrderView, OrderFeedbackAPIView, AverageRatingAPIView
+    CreateOrderView, BulkCreateOrderView, UpdateOrderStatusView, GetOrderView, ListOrdersView, ExportOrdersView,
+    DeleteOrderView, PutOrderView, PatchOrderView, OrderFeedbackAPIView, AverageRatingAPIView,
+    OrderFeedView, OrderFeedStreamView
 )
 
 urlpatterns = [
     path('create/', CreateOrderView.as_view(), name='create-order'),
+    path('bulk-create/', BulkCreateOrderView.as_view(), name='bulk-create-order'),
     path('update-status/<str:order_number>/', UpdateOrderStatusView.as_view(), name='update-order-status'),
     path('get/<str:order_number>/', GetOrderView.as_view(), name='get-order'),
     path('orders/', ListOrdersView.as_view(), name='list-orders'),
+    path('export/', ExportOrdersView.as_view(), name='export-orders'),
     path('delete/<str:order_number>/', DeleteOrderView.as_view(), name='delete-order'),
     path('put/<str:order_number>/', PutOrderView.as_view(), name='put-order'),
     path('patch/<str:order_number>/', PatchOrderView.as_view(), name='patch-order'),
     path('feedback/', OrderFeedbackAPIView.as_view(), name='order-feedback'),
     path('average-rating/', AverageRatingAPIView.as_view(), name='average-rating'),
+    path('feed/', OrderFeedView.as_view(), name='order-feed'),
+    path('feed/stream/', OrderFeedStreamView.as_view(), name='order-feed-stream'),
 ]
\ No newline at end of file
@@ -1,16 +1,39 @@
+import asyncio
+import json
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.views import View
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework import exceptions, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import Order
-from menuitem.models import MenuItem
+from .models import Order, OrderChange, OrderLine, OrderStatusTransition
+from .feed import get_feed_head, publish_order_change
+from .signals import orders_bulk_created
+from .ratings import get_rating_summary
+from .status_cache import get_order_status, set_order_status
+from .lines import build_order_lines, sync_order_lines
+from menuitem.cache import menu_cache
+from menuitem.counters import record_order_counts
 from decimal import Decimal
-from django.db import transaction, models
+from collections import Counter
+from django.db import IntegrityError, transaction
 from rest_framework.permissions import BasePermission
 from rest_framework.generics import RetrieveAPIView
-from .serializers import OrderFeedbackSerializer
-from django.db.models import Avg
+from .serializers import OrderFeedbackSerializer, ORDER_FIELDS, serialize_order
+from .pagination import encode_cursor, decode_cursor, parse_moment
+from .sequence import allocate_order_number, order_numbers
+from .pricing import price_items
+from .export import EXPORT_ORDER_FIELDS, csv_lines, ndjson_lines, encode_chunks
+from django.db.models import Q
 
 # Create your views here.
 
@@ -31,38 +54,31 @@ class CreateOrderView(APIView):
             )
 
         try:
+            # Price the cart from the process-local menu cache
+            item_ids, item_counts, total_price, item_details = price_items(item_ids, menu_cache.snapshot())
+
+            # Reserve the order number before the order transaction so the
+            # sequence row is never locked for longer than a single UPDATE
+            sequence_number, order_number = allocate_order_number(request.data.get('location'))
+
             # Use transaction to ensure data consistency
             with transaction.atomic():
-                # Get all menu items in one query
-                menu_items = MenuItem.objects.filter(id__in=item_ids)
-                
-                # Create a dictionary for quick price lookup
-                item_prices = {item.id: item.price for item in menu_items}
-                
-                # Calculate total price
-                total_price = sum(item_prices.get(item_id, 0) for item_id in item_ids)
-                
                 # Create order
                 order = Order.objects.create(
-                    order_number=Order.generate_order_number(),
+                    order_number=order_number,
+                    sequence_number=sequence_number,
                     total_price=total_price,
                     items={
                         'item_ids': item_ids,
-                        'item_details': [
-                            {
-                                'id': item.id,
-                                'name': item.name,
-                                'price': str(item.price)
-                            } for item in menu_items
-                        ]
+                        'item_details': item_details
                     }
                 )
 
-                # Increment order_count for each menu item
-                for item_id in item_ids:
-                    MenuItem.objects.filter(id=item_id).update(
-                        order_count=models.F('order_count') + 1
-                    )
+                OrderLine.objects.bulk_create(build_order_lines(order))
+
+                # Increment order_count for all ordered items at once,
+                # folding repeated ids into quantities
+                record_order_counts(item_counts)
                 
                 return Response({
                     'order_number': order.order_number,
@@ -75,6 +91,153 @@ class CreateOrderView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+class BulkCreateOrderView(APIView):
+    """
+    Create many orders in one request, e.g. when a kiosk replays orders it
+    queued while offline. Expects {"orders": [{"items": [...], "client_ref": ...}, ...]}
+    and returns one result per submitted order, in order, so a few bad
+    entries do not fail the whole batch.
+
+    client_ref makes replays idempotent: an order whose client_ref already
+    exists is not created again, and its result points at the existing order
+    with "duplicate": true.
+    """
+    permission_classes = [AllowAny]
+    max_orders = 500
+    max_client_ref_length = 64
+
+    def parse_entry(self, entry):
+        """(item_ids, client_ref) of a submitted order, or ValueError with a message for the client."""
+        if not isinstance(entry, dict):
+            raise ValueError("Each order must be an object")
+        client_ref = entry.get('client_ref')
+        if client_ref is not None and (not isinstance(client_ref, str) or not 0 < len(client_ref) <= self.max_client_ref_length):
+            raise ValueError(f"client_ref must be a string of 1-{self.max_client_ref_length} characters")
+        item_ids = entry.get('items')
+        if not item_ids or not isinstance(item_ids, list):
+            raise ValueError("No items provided")
+        for item_id in item_ids:
+            if isinstance(item_id, bool) or not (isinstance(item_id, int) or (isinstance(item_id, str) and item_id.isdigit())):
+                raise ValueError("items must be a list of menu item ids")
+        return item_ids, client_ref
+
+    def existing_orders(self, client_refs):
+        """{client_ref: order} of the orders already created for `client_refs`."""
+        if not client_refs:
+            return {}
+        orders = Order.objects.filter(client_ref__in=client_refs).only('client_ref', 'order_number', 'total_price')
+        return {order.client_ref: order for order in orders}
+
+    def post(self, request, *args, **kwargs):
+        orders_data = request.data.get('orders')
+
+        if not isinstance(orders_data, list) or not orders_data:
+            return Response(
+                {"error": "No orders provided"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(orders_data) > self.max_orders:
+            return Response(
+                {"error": f"At most {self.max_orders} orders can be submitted at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = [None] * len(orders_data)
+        valid = []
+        for index, entry in enumerate(orders_data):
+            try:
+                valid.append((index,) + self.parse_entry(entry))
+            except ValueError as e:
+                client_ref = entry.get('client_ref') if isinstance(entry, dict) else None
+                results[index] = {'index': index, 'client_ref': client_ref, 'error': str(e)}
+
+        # Orders already created by an earlier submission of the same batch,
+        # and repeats of a client_ref within this batch
+        existing = self.existing_orders({client_ref for _, _, client_ref in valid if client_ref is not None})
+        duplicates = []
+        pending = []
+        seen = set()
+        for index, item_ids, client_ref in valid:
+            if client_ref in existing or client_ref in seen:
+                duplicates.append((index, client_ref))
+            else:
+                if client_ref is not None:
+                    seen.add(client_ref)
+                pending.append((index, item_ids, client_ref))
+
+        # Price every order against a single menu snapshot
+        menu = menu_cache.snapshot()
+        priced = [(index, client_ref) + price_items(item_ids, menu) for index, item_ids, client_ref in pending]
+
+        if priced:
+            try:
+                # Reserve all order numbers in one block
+                numbers = order_numbers.allocate(location=request.data.get('location'), count=len(priced))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            item_counts = Counter()
+            orders = []
+            for (sequence_number, order_number), (index, client_ref, item_ids, counts, total_price, item_details) in zip(numbers, priced):
+                item_counts.update(counts)
+                orders.append(Order(
+                    order_number=order_number,
+                    sequence_number=sequence_number,
+                    client_ref=client_ref,
+                    total_price=total_price,
+                    items={
+                        'item_ids': item_ids,
+                        'item_details': item_details
+                    }
+                ))
+
+            try:
+                with transaction.atomic():
+                    changes = OrderChange.objects.bulk_create([OrderChange(order_number=order.order_number) for order in orders])
+                    for order, change in zip(orders, changes):
+                        order.change_seq = change.id
+                    Order.objects.bulk_create(orders)
+                    OrderStatusTransition.objects.bulk_create(OrderStatusTransition.for_created(orders))
+                    orders_bulk_created.send(sender=Order, orders=orders)
+                    publish_order_change(orders[-1].change_seq)
+                    OrderLine.objects.bulk_create([line for order in orders for line in build_order_lines(order)])
+                    # Apply the popularity counts of the whole batch in one pass
+                    record_order_counts(item_counts)
+            except IntegrityError:
+                # A concurrent submission of the same client_ref won the race;
+                # resubmitting the batch reports it as a duplicate
+                return Response(
+                    {"error": "Some of these orders are being submitted concurrently; retry the batch"},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            for order, (index, client_ref, *_) in zip(orders, priced):
+                if client_ref is not None:
+                    existing.setdefault(client_ref, order)
+                results[index] = {
+                    'index': index,
+                    'client_ref': client_ref,
+                    'order_number': order.order_number,
+                    'total_price': str(order.total_price)
+                }
+
+        for index, client_ref in duplicates:
+            order = existing[client_ref]
+            results[index] = {
+                'index': index,
+                'client_ref': client_ref,
+                'order_number': order.order_number,
+                'total_price': str(order.total_price),
+                'duplicate': True
+            }
+
+        return Response({
+            'created': len(priced),
+            'duplicates': len(duplicates),
+            'failed': len(orders_data) - len(valid),
+            'results': results
+        }, status=status.HTTP_201_CREATED if valid else status.HTTP_400_BAD_REQUEST)
+
 class UpdateOrderStatusView(APIView):
     permission_classes = [IsAuthenticated, IsKitchenUser]
 
@@ -83,14 +246,16 @@ class UpdateOrderStatusView(APIView):
         
         if not new_status or new_status not in dict(Order.STATUS_CHOICES):
             return Response(
-                {"error": "Invalid status. Must be either 'in_progress' or 'completed'"},
+                {"error": "Invalid status. Must be one of 'in_progress', 'completed' or 'cancelled'"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            order = Order.objects.get(order_number=order_number)
-            order.status = new_status
-            order.save()
+            # Lock the row so concurrent updates see each other's status
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(order_number=order_number)
+                order.status = new_status
+                order.save()
             
             return Response({
                 'order_number': order.order_number,
@@ -109,49 +274,167 @@ class UpdateOrderStatusView(APIView):
             )
 
 class GetOrderView(APIView):
+    """
+    Order status lookup polled by customers while they wait.
+
+    Responses carry an ETag (the order's change_seq) and Last-Modified, and
+    conditional requests get a 304 when nothing changed. Payloads are kept in
+    a short-lived cache that every order write marks stale, so most polls do
+    not touch the database.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request, order_number, *args, **kwargs):
-        try:
-            order = Order.objects.get(order_number=order_number)
-            return Response({
-                'order_number': order.order_number,
-                'total_price': str(order.total_price),
-                'created_at': order.created_at,
-                'items': order.items,
-                'status': order.status,
-                'star_rating': order.star_rating,
-                'feedback': order.feedback,
-            }, status=status.HTTP_200_OK)
-        except Order.DoesNotExist:
-            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        entry = get_order_status(order_number)
+        if entry is None:
+            try:
+                order = Order.objects.get(order_number=order_number)
+            except Order.DoesNotExist:
+                return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+            entry = {
+                'change_seq': order.change_seq,
+                'etag': quote_etag(str(order.change_seq)),
+                'last_modified': order.updated_at or order.created_at,
+                'data': serialize_order(order),
+            }
+            set_order_status(order_number, entry)
+
+        headers = {
+            'ETag': entry['etag'],
+            'Last-Modified': http_date(entry['last_modified'].timestamp()),
+            'Cache-Control': 'no-cache',
+        }
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        if if_none_match:
+            not_modified = entry['etag'] in parse_etags(if_none_match) or if_none_match.strip() == '*'
+        else:
+            not_modified = if_modified_since is not None and int(entry['last_modified'].timestamp()) <= if_modified_since
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry['data'], status=status.HTTP_200_OK, headers=headers)
 
 class ListOrdersView(APIView):
+    """
+    Newest-first list of orders, one page at a time.
+
+    Query parameters:
+    - cursor: value of `next_cursor` from the previous page
+    - limit: page size (default 50, max 200)
+    - status, rating: exact matches; rated=true/false; min_rating
+    - created_after (inclusive), created_before (exclusive): ISO date or datetime
+    - fields: comma-separated subset of the order fields to return
+
+    Pages are fetched with keyset pagination on (created_at, id), so the cost
+    of a page does not grow with the number of historical orders.
+    """
     permission_classes = [AllowAny]
+    default_limit = 50
+    max_limit = 200
 
     def get(self, request, *args, **kwargs):
-        orders = Order.objects.all().order_by('-created_at')
-        data = [
-            {
-                'order_number': order.order_number,
-                'total_price': str(order.total_price),
-                'created_at': order.created_at,
-                'items': order.items,
-                'status': order.status,
-                'star_rating': order.star_rating,
-                'feedback': order.feedback,
-            }
-            for order in orders
-        ]
-        return Response(data, status=status.HTTP_200_OK)
+        params = request.query_params
+        orders = Order.objects.all()
+
+        try:
+            limit = min(int(params.get('limit', self.default_limit)), self.max_limit)
+            if limit < 1:
+                raise ValueError("limit must be positive")
+
+            fields = ORDER_FIELDS
+            if params.get('fields'):
+                fields = [field for field in ORDER_FIELDS if field in params['fields'].split(',')]
+                if not fields:
+                    raise ValueError(f"fields must be a subset of: {', '.join(ORDER_FIELDS)}")
+
+            if params.get('status'):
+                orders = orders.filter(status=params['status'])
+            if params.get('rating'):
+                orders = orders.filter(star_rating=int(params['rating']))
+            if params.get('min_rating'):
+                orders = orders.filter(star_rating__gte=int(params['min_rating']))
+            if params.get('rated') in ('true', 'false'):
+                orders = orders.filter(star_rating__isnull=params['rated'] == 'false')
+            if params.get('created_after'):
+                orders = orders.filter(created_at__gte=parse_moment(params['created_after']))
+            if params.get('created_before'):
+                orders = orders.filter(created_at__lt=parse_moment(params['created_before']))
+
+            if params.get('cursor'):
+                created_at, order_id = decode_cursor(params['cursor'])
+                orders = orders.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=order_id)
+                )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only load the columns needed for the requested fields and the cursor
+        orders = orders.only('id', 'created_at', *fields).order_by('-created_at', '-id')
+        page = list(orders[:limit + 1])
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+
+        return Response({
+            'results': [serialize_order(order, fields) for order in page[:limit]],
+            'next_cursor': next_cursor
+        }, status=status.HTTP_200_OK)
+
+class ExportOrdersView(APIView):
+    """
+    Streams the orders created in [start, end) as CSV or NDJSON, one row per
+    order item, for accounting exports.
+
+    Query parameters:
+    - start (required), end (exclusive, default now): ISO date or datetime
+    - output: csv (default) or ndjson
+    - compress=gzip: gzip the file on the fly
+
+    Orders are read with a chunked server-side iterator and written out as
+    they arrive, so memory use does not depend on the size of the range.
+    """
+    permission_classes = [IsAuthenticated]
+    chunk_size = 2000
+    content_types = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in self.content_types:
+            return Response({"error": "output must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        if not params.get('start'):
+            return Response({"error": "start is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = parse_moment(params['start'])
+            end = parse_moment(params['end']) if params.get('end') else timezone.now()
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        orders = (
+            Order.objects.filter(created_at__gte=start, created_at__lt=end)
+            .only(*EXPORT_ORDER_FIELDS)
+            .order_by('created_at', 'id')
+            .iterator(chunk_size=self.chunk_size)
+        )
+        lines = csv_lines(orders) if output == 'csv' else ndjson_lines(orders)
+        compress = params.get('compress') == 'gzip'
+
+        filename = f"orders-{start.date()}-{end.date()}.{output}"
+        content_type = self.content_types[output]
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+        response = StreamingHttpResponse(encode_chunks(lines, compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 class DeleteOrderView(APIView):
     permission_classes = [AllowAny]
 
     def delete(self, request, order_number, *args, **kwargs):
         try:
-            order = Order.objects.get(order_number=order_number)
-            order.delete()
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(order_number=order_number)
+                order.delete()
             return Response({'message': 'Order deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -161,13 +444,16 @@ class PutOrderView(APIView):
 
     def put(self, request, order_number, *args, **kwargs):
         try:
-            order = Order.objects.get(order_number=order_number)
-            data = request.data
-            # Update all fields (except order_number and created_at)
-            order.total_price = data.get('total_price', order.total_price)
-            order.items = data.get('items', order.items)
-            order.status = data.get('status', order.status)
-            order.save()
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(order_number=order_number)
+                data = request.data
+                # Update all fields (except order_number and created_at)
+                order.total_price = data.get('total_price', order.total_price)
+                order.items = data.get('items', order.items)
+                order.status = data.get('status', order.status)
+                order.save()
+                if 'items' in data:
+                    sync_order_lines(order)
             return Response({'message': 'Order updated successfully'}, status=status.HTTP_200_OK)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -177,16 +463,19 @@ class PatchOrderView(APIView):
 
     def patch(self, request, order_number, *args, **kwargs):
         try:
-            order = Order.objects.get(order_number=order_number)
-            data = request.data
-            # Update only provided fields
-            if 'total_price' in data:
-                order.total_price = data['total_price']
-            if 'items' in data:
-                order.items = data['items']
-            if 'status' in data:
-                order.status = data['status']
-            order.save()
+            with transaction.atomic():
+                order = Order.objects.select_for_update().get(order_number=order_number)
+                data = request.data
+                # Update only provided fields
+                if 'total_price' in data:
+                    order.total_price = data['total_price']
+                if 'items' in data:
+                    order.items = data['items']
+                if 'status' in data:
+                    order.status = data['status']
+                order.save()
+                if 'items' in data:
+                    sync_order_lines(order)
             return Response({'message': 'Order partially updated successfully'}, status=status.HTTP_200_OK)
         except Order.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -197,14 +486,16 @@ class OrderFeedbackAPIView(APIView):
         serializer = OrderFeedbackSerializer(data=request.data)
         if serializer.is_valid():
             order_number = serializer.validated_data.get("order_number")
-            try:
-                order = Order.objects.get(order_number=order_number)
-            except Order.DoesNotExist:
-                return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
+            with transaction.atomic():
+                try:
+                    order = Order.objects.select_for_update().get(order_number=order_number)
+                except Order.DoesNotExist:
+                    return Response({"error": "Order not found"}, status=status.HTTP_404_NOT_FOUND)
 
-            order.star_rating = serializer.validated_data.get("star_rating")
-            order.feedback = serializer.validated_data.get("feedback")
-            order.save()
+                order.star_rating = serializer.validated_data.get("star_rating")
+                order.feedback = serializer.validated_data.get("feedback")
+                # The running rating total follows through the order signals
+                order.save()
 
             return Response({"message": "Feedback updated successfully"}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -213,8 +504,142 @@ class AverageRatingAPIView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, *args, **kwargs):
-        # Calculate the average star rating for orders that have a rating
-        avg_rating = Order.objects.filter(star_rating__isnull=False).aggregate(average=Avg('star_rating'))['average']
-        if avg_rating is None:
-            avg_rating = 0  # or return a message indicating no ratings available
+        # Read the running total kept up to date by the order signals
+        avg_rating = get_rating_summary().average
         return Response({"average_rating": avg_rating}, status=status.HTTP_200_OK)
+
+class FeedAccessMixin:
+    """
+    DRF authentication and permission checks for the async feed views, which
+    are plain Django views because APIView does not support async handlers.
+    """
+    permission_classes = [IsAuthenticated, IsKitchenUser]
+
+    async def dispatch(self, request, *args, **kwargs):
+        error = await sync_to_async(self.check_access)(request)
+        if error is not None:
+            return error
+        return await super().dispatch(request, *args, **kwargs)
+
+    def check_access(self, request):
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            for permission in self.permission_classes:
+                if not permission().has_permission(drf_request, self):
+                    if not drf_request.user.is_authenticated:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied()
+        except exceptions.APIException as e:
+            return JsonResponse({"error": str(e.detail)}, status=e.status_code)
+        request.user = drf_request.user
+        return None
+
+class OrderFeedView(FeedAccessMixin, View):
+    """
+    Change feed for kitchen displays: returns orders created or changed after
+    `cursor` (a change_seq), oldest change first, plus the cursor to send next.
+    Deleted orders appear as {"order_number", "change_seq", "deleted": true}.
+
+    With `wait=<seconds>` (max 30) the request long-polls until something
+    changes. Waiting clients only check a cached feed head, so an idle screen
+    costs no database queries until an order is written.
+    """
+    max_wait = 30
+    poll_interval = 0.5
+    default_limit = 100
+    max_limit = 500
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            cursor = int(request.GET.get('cursor', 0))
+            wait = min(float(request.GET.get('wait', 0)), self.max_wait)
+            limit = min(int(request.GET.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return JsonResponse({"error": "cursor, wait and limit must be numbers"}, status=400)
+        if limit < 1:
+            return JsonResponse({"error": "limit must be positive"}, status=400)
+
+        deadline = asyncio.get_running_loop().time() + wait
+        # Head the database was last found to have nothing new for
+        checked_head = None
+        while True:
+            timed_out = asyncio.get_running_loop().time() >= deadline
+            head = await get_feed_head()
+            # Always hit the database once the wait is over, in case the
+            # cached head lags behind
+            if (head > cursor and head != checked_head) or timed_out:
+                changes, settling = await fetch_order_changes(cursor, limit)
+                if changes or timed_out:
+                    return JsonResponse({
+                        'cursor': changes[-1]['change_seq'] if changes else cursor,
+                        'orders': changes
+                    })
+                if not settling:
+                    checked_head = head
+            await asyncio.sleep(self.poll_interval)
+
+class OrderFeedStreamView(FeedAccessMixin, View):
+    """
+    Server-sent events version of OrderFeedView. Each changed order is sent as
+    one event whose id is its change_seq, so a reconnecting EventSource resumes
+    from Last-Event-ID automatically.
+    """
+    poll_interval = 1
+    keepalive_interval = 15
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            cursor = int(request.headers.get('Last-Event-ID') or request.GET.get('cursor', 0))
+        except ValueError:
+            return JsonResponse({"error": "cursor must be a number"}, status=400)
+
+        response = StreamingHttpResponse(self.events(cursor), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def events(self, cursor):
+        idle = 0
+        checked_head = None
+        while True:
+            head = await get_feed_head()
+            if (head > cursor and head != checked_head) or idle >= self.keepalive_interval:
+                changes, settling = await fetch_order_changes(cursor, OrderFeedView.max_limit)
+                for change in changes:
+                    cursor = change['change_seq']
+                    yield f"id: {cursor}\ndata: {json.dumps(change, cls=DjangoJSONEncoder)}\n\n"
+                if not changes and idle >= self.keepalive_interval:
+                    yield ": keepalive\n\n"
+                checked_head = None if changes or settling else head
+                idle = 0
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+
+async def fetch_order_changes(cursor, limit):
+    """
+    Up to `limit` order changes and deletes after `cursor`, oldest first, and
+    whether newer changes were held back.
+
+    A change_seq is taken before its transaction commits, so a change can
+    become visible after a higher one. Changes younger than
+    ORDER_FEED_SETTLE_SECONDS are held back, and everything after them, so
+    the returned cursor never moves past a change that is still committing.
+    """
+    settled = timezone.now() - timedelta(seconds=settings.ORDER_FEED_SETTLE_SECONDS)
+    orders = Order.objects.filter(change_seq__gt=cursor).order_by('change_seq')[:limit]
+    deletes = OrderChange.objects.filter(id__gt=cursor, deleted=True).order_by('id')[:limit]
+    changes = [
+        (order.change_seq, order.updated_at or order.created_at, dict(serialize_order(order), change_seq=order.change_seq))
+        async for order in orders
+    ] + [
+        (change.id, change.created_at, {'order_number': change.order_number, 'change_seq': change.id, 'deleted': True})
+        async for change in deletes
+    ]
+    changes.sort(key=lambda change: change[0])
+
+    result = []
+    for change_seq, changed_at, data in changes[:limit]:
+        if changed_at > settled:
+            return result, True
+        result.append(data)
+    return result, False
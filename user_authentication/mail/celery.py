@@ -4,7 +4,7 @@ import os
 from celery import Celery
 
 # Set to your Django settings module
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodOrder_Backend.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 app = Celery('foodOrder_Backend')
 app.config_from_object('django.conf:settings', namespace='CELERY')